@@ -2,20 +2,31 @@ import tkinter as tk
 from tkinter import scrolledtext, ttk, messagebox, filedialog
 import sys
 import io
+import contextlib
 import queue
 import threading
-import requests
+import ssl
 import time
-import pandas as pd
-from bs4 import BeautifulSoup
 import os
 import re
+import math
 import csv
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import json
+import sqlite3
+import array
+import random
+import gzip
+import zlib
+import hashlib
+import heapq
+import itertools
 import subprocess
+import logging
+import logging.handlers
 import importlib
+import importlib.util
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 # SMTP Configuration
 SMTP_SERVER = 'smtp.gmail.com'  # Change if using another provider
@@ -23,33 +34,70 @@ SMTP_PORT = 587
 SMTP_USER = 'sender@gmail.com'  # <-- CHANGE THIS
 SMTP_PASSWORD = 'password'  # <-- CHANGE THIS (use app password for Gmail)
 EMAIL_DOMAIN = 'stu.ucsc.cmb.ac.lk'  # Email domain for students
+SMTP_MAX_RATE = 2.0  # Rank emails sent per second (0 = no limit)
+SMTP_WORKERS = 2  # Rank emails sent in parallel, each over its own SMTP connection
+SMTP_TIMEOUT = 30  # Seconds before an SMTP command counts as timed out
 
-# Check for required packages
-def check_dependencies():
-    missing_packages = []
-    try:
-        import openpyxl
-    except ImportError:
-        missing_packages.append('openpyxl')
+class LazyModule:
+    """Stand-in for a heavy module that is imported on first attribute access.
     
-    try:
-        import requests
-    except ImportError:
-        missing_packages.append('requests')
+    Keeps pandas, requests and friends out of the import path until something uses them, so the
+    window opens quickly. load() imports the module on demand (the GUI warms them up in the background).
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
     
-    try:
-        import bs4
-    except ImportError:
-        missing_packages.append('beautifulsoup4')
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+    
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+    
+    def __repr__(self):
+        return f"<lazy module {self._name!r}{' (loaded)' if self._module is not None else ''}>"
+
+asyncio = LazyModule('asyncio')
+requests = LazyModule('requests')
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+bs4 = LazyModule('bs4')
+smtplib = LazyModule('smtplib')
+
+# Packages the app needs, as (import name, pip package)
+REQUIRED_PACKAGES = [('openpyxl', 'openpyxl'), ('requests', 'requests'), ('bs4', 'beautifulsoup4')]
+# Milliseconds after the window is drawn before the heavy modules are imported in the background
+WARMUP_DELAY_MS = 200
+
+_dependency_check = None
+_dependency_lock = threading.Lock()
+
+# Check for required packages
+def check_dependencies():
+    """Make sure the required packages are installed (installing missing ones); checked once and cached"""
+    global _dependency_check
+    with _dependency_lock:
+        if _dependency_check is None:
+            _dependency_check = _install_missing_packages()
+        return _dependency_check
+
+def _install_missing_packages():
+    # find_spec locates a package without importing it, so the check stays cheap at startup
+    missing_packages = [package for name, package in REQUIRED_PACKAGES if importlib.util.find_spec(name) is None]
     
     if missing_packages:
         print(f"Missing required packages: {', '.join(missing_packages)}")
         print("Installing missing packages...")
         
         try:
-            import subprocess
             for package in missing_packages:
                 subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+            importlib.invalidate_caches()
             print("All missing packages installed successfully!")
         except Exception as e:
             print(f"Error installing packages: {e}")
@@ -58,6 +106,12 @@ def check_dependencies():
             return False
     return True
 
+def warm_up_imports():
+    """Import the heavy modules (and build the HTML parser) ahead of the first fetch"""
+    for module in (requests, pd, bs4):
+        module.load()
+    get_html_parser()
+
 # Helper function to get writable output directory
 def get_output_directory():
     """Get a writable directory for output files (handles macOS app bundle read-only issue)"""
@@ -88,36 +142,196 @@ OUTPUT_DIR = get_output_directory()
 # Default credentials
 DEFAULT_INDEX = '23000000'
 DEFAULT_NIC = '200300000000'
-LOGIN_URL = 'https://ucsc.cmb.ac.lk/student-portal/public/index.php/login'
-DASHBOARD_URL = 'https://ucsc.cmb.ac.lk/student-portal/public/index.php'
-RESULTS_URL = 'https://ucsc.cmb.ac.lk/student-portal/public/index.php/results'
+# Portal base URL (override with UCSC_PORTAL_URL, e.g. to point at mock_portal.py)
+PORTAL_BASE_URL = os.environ.get('UCSC_PORTAL_URL', 'https://ucsc.cmb.ac.lk/student-portal/public/index.php').rstrip('/')
+LOGIN_URL = PORTAL_BASE_URL + '/login'
+DASHBOARD_URL = PORTAL_BASE_URL
+RESULTS_URL = PORTAL_BASE_URL + '/results'
 EXCEL_PATH = os.path.join(OUTPUT_DIR, 'results.xlsx')
 CSV_PATH = 'student_credentials.csv'  # Expected format: index,nic,email
 CREDIT_CSV_PATH = 'credits.csv'  # Expected format: subject_code,credits
 
-# Email sending function
-def send_email(to_email, subject, body):
-    """Send an email with the given subject and body to the specified recipient"""
-    try:
-        print(f"Sending email to: {to_email}")
-        print(f"Subject: {subject}")
-        
-        msg = MIMEMultipart()
-        msg['From'] = SMTP_USER
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
+# Batch concurrency defaults
+DEFAULT_WORKERS = 4  # Students fetched in parallel during batch processing
+DEFAULT_MAX_REQUESTS_PER_SEC = 4.0  # Global cap on portal requests (0 = no limit)
+DEFAULT_POOL_SIZE = 8  # Keep-alive connections shared by all students
+REQUEST_TIMEOUT = 30  # Seconds before a portal request counts as timed out
+MAX_FETCH_ATTEMPTS = 3  # Attempts per student when adaptive concurrency retries timeouts, 5xx and 429
+# Results cache (skips unchanged students on reruns)
+CACHE_DIR = os.path.join(OUTPUT_DIR, 'cache')
+DEFAULT_CACHE_TTL_HOURS = 12  # Used by stale-only mode
+CACHE_MAX_AGE_DAYS = 60  # Entries older than this are evicted
+CACHE_MAX_BYTES = 50 * 1024 * 1024  # Oldest entries are evicted beyond this total size
+# Checkpoint journals for resumable batch runs (one per student CSV)
+JOURNAL_DIR = os.path.join(OUTPUT_DIR, 'journals')
+DEFAULT_LIVE_TOP_K = 20  # Students shown on the Live Ranking tab
+TIMINGS_DIR = os.path.join(OUTPUT_DIR, 'timings')
+ARCHIVE_DIR = os.path.join(OUTPUT_DIR, 'archives')
+FETCH_PHASES = ['rate_limit_wait', 'login_page', 'login_post', 'dashboard', 'results_page', 'parse']
+HTML_PARSERS = ['auto', 'lxml', 'html.parser']  # 'auto' uses lxml when it is installed
+DEFAULT_HTML_PARSER = os.environ.get('UCSC_HTML_PARSER', 'auto')
+FETCH_BACKENDS = ['threads', 'asyncio']  # 'asyncio' needs aiohttp and keeps all sessions on one event loop
+DEFAULT_BACKEND = 'threads'
+# Batch Excel output is written after this many new students or this many seconds, whichever comes first
+DEFAULT_EXCEL_FLUSH_ROWS = 50
+DEFAULT_EXCEL_FLUSH_SECONDS = 30.0
+# Results database: every ranked run (students, subject attempts, GPAs, ranks); Excel and CSV are exported from it
+RESULTS_DB_PATH = os.path.join(OUTPUT_DIR, 'results.db')
+# Rank email outbox
+OUTBOX_DB_PATH = os.path.join(OUTPUT_DIR, 'outbox.db')
+EMAIL_MAX_ATTEMPTS = 4  # Sends per email before it is marked failed
+EMAIL_RETRY_BACKOFF = 5.0  # Seconds before the first retry, doubled for each later one
+# Output log
+LOG_DIR = os.path.join(OUTPUT_DIR, 'logs')
+DEFAULT_LOG_MAX_LINES = 2000  # Lines kept in the Output Log window (the session log file keeps everything)
+LOG_PUMP_MS = 100  # How often queued output is moved into the Output Log window
+LOG_KEEP_FILES = 20  # Session log files kept in LOG_DIR
+# Structured log: per-category levels, e.g. "warning" or "warning,grades=info,fetch=debug" (UCSC_LOG or --log-level)
+LOG_CATEGORIES = ['fetch', 'parse', 'grades', 'credits', 'email']
+DEFAULT_LOG_LEVELS = os.environ.get('UCSC_LOG', 'warning')
+LOG_JSON_PATH = os.path.join(LOG_DIR, 'fetcher.jsonl')  # JSON-lines copy of every logged message
+LOG_JSON_MAX_BYTES = 5 * 1024 * 1024  # Size at which the JSON-lines log is rotated
+LOG_JSON_BACKUPS = 5  # Rotated JSON-lines logs kept
+
+def set_portal_url(base_url):
+    """Point all portal URLs at another base URL (e.g. a local mock portal for load testing)"""
+    global PORTAL_BASE_URL, LOGIN_URL, DASHBOARD_URL, RESULTS_URL
+    PORTAL_BASE_URL = base_url.rstrip('/')
+    LOGIN_URL = PORTAL_BASE_URL + '/login'
+    DASHBOARD_URL = PORTAL_BASE_URL
+    RESULTS_URL = PORTAL_BASE_URL + '/results'
+
+def build_email(from_email, to_email, subject, body):
+    """Plain-text MIME message ready for SMTP.send_message"""
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    msg = MIMEMultipart()
+    msg['From'] = from_email
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+class SMTPMailer:
+    """Sends emails over a small pool of persistent, authenticated SMTP connections.
+    
+    Each connection runs STARTTLS and logs in once, then carries any number of messages. A connection
+    the server has dropped (disconnect, 421 or a socket error) is reopened and the message sent again
+    once. max_rate caps messages started per second across all connections (0 = no limit).
+    Thread-safe: up to `connections` messages are sent at the same time.
+    """
+    def __init__(self, server=None, port=None, user=None, password=None, connections=1, max_rate=None, should_stop=None):
+        self.server = server or SMTP_SERVER
+        self.port = port or SMTP_PORT
+        self.user = user if user is not None else SMTP_USER
+        self.password = password if password is not None else SMTP_PASSWORD
+        self.rate_limiter = RateLimiter(SMTP_MAX_RATE if max_rate is None else max_rate, should_stop=should_stop)
+        self.slots = threading.BoundedSemaphore(max(1, connections))
+        self.idle = []  # Open, logged-in connections not currently sending
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.connects = 0
+        self.reconnects = 0
+        self.errors = {}  # Last error per recipient
+    
+    def _connect(self):
+        connection = smtplib.SMTP(self.server, self.port, timeout=SMTP_TIMEOUT)
+        try:
+            connection.starttls()
+            connection.login(self.user, self.password)
+        except Exception:
+            connection.close()
+            raise
+        with self.lock:
+            self.connects += 1
+        return connection
+    
+    @staticmethod
+    def _connection_lost(error):
+        """True if the error means the connection is gone (rather than this one message being refused)"""
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return True
+        if isinstance(error, smtplib.SMTPResponseException):
+            return error.smtp_code == 421
+        return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+    
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+    
+    def send(self, to_email, subject, body):
+        """Send one email. Returns True on success; errors are printed and return False."""
+        if not self.rate_limiter.acquire():
+            return False
+        message = build_email(self.user, to_email, subject, body)
         
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.send_message(msg)
+        with self.slots:
+            with self.lock:
+                connection = self.idle.pop() if self.idle else None
+            try:
+                for attempt in range(2):
+                    try:
+                        if connection is None:
+                            connection = self._connect()
+                        connection.send_message(message)
+                        break
+                    except Exception as e:
+                        if connection is None or not self._connection_lost(e) or attempt:
+                            raise
+                        # The server dropped an idle connection: reconnect and send again once
+                        self._discard(connection)
+                        connection = None
+                        with self.lock:
+                            self.reconnects += 1
+            except Exception as e:
+                if connection is not None and self._connection_lost(e):
+                    self._discard(connection)
+                    connection = None
+                with self.lock:
+                    self.failed += 1
+                    self.errors[to_email] = str(e)
+                EMAIL_LOG.error("Error sending email to %s: %s", to_email, e, to=to_email)
+                return False
+            finally:
+                if connection is not None:
+                    with self.lock:
+                        self.idle.append(connection)
         
-        print(f"✓ Email sent successfully to {to_email}")
+        with self.lock:
+            self.sent += 1
         return True
-    except Exception as e:
-        print(f"❌ Error sending email: {e}")
+    
+    def last_error(self, to_email):
+        with self.lock:
+            return self.errors.pop(to_email, None)
+    
+    def close(self):
+        """Log out of and close every idle connection"""
+        with self.lock:
+            connections, self.idle = self.idle, []
+        for connection in connections:
+            try:
+                connection.quit()
+            except Exception:
+                self._discard(connection)
+
+# Email sending function
+def send_email(to_email, subject, body):
+    """Send an email with the given subject and body to the specified recipient (over its own connection)"""
+    print(f"Sending email to: {to_email}")
+    print(f"Subject: {subject}")
+    mailer = SMTPMailer(max_rate=0)
+    try:
+        if mailer.send(to_email, subject, body):
+            print(f"✓ Email sent successfully to {to_email}")
+            return True
         return False
+    finally:
+        mailer.close()
 
 # GPA Grade Points lookup table
 GRADE_POINTS = {
@@ -141,43 +355,1588 @@ GRADE_POINTS = {
     # NC, CM not considered for GPA calculation
 }
 
-class RedirectText(io.StringIO):
-    """Class to redirect stdout to the tkinter text widget"""
-    def __init__(self, text_widget):
-        super().__init__()
-        self.text_widget = text_widget
+class RedirectText(io.StringIO):
+    """Class to redirect stdout to the tkinter text widget.
+    
+    write() only queues the text, so worker threads never touch Tk. pump() runs on the Tk thread every
+    LOG_PUMP_MS: it inserts everything queued since the last run in one go, trims the widget to the
+    last max_lines lines and appends the same text to the session log file, which keeps the full log.
+    """
+    def __init__(self, text_widget, root=None, max_lines=DEFAULT_LOG_MAX_LINES, log_path=None):
+        super().__init__()
+        self.text_widget = text_widget
+        self.root = root
+        self.max_lines = max_lines
+        self.pending = queue.SimpleQueue()
+        self.log_path = log_path
+        self.log_file = None
+        if log_path:
+            try:
+                os.makedirs(os.path.dirname(log_path), exist_ok=True)
+                self.log_file = open(log_path, 'a', encoding='utf-8')
+            except OSError as e:
+                self.pending.put(f"⚠️ Could not open the log file {log_path}: {e}\n")
+    
+    def write(self, string):
+        if string:
+            self.pending.put(string)
+        return len(string)
+    
+    def flush(self):
+        pass
+    
+    def _drain(self):
+        chunks = []
+        try:
+            while True:
+                chunks.append(self.pending.get_nowait())
+        except queue.Empty:
+            pass
+        return ''.join(chunks)
+    
+    def pump(self):
+        """Move queued output into the log file and the widget (Tk thread only); reschedules itself"""
+        try:
+            text = self._drain()
+            if text:
+                if self.log_file:
+                    try:
+                        self.log_file.write(text)
+                        self.log_file.flush()
+                    except OSError as e:
+                        # Disk full or file gone: keep the window going without the file
+                        text += f"⚠️ Stopped writing the log file {self.log_path}: {e}\n"
+                        self._close_log_file()
+                self._show(text)
+        finally:
+            if self.root is not None:
+                self.root.after(LOG_PUMP_MS, self.pump)
+    
+    def _show(self, text):
+        # Only the last max_lines lines can survive the trim, so don't insert the rest
+        lines = text.split('\n')
+        if len(lines) > self.max_lines + 1:
+            text = '\n'.join(lines[-(self.max_lines + 1):])
+        self.text_widget.configure(state=tk.NORMAL)
+        self.text_widget.insert(tk.END, text)
+        excess = int(self.text_widget.index('end-1c').split('.')[0]) - self.max_lines
+        if excess > 0:
+            self.text_widget.delete('1.0', f'{excess + 1}.0')
+        self.text_widget.see(tk.END)  # Auto-scroll to the bottom
+        self.text_widget.configure(state=tk.DISABLED)
+    
+    def _close_log_file(self):
+        try:
+            self.log_file.close()
+        except OSError:
+            pass
+        self.log_file = None
+    
+    def close(self):
+        """Write whatever is still queued to the log file and close it"""
+        if self.log_file:
+            try:
+                self.log_file.write(self._drain())
+            except OSError:
+                pass
+            self._close_log_file()
+
+def session_log_path():
+    """Path of a new session log file in LOG_DIR, removing all but the newest LOG_KEEP_FILES older ones"""
+    try:
+        old_logs = sorted(name for name in os.listdir(LOG_DIR) if name.startswith('fetcher-') and name.endswith('.log'))
+    except OSError:
+        old_logs = []
+    for name in old_logs[:max(0, len(old_logs) - LOG_KEEP_FILES + 1)]:
+        try:
+            os.remove(os.path.join(LOG_DIR, name))
+        except OSError:
+            pass
+    return os.path.join(LOG_DIR, time.strftime('fetcher-%Y%m%d-%H%M%S.log'))
+
+# Between WARNING and ERROR, so successes are shown at the default level as they always were
+SUCCESS = 35
+logging.addLevelName(SUCCESS, 'SUCCESS')
+LOG_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'success': SUCCESS,
+    'error': logging.ERROR,
+    'off': logging.CRITICAL + 1,
+}
+
+class StructuredLogger:
+    """Logger for one category of messages (fetch, parse, grades, credits, email) on the logging module.
+    
+    Messages take lazy %-style arguments and keyword fields, e.g.
+    CREDITS_LOG.warning("No credit mapping found for '%s'", code, subject=code): nothing is formatted
+    unless warnings are on for the category. Fields (plus any bound with bind()) go to the JSON-lines
+    log as they are. Hot loops check enabled(level) once and skip the calls entirely when it is off.
+    """
+    __slots__ = ('category', 'logger', 'fields')
+    
+    def __init__(self, category, fields=None):
+        self.category = category
+        self.logger = logging.getLogger(f'ucsc.{category}')
+        self.fields = fields or {}
+    
+    def bind(self, **fields):
+        """The same logger with fields added to every message (e.g. the student's index number)"""
+        return StructuredLogger(self.category, {**self.fields, **fields})
+    
+    def enabled(self, level):
+        return self.logger.isEnabledFor(level)
+    
+    def _emit(self, level, message, args, fields):
+        # Built here rather than through Logger.log, which walks the stack for the caller's file and line
+        record = self.logger.makeRecord(self.logger.name, level, '(unknown file)', 0, message, args, None,
+                                        extra={'fields': {**self.fields, **fields} if self.fields else fields})
+        self.logger.handle(record)
+    
+    # Each level checks itself, so a disabled message costs one cached level lookup
+    def log(self, level, message, *args, **fields):
+        if self.logger.isEnabledFor(level):
+            self._emit(level, message, args, fields)
+    
+    def debug(self, message, *args, **fields):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self._emit(logging.DEBUG, message, args, fields)
+    
+    def info(self, message, *args, **fields):
+        if self.logger.isEnabledFor(logging.INFO):
+            self._emit(logging.INFO, message, args, fields)
+    
+    def success(self, message, *args, **fields):
+        if self.logger.isEnabledFor(SUCCESS):
+            self._emit(SUCCESS, message, args, fields)
+    
+    def warning(self, message, *args, **fields):
+        if self.logger.isEnabledFor(logging.WARNING):
+            self._emit(logging.WARNING, message, args, fields)
+    
+    def error(self, message, *args, **fields):
+        if self.logger.isEnabledFor(logging.ERROR):
+            self._emit(logging.ERROR, message, args, fields)
+
+class ConsoleLogHandler(logging.Handler):
+    """Prints messages with the usual prefixes to whatever sys.stdout is at the time (the Output Log in the GUI)"""
+    PREFIXES = {logging.DEBUG: '[DEBUG] ', logging.INFO: '[INFO] ', logging.WARNING: '⚠️ ', SUCCESS: '✓ ', logging.ERROR: '❌ '}
+    
+    def emit(self, record):
+        stream = sys.stdout
+        if stream is None:  # Windowed app without a console
+            return
+        try:
+            stream.write(f"{self.PREFIXES.get(record.levelno, '')}{record.getMessage()}\n")
+        except Exception:
+            self.handleError(record)
+
+class JSONLinesFormatter(logging.Formatter):
+    """One JSON object per message: ts, level, category, thread, msg and the message's fields"""
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'category': record.name.partition('.')[2],
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+_log_root = logging.getLogger('ucsc')
+_log_root.propagate = False
+_log_root.addHandler(ConsoleLogHandler())
+
+def set_log_levels(spec):
+    """Apply a level spec: a default level and/or category=level pairs, e.g. "warning,grades=info".
+    
+    Levels are debug, info, warning, success, error and off. A default resets every category not
+    named in the spec. Raises ValueError for an unknown level or category.
+    """
+    default = None
+    levels = {}
+    for part in spec.split(','):
+        category, _, level = part.strip().lower().rpartition('=')
+        if not level:
+            continue
+        if level not in LOG_LEVELS:
+            raise ValueError(f"unknown log level '{level}' (choose from {', '.join(LOG_LEVELS)})")
+        if not category:
+            default = LOG_LEVELS[level]
+        elif category in LOG_CATEGORIES:
+            levels[category] = LOG_LEVELS[level]
+        else:
+            raise ValueError(f"unknown log category '{category}' (choose from {', '.join(LOG_CATEGORIES)})")
+    if default is not None:
+        _log_root.setLevel(default)
+        for category in LOG_CATEGORIES:
+            logging.getLogger(f'ucsc.{category}').setLevel(levels.get(category, logging.NOTSET))
+    else:
+        for category, level in levels.items():
+            logging.getLogger(f'ucsc.{category}').setLevel(level)
+
+def enable_json_log(path=LOG_JSON_PATH):
+    """Also write every logged message to a rotating JSON-lines file (for grepping and aggregating after a batch)"""
+    path = os.path.abspath(path)
+    for handler in _log_root.handlers:
+        if isinstance(handler, logging.handlers.RotatingFileHandler) and handler.baseFilename == path:
+            return handler
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_JSON_MAX_BYTES, backupCount=LOG_JSON_BACKUPS,
+                                                       encoding='utf-8', delay=True)
+    except OSError as e:
+        print(f"⚠️ Could not open the JSON log {path}: {e}")
+        return None
+    handler.setFormatter(JSONLinesFormatter())
+    _log_root.addHandler(handler)
+    return handler
+
+try:
+    set_log_levels(DEFAULT_LOG_LEVELS)
+except ValueError as e:
+    print(f"⚠️ Ignoring UCSC_LOG: {e}")
+    set_log_levels('warning')
+
+FETCH_LOG = StructuredLogger('fetch')
+PARSE_LOG = StructuredLogger('parse')
+GRADES_LOG = StructuredLogger('grades')
+CREDITS_LOG = StructuredLogger('credits')
+EMAIL_LOG = StructuredLogger('email')
+
+class RateLimiter:
+    """Thread-safe token bucket that caps how many portal requests are started per second"""
+    def __init__(self, rate, burst=None, should_stop=None):
+        self.rate = float(rate)
+        self.capacity = float(burst) if burst else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.should_stop = should_stop  # Callable that aborts waiting (e.g. Stop button)
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a request may be sent. Returns False if a stop was requested while waiting."""
+        if self.rate <= 0:
+            return True
+        
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return True
+                wait = (1.0 - self.tokens) / self.rate
+            
+            if self.should_stop and self.should_stop():
+                return False
+            # Sleep in short slices so a stop request is noticed quickly
+            time.sleep(min(wait, 0.1))
+    
+    async def acquire_async(self):
+        """Event-loop friendly acquire() for the asyncio backend"""
+        if self.rate <= 0:
+            return True
+        
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return True
+                wait = (1.0 - self.tokens) / self.rate
+            
+            if self.should_stop and self.should_stop():
+                return False
+            await asyncio.sleep(min(wait, 0.1))
+
+class _SessionReusingSSLContext(ssl.SSLContext):
+    """SSLContext that offers the last TLS session seen for a host, so new connections resume instead of doing a full handshake"""
+    def wrap_socket(self, sock, *args, **kwargs):
+        if kwargs.get('session') is None:
+            kwargs['session'] = self.tls_sessions.get(kwargs.get('server_hostname'))
+        return super().wrap_socket(sock, *args, **kwargs)
+
+class FetchOutcome:
+    """How one fetch attempt ended, reported back to AdaptiveConcurrency.
+    
+    status is 'ok', 'timeout', 'connection_error', 'server_error' (5xx), 'throttled' (429),
+    'http_error' (other 4xx) or 'error' (anything else, including a stop request).
+    """
+    BACKOFF_STATUSES = ('timeout', 'connection_error', 'server_error', 'throttled')
+    
+    def __init__(self):
+        self.status = 'error'
+        self.http_status = None
+        self.retry_after = None  # Seconds requested by the portal's Retry-After header
+    
+    @property
+    def should_back_off(self):
+        return self.status in self.BACKOFF_STATUSES
+    
+    def record_http_error(self, http_status, headers):
+        """Classify an HTTP error response and pick up any Retry-After header"""
+        self.http_status = http_status
+        if http_status == 429:
+            self.status = 'throttled'
+        elif http_status >= 500:
+            self.status = 'server_error'
+        else:
+            self.status = 'http_error'
+        self.retry_after = parse_retry_after(headers.get('Retry-After'))
+    
+    def describe(self):
+        if self.http_status:
+            return f"HTTP {self.http_status}"
+        return self.status.replace('_', ' ')
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delay in seconds or an HTTP date) into seconds, or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class AdaptiveConcurrency:
+    """AIMD limit on how many students are fetched at once.
+    
+    The limit grows by roughly one per round of successful fetches while latency stays close to the
+    best latency seen so far, halves on timeouts, 5xx or 429 responses, and shrinks by a quarter when
+    latency inflates. A Retry-After header pauses new fetches until it expires. on_change(limit, reason)
+    is called whenever the limit changes or a pause starts.
+    """
+    def __init__(self, max_limit, min_limit=1, initial=None, latency_tolerance=2.0, on_change=None, should_stop=None):
+        self.max_limit = max(min_limit, max_limit)
+        self.min_limit = min_limit
+        self.limit = float(initial or min(self.max_limit, 2))
+        self.latency_tolerance = latency_tolerance
+        self.on_change = on_change
+        self.should_stop = should_stop
+        self.in_flight = 0
+        self.smoothed_latency = None  # EWMA of successful fetch latency
+        self.baseline_latency = None  # Best smoothed latency seen (portal uncongested)
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+    
+    @property
+    def current_limit(self):
+        return int(self.limit)
+    
+    def _try_acquire_locked(self):
+        if time.monotonic() >= self.paused_until and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+    
+    def acquire(self):
+        """Block until a fetch slot is free. Returns False if a stop was requested while waiting."""
+        with self.condition:
+            while not self._try_acquire_locked():
+                if self.should_stop and self.should_stop():
+                    return False
+                self.condition.wait(timeout=0.1)
+            return True
+    
+    async def acquire_async(self):
+        """Event-loop friendly acquire() for the asyncio backend"""
+        while True:
+            with self.condition:
+                if self._try_acquire_locked():
+                    return True
+            if self.should_stop and self.should_stop():
+                return False
+            await asyncio.sleep(0.05)
+    
+    def release(self, latency, outcome):
+        """Return a slot and adjust the limit from the attempt's latency and outcome"""
+        reason = None
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            old_limit = int(self.limit)
+            # Only one decrease per smoothed round trip, so one bad burst doesn't collapse the limit
+            cooldown = max(1.0, self.smoothed_latency or 1.0)
+            
+            if outcome.status == 'ok':
+                self.smoothed_latency = latency if self.smoothed_latency is None else 0.8 * self.smoothed_latency + 0.2 * latency
+                # Let the baseline drift up slowly in case the portal became permanently slower
+                if self.baseline_latency is None:
+                    self.baseline_latency = self.smoothed_latency
+                else:
+                    self.baseline_latency = min(self.baseline_latency * 1.001, self.smoothed_latency)
+                
+                if self.smoothed_latency <= self.baseline_latency * self.latency_tolerance:
+                    # Additive increase: about +1 per window of successful fetches
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                    if int(self.limit) > old_limit:
+                        reason = f"latency healthy ({self.smoothed_latency * 1000:.0f} ms)"
+                elif now - self.last_decrease > cooldown:
+                    self.limit = max(self.min_limit, self.limit * 0.75)
+                    self.last_decrease = now
+                    reason = (f"latency rising ({self.smoothed_latency * 1000:.0f} ms vs "
+                              f"{self.baseline_latency * 1000:.0f} ms baseline)")
+            
+            elif outcome.should_back_off:
+                if now - self.last_decrease > cooldown:
+                    # Multiplicative decrease
+                    self.limit = max(self.min_limit, self.limit * 0.5)
+                    self.last_decrease = now
+                    reason = f"backing off after {outcome.describe()}"
+                if outcome.retry_after:
+                    self.paused_until = max(self.paused_until, now + outcome.retry_after)
+                    reason = (reason + ", " if reason else "") + f"pausing {outcome.retry_after:g}s (Retry-After)"
+            
+            if int(self.limit) == old_limit and reason and 'pausing' not in reason:
+                reason = None
+            limit = int(self.limit)
+            self.condition.notify_all()
+        
+        if reason and self.on_change:
+            self.on_change(limit, reason)
+
+class PooledTransport:
+    """Shared HTTP transport for portal requests.
+    
+    Every student still gets their own requests.Session (so cookies never leak between students),
+    but all sessions mount the same adapter and therefore share one pool of keep-alive connections.
+    New TLS connections resume the previous TLS session where the server allows it.
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE):
+        self.pool_size = pool_size
+        self.lock = threading.Lock()
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self.tls_resumed = 0
+        
+        self.ssl_context = _SessionReusingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        self.ssl_context.load_verify_locations(requests.certs.where())
+        self.ssl_context.tls_sessions = {}
+        
+        self.adapter = self._build_adapter()
+    
+    def _build_adapter(self):
+        """Create an HTTPAdapter whose connection pools report to this transport's counters"""
+        from requests.adapters import HTTPAdapter
+        from urllib3.connection import HTTPConnection, HTTPSConnection
+        from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+        transport = self
+        
+        class CountingHTTPConnection(HTTPConnection):
+            def connect(self):
+                super().connect()
+                transport._record_connect(self)
+        
+        class CountingHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                super().connect()
+                transport._record_connect(self)
+            
+            def getresponse(self, *args, **kwargs):
+                response = super().getresponse(*args, **kwargs)
+                # TLS 1.3 tickets arrive after the handshake, so remember the session once data was read
+                transport._remember_tls_session(self)
+                return response
+        
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = CountingHTTPConnection
+            
+            def urlopen(self, *args, **kwargs):
+                transport._record_request()
+                return super().urlopen(*args, **kwargs)
+        
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = CountingHTTPSConnection
+            
+            def urlopen(self, *args, **kwargs):
+                transport._record_request()
+                return super().urlopen(*args, **kwargs)
+        
+        class SharedPoolAdapter(HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                kwargs['ssl_context'] = transport.ssl_context
+                super().init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = {
+                    'http': CountingHTTPConnectionPool,
+                    'https': CountingHTTPSConnectionPool,
+                }
+        
+        return SharedPoolAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+    
+    def _record_request(self):
+        with self.lock:
+            self.requests_sent += 1
+    
+    def _record_connect(self, conn):
+        with self.lock:
+            self.connections_opened += 1
+            if getattr(getattr(conn, 'sock', None), 'session_reused', False):
+                self.tls_resumed += 1
+    
+    def _remember_tls_session(self, conn):
+        session = getattr(getattr(conn, 'sock', None), 'session', None)
+        if session is not None:
+            self.ssl_context.tls_sessions[conn.host] = session
+    
+    def new_session(self):
+        """Create a requests.Session with its own cookie jar that uses the shared connection pool"""
+        session = requests.Session()
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+        return session
+    
+    def reset_stats(self):
+        with self.lock:
+            self.requests_sent = 0
+            self.connections_opened = 0
+            self.tls_resumed = 0
+    
+    def stats(self):
+        """Return connection counters: requests sent, connections opened and requests served on a reused connection"""
+        with self.lock:
+            return {
+                'requests': self.requests_sent,
+                'opened': self.connections_opened,
+                'reused': max(0, self.requests_sent - self.connections_opened),
+                'tls_resumed': self.tls_resumed,
+            }
+    
+    def log_stats(self):
+        stats = self.stats()
+        print(f"🔌 Connections: {stats['opened']} opened ({stats['tls_resumed']} TLS resumed), "
+              f"{stats['reused']} reused across {stats['requests']} requests")
+    
+    def close(self):
+        self.adapter.close()
+
+# Transport shared by single fetches and batches so connections survive between runs
+_shared_transport = None
+_shared_transport_lock = threading.Lock()
+
+def get_shared_transport(pool_size=None):
+    """Return the process-wide PooledTransport, rebuilding it if a different pool size is requested"""
+    global _shared_transport
+    with _shared_transport_lock:
+        if _shared_transport is None or (pool_size and _shared_transport.pool_size != pool_size):
+            if _shared_transport is not None:
+                _shared_transport.close()
+            _shared_transport = PooledTransport(pool_size or DEFAULT_POOL_SIZE)
+        return _shared_transport
+
+class ResultsCache:
+    """On-disk cache of parsed results keyed by index number.
+    
+    Each entry stores the parsed results dict and a hash of the results page, so a rerun can tell
+    whether a student's page changed without parsing it or rewriting their Excel row.
+    One JSON file per student keeps writes atomic and independent across workers.
+    """
+    def __init__(self, directory=CACHE_DIR, max_age_days=CACHE_MAX_AGE_DAYS, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_age = max_age_days * 86400
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.unchanged = set()  # Indexes confirmed unchanged during this run
+        os.makedirs(self.directory, exist_ok=True)
+    
+    @staticmethod
+    def hash_page(html):
+        return hashlib.sha256(html.encode('utf-8')).hexdigest()
+    
+    def _path(self, index_number):
+        safe_index = re.sub(r'[^\w.-]', '_', str(index_number))
+        return os.path.join(self.directory, f"{safe_index}.json")
+    
+    def get(self, index_number):
+        """Return the cache entry {'hash', 'fetched_at', 'results'} for a student, or None"""
+        try:
+            with open(self._path(index_number), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def put(self, index_number, page_hash, results):
+        """Store (or refresh) a student's entry; written to a temp file and swapped in atomically"""
+        path = self._path(index_number)
+        entry = {'hash': page_hash, 'fetched_at': time.time(), 'results': results}
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write cache entry for {index_number}: {e}")
+    
+    def lookup_unchanged(self, index_number, page_hash):
+        """Return cached results if the page hash matches the cached one (and remember it), else None"""
+        entry = self.get(index_number)
+        if not entry or entry.get('hash') != page_hash:
+            return None
+        # Refresh the timestamp so stale-only mode counts from the last verification
+        self.put(index_number, page_hash, entry['results'])
+        self.mark_unchanged(index_number)
+        return entry['results']
+    
+    def lookup_fresh(self, index_number, ttl_seconds):
+        """Return cached results if the entry is younger than ttl_seconds (and remember it), else None"""
+        entry = self.get(index_number)
+        if not entry or time.time() - entry.get('fetched_at', 0) > ttl_seconds:
+            return None
+        self.mark_unchanged(index_number)
+        return entry['results']
+    
+    def mark_unchanged(self, index_number):
+        with self.lock:
+            self.unchanged.add(index_number)
+    
+    def was_unchanged(self, index_number):
+        with self.lock:
+            return index_number in self.unchanged
+    
+    def evict(self):
+        """Remove entries older than max_age, then the oldest entries until the cache fits in max_bytes"""
+        entries = []
+        now = time.time()
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age or name.endswith('.tmp'):
+                removed += self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        
+        total_size = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            removed += self._remove(path)
+            total_size -= size
+        
+        if removed:
+            print(f"🗑️ Evicted {removed} cache entries (age/size limits)")
+        return removed
+    
+    def clear(self):
+        removed = sum(self._remove(os.path.join(self.directory, name)) for name in os.listdir(self.directory))
+        with self.lock:
+            self.unchanged.clear()
+        return removed
+    
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+
+class BatchJournal:
+    """Append-only JSON-lines journal of finished students, used to resume an interrupted batch.
+    
+    Every finished student is written (and fsynced) as soon as they are graded, so a crash, sleep or
+    Stop loses at most the students that were still in flight.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+    
+    @classmethod
+    def for_csv(cls, csv_path):
+        """Journal belonging to a student CSV file (keyed on its absolute path)"""
+        abs_path = os.path.abspath(csv_path)
+        digest = hashlib.sha1(abs_path.encode('utf-8')).hexdigest()[:10]
+        name = os.path.splitext(os.path.basename(abs_path))[0]
+        return cls(os.path.join(JOURNAL_DIR, f"{name}-{digest}.jsonl"))
+    
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def load(self):
+        """Return {index: record} for every finished student; a torn last line is ignored"""
+        records = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    records[record['index']] = record
+        except OSError:
+            pass
+        return records
+    
+    def reset(self):
+        """Start a fresh journal (used when a batch is not resumed)"""
+        with self.lock:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+class HtmlArchive:
+    """Gzip-compressed JSON-lines archive of raw results pages, one {index, fetched_at, html} record per student.
+    
+    Each record is sync-flushed as it is added, so an interrupted run leaves a readable archive.
+    Re-parse it offline with reparse_archive().
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+        self.count = 0
+    
+    @classmethod
+    def for_run(cls, csv_path):
+        """New timestamped archive for a batch run of a student CSV file"""
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        return cls(os.path.join(ARCHIVE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.jsonl.gz"))
+    
+    def add(self, index_number, html):
+        line = json.dumps({'index': index_number, 'fetched_at': time.time(), 'html': html}, ensure_ascii=False) + "\n"
+        with self.lock:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self.file = gzip.open(self.path, 'ab')
+            self.file.write(line.encode('utf-8'))
+            self.file.flush(zlib.Z_SYNC_FLUSH)
+            self.count += 1
+    
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+    
+    @staticmethod
+    def load(path):
+        """Return {index: html}; the latest page wins and a truncated tail is ignored"""
+        pages = {}
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            try:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    pages[record['index']] = record['html']
+            except (EOFError, zlib.error):
+                pass
+        return pages
+
+def _ensure_openpyxl():
+    """Make sure pandas can write .xlsx files, installing openpyxl if needed"""
+    try:
+        import openpyxl
+    except ImportError:
+        print("The openpyxl module is not installed. Attempting to install it now...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "openpyxl"])
+        print("openpyxl installed successfully")
+        # Reimport pandas to ensure it now uses openpyxl
+        importlib.reload(pd.load())
+
+class ExcelResultsWriter:
+    """Per-student results rows kept in memory and written to the results workbook in batches.
+    
+    The existing workbook is read once. Rows are written every flush_rows new students or flush_seconds
+    seconds, whichever comes first, and on close(). Each write goes to a temporary file that then
+    atomically replaces the workbook, so the file on disk is always complete.
+    """
+    def __init__(self, excel_path, flush_rows=DEFAULT_EXCEL_FLUSH_ROWS, flush_seconds=DEFAULT_EXCEL_FLUSH_SECONDS):
+        # Ensure we're saving to a writable location
+        if not os.path.isabs(excel_path):
+            excel_path = os.path.join(OUTPUT_DIR, excel_path)
+        self.path = excel_path
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_seconds = flush_seconds
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.rows = {}  # index -> tuple of values in column order (shorter rows predate later columns)
+        self.columns = []
+        self.column_set = set()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+        self.flushes = 0
+        _ensure_openpyxl()
+        self._load()
+    
+    def _load(self):
+        if not os.path.exists(self.path):
+            print(f"Creating new Excel file: {self.path}")
+            return
+        try:
+            df = pd.read_excel(self.path, index_col=0, dtype=str).fillna('')
+        except Exception as file_error:
+            print(f"Error reading Excel file: {file_error}")
+            print(f"Creating new Excel file: {self.path}")
+            return
+        if df.index.name == RANKED_COLUMNS[0] and set(RANKED_COLUMNS[1:]) <= set(df.columns):
+            # A ranked export (older versions wrote it over this workbook): its rows are keyed by rank, not index
+            print(f"⚠️ {self.path} holds a ranked export, not per-student results; starting a new results sheet "
+                  f"(ranked exports are saved to {ranked_excel_path(self.path)})")
+            return
+        self.columns = [str(column) for column in df.columns]
+        self.column_set = set(self.columns)
+        for index_number, row in zip(df.index, df.itertuples(index=False, name=None)):
+            self.rows[str(index_number)] = row
+        print(f"Loaded existing Excel file: {self.path} ({len(self.rows)} rows)")
+    
+    def has_row(self, index_number):
+        with self.lock:
+            return str(index_number) in self.rows
+    
+    def add(self, index_number, results):
+        """Add or replace a student's row; writes the workbook when a flush is due"""
+        with self.lock:
+            for subject in results:
+                if subject not in self.column_set:
+                    self.column_set.add(subject)
+                    self.columns.append(subject)
+            # Grades repeat across the cohort; intern them so each row only holds references
+            self.rows[str(index_number)] = tuple(sys.intern(str(results.get(column, ''))) for column in self.columns)
+            self.pending += 1
+            due = (self.pending >= self.flush_rows
+                   or (self.flush_seconds and time.monotonic() - self.last_flush >= self.flush_seconds))
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """Write every row to the workbook now (atomic replace). Returns True if the rows were saved"""
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return True
+                columns = list(self.columns)
+                padding = ('',) * len(columns)
+                df = pd.DataFrame([row + padding[len(row):] for row in self.rows.values()],
+                                  index=list(self.rows), columns=columns)
+                saving = self.pending
+                self.pending = 0
+                self.last_flush = time.monotonic()
+            
+            root, ext = os.path.splitext(self.path)
+            temp_path = f"{root}.partial{ext or '.xlsx'}"
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                df.to_excel(temp_path)
+                os.replace(temp_path, self.path)
+                self.flushes += 1
+                print(f"Excel file saved successfully: {self.path} ({len(df)} rows)")
+                return True
+            except Exception as save_error:
+                print(f"Error saving Excel file: {save_error}")
+                
+                # Try saving as CSV as a fallback
+                try:
+                    csv_path = self.path.replace('.xlsx', '.csv')
+                    df.to_csv(csv_path + '.partial')
+                    os.replace(csv_path + '.partial', csv_path)
+                    print(f"Results saved as CSV instead: {csv_path}")
+                    return True
+                except Exception:
+                    print("Could not save as CSV either.")
+                    # Still unsaved: the next flush (or close()) tries again instead of reporting success
+                    with self.lock:
+                        self.pending += saving
+                    return False
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+    
+    def close(self):
+        """Write any rows that have not been saved yet"""
+        return self.flush()
+
+@contextlib.contextmanager
+def sqlite_connection(path, foreign_keys=False):
+    """A WAL-mode connection to an SQLite database that commits on success and rolls back on error.
+    
+    Opened per operation, so any thread can use the database; waits up to 30 seconds for a lock.
+    """
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if foreign_keys:
+            conn.execute("PRAGMA foreign_keys=ON")
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+class ResultsStore:
+    """SQLite database of graded runs: the system of record that Excel and CSV files are exported from.
+    
+    Tables: runs, students (latest name and email per index number), subjects (each distinct subject
+    text once, with its normalized subject code), subject_attempts (every subject row of every run),
+    gpa_snapshots (GPA and credits per student per run) and rankings. Attempts, snapshots and rankings
+    are indexed on index number, subjects on subject code. A run is written in a single transaction.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at REAL NOT NULL,
+            source TEXT,
+            credit_csv TEXT,
+            students INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS students (
+            index_number TEXT PRIMARY KEY,
+            name TEXT,
+            email TEXT,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS subjects (
+            subject_id INTEGER PRIMARY KEY,
+            subject TEXT NOT NULL UNIQUE,
+            subject_code TEXT
+        );
+        CREATE INDEX IF NOT EXISTS subjects_code ON subjects (subject_code);
+        CREATE TABLE IF NOT EXISTS subject_attempts (
+            run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+            index_number TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            subject_id INTEGER NOT NULL REFERENCES subjects (subject_id),
+            grade TEXT,
+            PRIMARY KEY (run_id, index_number, position)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS subject_attempts_index ON subject_attempts (index_number);
+        CREATE INDEX IF NOT EXISTS subject_attempts_subject ON subject_attempts (subject_id, run_id);
+        CREATE TABLE IF NOT EXISTS gpa_snapshots (
+            run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+            index_number TEXT NOT NULL,
+            gpa REAL NOT NULL,
+            total_credits REAL NOT NULL,
+            PRIMARY KEY (run_id, index_number)
+        );
+        CREATE INDEX IF NOT EXISTS gpa_snapshots_index ON gpa_snapshots (index_number);
+        CREATE TABLE IF NOT EXISTS rankings (
+            run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+            rank INTEGER NOT NULL,
+            index_number TEXT NOT NULL,
+            PRIMARY KEY (run_id, rank)
+        );
+        CREATE INDEX IF NOT EXISTS rankings_index ON rankings (index_number);
+    """
+    
+    def __init__(self, path=RESULTS_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+    
+    def _connect(self):
+        return sqlite_connection(self.path, foreign_keys=True)
+    
+    def save_run(self, student_results, ranked_data=None, source=None, credit_csv=None):
+        """Record a StudentStore (and its [(rank, record), ...] ranking) as a new run; returns the run id"""
+        now = time.time()
+        records = list(student_results)
+        with self._connect() as conn:
+            run_id = conn.execute("INSERT INTO runs (started_at, source, credit_csv, students) VALUES (?, ?, ?, ?)",
+                                  (now, source, credit_csv, len(records))).lastrowid
+            conn.executemany(
+                "INSERT OR REPLACE INTO students (index_number, name, email, updated_at) VALUES (?, ?, ?, ?)",
+                ((record.index, record.name, record.email, now) for record in records))
+            # Subject texts are shared by the whole cohort (the StudentStore has already interned them)
+            subject_texts = {subject for record in records for subject in record.results}
+            conn.executemany("INSERT OR IGNORE INTO subjects (subject, subject_code) VALUES (?, ?)",
+                             ((subject, subject_code_of(subject)) for subject in subject_texts))
+            subject_ids = dict(conn.execute("SELECT subject, subject_id FROM subjects"))
+            conn.executemany(
+                "INSERT INTO subject_attempts (run_id, index_number, position, subject_id, grade) VALUES (?, ?, ?, ?, ?)",
+                ((run_id, record.index, position, subject_ids[subject], grade)
+                 for record in records for position, (subject, grade) in enumerate(record.results.items())))
+            conn.executemany(
+                "INSERT INTO gpa_snapshots (run_id, index_number, gpa, total_credits) VALUES (?, ?, ?, ?)",
+                ((run_id, record.index, record.gpa, record.total_credits) for record in records))
+            if ranked_data:
+                conn.executemany("INSERT INTO rankings (run_id, rank, index_number) VALUES (?, ?, ?)",
+                                 ((run_id, rank, record.index) for rank, record in ranked_data))
+            # Keep the planner's statistics current (sampled, so this stays cheap as the database grows)
+            conn.execute("PRAGMA analysis_limit=400")
+            conn.execute("ANALYZE")
+        return run_id
+    
+    def latest_run_id(self):
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(run_id) FROM runs").fetchone()
+        return row[0]
+    
+    def runs(self, limit=20):
+        """[(run_id, started_at, source, students), ...], newest first"""
+        with self._connect() as conn:
+            return conn.execute("SELECT run_id, started_at, source, students FROM runs ORDER BY run_id DESC LIMIT ?",
+                                (limit,)).fetchall()
+    
+    def load_run(self, run_id=None):
+        """(StudentStore, [(rank, record), ...]) for a run (default: the latest), or (None, None) if there is none"""
+        run_id = run_id or self.latest_run_id()
+        if run_id is None:
+            return None, None
+        with self._connect() as conn:
+            students = conn.execute(
+                "SELECT g.index_number, s.name, s.email, g.gpa, g.total_credits FROM gpa_snapshots g "
+                "JOIN students s ON s.index_number = g.index_number WHERE g.run_id = ? ORDER BY g.rowid", (run_id,)).fetchall()
+            if not students:
+                return None, None
+            results = {}
+            subjects = dict(conn.execute("SELECT subject_id, subject FROM subjects"))
+            for index_number, subject_id, grade in conn.execute(
+                    "SELECT index_number, subject_id, grade FROM subject_attempts WHERE run_id = ? ORDER BY index_number, position", (run_id,)):
+                results.setdefault(index_number, {})[subjects[subject_id]] = grade
+            ranks = conn.execute("SELECT rank, index_number FROM rankings WHERE run_id = ? ORDER BY rank", (run_id,)).fetchall()
+        
+        student_results = StudentStore()
+        for index_number, name, email, gpa, total_credits in students:
+            student_results.put(index_number, name, email, gpa, total_credits, results.get(index_number, {}))
+        if not ranks:
+            # Runs saved without a ranking are ordered like rank_students
+            ranks = enumerate((record.index for record in sorted(student_results, key=lambda record: record.gpa, reverse=True)), 1)
+        ranked_data = []
+        for rank, index_number in ranks:
+            record = student_results.get(index_number)
+            record.rank = rank
+            ranked_data.append((rank, record))
+        return student_results, ranked_data
+    
+    def student_history(self, index_number):
+        """[(run_id, started_at, gpa, total_credits, rank or None), ...] for one student, oldest run first"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT g.run_id, r.started_at, g.gpa, g.total_credits, k.rank FROM gpa_snapshots g "
+                "JOIN runs r ON r.run_id = g.run_id "
+                "LEFT JOIN rankings k ON k.run_id = g.run_id AND k.index_number = g.index_number "
+                "WHERE g.index_number = ? ORDER BY g.run_id", (index_number,)).fetchall()
+    
+    def subject_grades(self, subject_code, run_id=None):
+        """[(index, name, subject, grade), ...] for every attempt at a subject code in a run (default: the latest)"""
+        run_id = run_id or self.latest_run_id()
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT a.index_number, s.name, j.subject, a.grade FROM subjects j "
+                "JOIN subject_attempts a ON a.subject_id = j.subject_id "
+                "JOIN students s ON s.index_number = a.index_number "
+                "WHERE j.subject_code = ? AND a.run_id = ? ORDER BY a.index_number, a.position",
+                (normalize_subject_code(subject_code), run_id)).fetchall()
+
+class EmailOutbox:
+    """Durable SQLite outbox of rank emails, one entry per (batch id, index number, rank).
+    
+    Emails are queued before anything is sent and each is marked sent as soon as it goes out, so
+    re-running a batch (or resuming one that died halfway) skips everyone who already has that email.
+    Entries that failed every attempt are retried when the batch is queued again. Delivery is at least
+    once: an email sent just before a crash, but not yet marked, is sent again.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS outbox (
+            batch_id TEXT NOT NULL,
+            index_number TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            to_email TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            queued_at REAL NOT NULL,
+            sent_at REAL,
+            PRIMARY KEY (batch_id, index_number, rank)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS outbox_status ON outbox (batch_id, status);
+    """
+    
+    def __init__(self, path=OUTBOX_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+    
+    def _connect(self):
+        return sqlite_connection(self.path)
+    
+    def enqueue(self, batch_id, messages):
+        """Queue [(index, rank, to_email, subject, body), ...]; returns (pending, already_sent) for the batch"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO outbox (batch_id, index_number, rank, to_email, subject, body, queued_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((batch_id, index, rank, to_email, subject, body, now) for index, rank, to_email, subject, body in messages))
+            # A new run of the batch gives emails that ran out of attempts another chance
+            conn.execute("UPDATE outbox SET status = 'pending', attempts = 0 WHERE batch_id = ? AND status = 'failed'", (batch_id,))
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM outbox WHERE batch_id = ? GROUP BY status", (batch_id,)))
+        return counts.get('pending', 0), counts.get('sent', 0)
+    
+    def pending(self, batch_id):
+        """[(index, rank, to_email, subject, body, attempts), ...] still to be sent for the batch, in rank order"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT index_number, rank, to_email, subject, body, attempts FROM outbox "
+                "WHERE batch_id = ? AND status = 'pending' ORDER BY rank, index_number", (batch_id,)).fetchall()
+    
+    def mark_sent(self, batch_id, index, rank):
+        with self._connect() as conn:
+            conn.execute("UPDATE outbox SET status = 'sent', attempts = attempts + 1, last_error = NULL, sent_at = ? "
+                         "WHERE batch_id = ? AND index_number = ? AND rank = ?", (time.time(), batch_id, index, rank))
+    
+    def mark_failed(self, batch_id, index, rank, error=None):
+        """Record a failed attempt; returns the attempts so far (the entry is marked failed at EMAIL_MAX_ATTEMPTS)"""
+        with self._connect() as conn:
+            conn.execute("UPDATE outbox SET attempts = attempts + 1, last_error = ?, "
+                         "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END "
+                         "WHERE batch_id = ? AND index_number = ? AND rank = ?",
+                         (error, EMAIL_MAX_ATTEMPTS, batch_id, index, rank))
+            row = conn.execute("SELECT attempts FROM outbox WHERE batch_id = ? AND index_number = ? AND rank = ?",
+                               (batch_id, index, rank)).fetchone()
+        return row[0] if row else EMAIL_MAX_ATTEMPTS
+    
+    def counts(self, batch_id):
+        """{status: entries} for the batch"""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM outbox WHERE batch_id = ? GROUP BY status", (batch_id,)))
+
+def dispatch_outbox(outbox, batch_id, mailer, workers=SMTP_WORKERS, on_progress=None, should_stop=None):
+    """Send a batch's pending outbox entries with a pool of sender threads; returns (sent, failed).
+    
+    A failed send goes back in the queue after EMAIL_RETRY_BACKOFF seconds (doubling per attempt) until
+    it reaches EMAIL_MAX_ATTEMPTS. on_progress(done, total) is called from the sender threads.
+    """
+    entries = outbox.pending(batch_id)
+    total = len(entries)
+    due = [(0.0, n, entry) for n, entry in enumerate(entries)]  # Heap of (due time, tie-breaker, entry)
+    sequence = itertools.count(total)
+    state = {'in_flight': 0, 'sent': 0, 'failed': 0}
+    ready = threading.Condition()
+    
+    def next_entry():
+        with ready:
+            while not (should_stop and should_stop()):
+                if due:
+                    wait = due[0][0] - time.monotonic()
+                    if wait <= 0:
+                        state['in_flight'] += 1
+                        return heapq.heappop(due)[2]
+                    ready.wait(min(wait, 0.5))
+                elif state['in_flight']:
+                    # A retry may still be queued by a sender that is in flight
+                    ready.wait(0.5)
+                else:
+                    return None
+            return None
+    
+    def sender():
+        while True:
+            entry = next_entry()
+            if entry is None:
+                return
+            index, rank, to_email, subject, body, attempts = entry
+            outcome = 'failed'
+            try:
+                if mailer.send(to_email, subject, body):
+                    outcome = 'sent'
+                    outbox.mark_sent(batch_id, index, rank)
+                else:
+                    attempts = outbox.mark_failed(batch_id, index, rank, mailer.last_error(to_email))
+                    outcome = 'failed' if attempts >= EMAIL_MAX_ATTEMPTS else None
+            except Exception as e:
+                # Usually the outbox database staying locked; an entry not marked sent is sent again on the next run
+                EMAIL_LOG.error("Outbox error for %s (index %s): %s", to_email, index, e, to=to_email, index=index)
+            finally:
+                # Always settle the entry, or the other senders would wait for it forever
+                with ready:
+                    state['in_flight'] -= 1
+                    if outcome:
+                        state[outcome] += 1
+                    else:
+                        retry_at = time.monotonic() + EMAIL_RETRY_BACKOFF * 2 ** (attempts - 1)
+                        heapq.heappush(due, (retry_at, next(sequence), (index, rank, to_email, subject, body, attempts)))
+                    done = state['sent'] + state['failed']
+                    ready.notify_all()
+            if outcome and on_progress:
+                on_progress(done, total)
+    
+    threads = [threading.Thread(target=sender, daemon=True) for _ in range(max(1, min(workers, total)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return state['sent'], state['failed']
+
+def rank_email_messages(ranked_data):
+    """Rank notification emails for a [(rank, record), ...] ranking, as [(index, rank, to_email, subject, body), ...]"""
+    messages = []
+    for rank, record in ranked_data:
+        name = record.name
+        index = record.index
+        # Use the email address from the CSV if available, otherwise fallback to generated email
+        to_email = record.email
+        if not to_email:
+            to_email = f"{index}@{EMAIL_DOMAIN}"
+            print(f"⚠️ No email address found for {name} (Index: {index}). Using {to_email} as fallback.")
+        
+        subject = "Your UCSC Academic Rank Notification"
+        
+        body = f"""
+Dear {name},
+
+This is an automated notification from the UCSC Result Fetcher system.
+
+Based on the latest batch processing of academic results, your current rank is:
+
+Rank: {rank}
+
+This ranking is calculated based on your GPA ({record.gpa:.2f}) among all processed students.
+Please note that this is for informational purposes only and may not reflect the official university standings.
+
+This is an auto-generated email. Please do not reply to this message.
+
+Best regards,
+UCSC Result Fetcher System
+"""
+        messages.append((index, rank, to_email, subject, body))
+    return messages
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Smallest value with at least pct% of the values at or below it (pct * n first, so whole ranks stay exact)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct * len(ordered) / 100.0) - 1))
+    return ordered[rank]
+
+class _PhaseSpan:
+    """Times one phase of one student's fetch and hands the duration to its PhaseTimer"""
+    __slots__ = ('timer', 'index_number', 'phase', 'start')
+    
+    def __init__(self, timer, index_number, phase):
+        self.timer = timer
+        self.index_number = index_number
+        self.phase = phase
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.record(self.index_number, self.phase, time.perf_counter() - self.start)
+        return False
+
+class _NoSpan:
+    """Shared do-nothing span handed out while timing is off"""
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NO_SPAN = _NoSpan()
 
-    def write(self, string):
-        self.text_widget.configure(state=tk.NORMAL)
-        self.text_widget.insert(tk.END, string)
-        self.text_widget.see(tk.END)  # Auto-scroll to the bottom
-        self.text_widget.configure(state=tk.DISABLED)
+class PhaseTimer:
+    """Per-phase latency samples for every student fetched (see FETCH_PHASES).
+    
+    A disabled timer hands out one shared no-op span, so leaving the fetch path instrumented
+    costs a method call per phase.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.samples = []  # (index, phase, seconds)
+    
+    def span(self, index_number, phase):
+        if not self.enabled:
+            return _NO_SPAN
+        return _PhaseSpan(self, index_number, phase)
+    
+    def record(self, index_number, phase, seconds):
+        with self.lock:
+            self.samples.append((index_number, phase, seconds))
+    
+    def summary(self):
+        """Return {phase: {count, mean_ms, p50_ms, p95_ms, p99_ms, total_s}} in FETCH_PHASES order"""
+        with self.lock:
+            samples = list(self.samples)
+        by_phase = {}
+        for _, phase, seconds in samples:
+            by_phase.setdefault(phase, []).append(seconds)
         
-    def flush(self):
-        pass
+        summary = {}
+        for phase in FETCH_PHASES + sorted(set(by_phase) - set(FETCH_PHASES)):
+            values = by_phase.get(phase)
+            if not values:
+                continue
+            summary[phase] = {
+                'count': len(values),
+                'mean_ms': sum(values) / len(values) * 1000,
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+                'total_s': sum(values),
+            }
+        return summary
+    
+    def log_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        print("\n⏱️ Fetch phase timings:")
+        print(f"{'phase':<16} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'total s':>9}")
+        for phase, row in summary.items():
+            print(f"{phase:<16} {row['count']:>6} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['total_s']:>9.2f}")
+    
+    def write(self, path=None):
+        """Write the summary and every raw sample to a JSON file and return its path"""
+        if path is None:
+            path = os.path.join(TIMINGS_DIR, f"phases-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self.lock:
+            samples = [{'index': index_number, 'phase': phase, 'ms': seconds * 1000}
+                       for index_number, phase, seconds in self.samples]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': self.summary(), 'samples': samples}, f, indent=2)
+        return path
+
+# Used when no timer is passed to fetch_results
+_NO_TIMER = PhaseTimer(enabled=False)
 
-class SimpleLogger:
-    # Log level: 0=none, 1=error only, 2=error+warning, 3=all
-    log_level = 2
+class _RankNode:
+    __slots__ = ('key', 'index', 'next', 'width')
     
-    @staticmethod
-    def info(message):
-        if SimpleLogger.log_level >= 3:
-            print(f"[INFO] {message}")
-        
-    @staticmethod
-    def success(message):
-        print(f"✓ {message}")
+    def __init__(self, key, index_number, levels):
+        self.key = key
+        self.index = index_number
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+class LiveRanking:
+    """Students ordered by GPA in an indexable skip list, updated in O(log n) as each student finishes.
+    
+    Students are identified by index number. Higher GPA ranks first; equal GPAs keep the order the
+    students were first added, exactly like the stable sort in rank_students. rank() and top() can be
+    read at any point during a batch.
+    """
+    MAX_LEVELS = 24
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.random = random.Random()
+        self.tail = _RankNode((float('inf'), 0), None, 0)
+        self.head = _RankNode(None, None, self.MAX_LEVELS)
+        self.head.next = [self.tail] * self.MAX_LEVELS
+        self.size = 0
+        self.keys = {}  # index -> (-gpa, sequence)
+        self.gpas = {}
+        self.sequence = 0
+    
+    @classmethod
+    def from_results(cls, students):
+        """Ranking of an existing StudentStore (in its insertion order)"""
+        ranking = cls()
+        for record in students:
+            ranking.update(record.index, record.gpa)
+        return ranking
+    
+    def __len__(self):
+        return self.size
+    
+    def update(self, index_number, gpa):
+        """Add a student or move them to their new GPA; returns their rank (1-based)"""
+        with self.lock:
+            old_key = self.keys.get(index_number)
+            if old_key is not None:
+                self._remove(old_key)
+                sequence = old_key[1]
+            else:
+                sequence = self.sequence
+                self.sequence += 1
+            key = (-gpa, sequence)
+            self.keys[index_number] = key
+            self.gpas[index_number] = gpa
+            self._insert(key, index_number)
+            return self._rank(key)
+    
+    def rank(self, index_number):
+        """Provisional rank of a student (1-based), or None if they have not been ranked"""
+        with self.lock:
+            key = self.keys.get(index_number)
+            return self._rank(key) if key is not None else None
+    
+    def top(self, k):
+        """[(rank, index, gpa), ...] for the first k students"""
+        with self.lock:
+            ranked = []
+            node = self.head.next[0]
+            while node is not self.tail and len(ranked) < k:
+                ranked.append((len(ranked) + 1, node.index, self.gpas[node.index]))
+                node = node.next[0]
+            return ranked
+    
+    def covers(self, students):
+        """True if this ranking holds exactly the students of this StudentStore at their current GPAs"""
+        with self.lock:
+            return (len(self.gpas) == len(students)
+                    and all(self.gpas.get(record.index) == record.gpa for record in students))
+    
+    def indexes(self):
+        """Every student's index number in rank order"""
+        return [index_number for _, index_number, _ in self.top(self.size)]
+    
+    def _insert(self, key, index_number):
+        chain = [None] * self.MAX_LEVELS
+        steps_at_level = [0] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
         
-    @staticmethod
-    def warning(message):
-        if SimpleLogger.log_level >= 2:
-            print(f"⚠️ {message}")
+        levels = 1
+        while levels < self.MAX_LEVELS and self.random.random() < 0.5:
+            levels += 1
+        new_node = _RankNode(key, index_number, levels)
+        steps = 0
+        for level in range(levels):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+    
+    def _remove(self, key):
+        chain = [None] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
         
-    @staticmethod
-    def error(message):
-        if SimpleLogger.log_level >= 1:
-            print(f"❌ {message}")
+        removed = chain[0].next[0]
+        for level in range(len(removed.next)):
+            previous = chain[level]
+            previous.width[level] += removed.width[level] - 1
+            previous.next[level] = removed.next[level]
+        for level in range(len(removed.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+    
+    def _rank(self, key):
+        position = 0
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position + 1
+
+class StudentRecord:
+    """One graded student. Subjects and grades are ids into the StudentStore's shared tables."""
+    __slots__ = ('store', 'index', 'name', 'email', 'gpa', 'total_credits', 'rank', 'subject_ids', 'grade_codes')
+    
+    def __init__(self, store, index_number, name, email, gpa, total_credits, subject_ids, grade_codes):
+        self.store = store
+        self.index = index_number
+        self.name = name
+        self.email = email
+        self.gpa = gpa
+        self.total_credits = total_credits
+        self.rank = None
+        self.subject_ids = subject_ids
+        self.grade_codes = grade_codes
+    
+    @property
+    def results(self):
+        """{subject: grade} in the order the results page listed them (without 'student_name')"""
+        subjects = self.store.subjects
+        grades = self.store.grades
+        return {subjects[subject_id]: grades[grade_code] for subject_id, grade_code in zip(self.subject_ids, self.grade_codes)}
+
+class StudentStore:
+    """Graded students keyed by index number, with subject and grade strings interned once per cohort.
+    
+    Each student is a StudentRecord holding two small arrays of table ids instead of a copy of their
+    results dict, so a subject title is stored once however many students took it. Keying by index
+    number means two students with the same name are both kept. Writers are serialised by the caller
+    (results_lock in the GUI); the tables only ever grow, so readers never need a lock.
+    """
+    
+    def __init__(self):
+        self.records = {}  # index -> StudentRecord, in the order students were first added
+        self.subjects = []
+        self.subject_ids = {}
+        self.grades = []
+        self.grade_codes = {}
+    
+    def __len__(self):
+        return len(self.records)
+    
+    def __contains__(self, index_number):
+        return index_number in self.records
+    
+    def __iter__(self):
+        return iter(list(self.records.values()))
+    
+    def get(self, index_number):
+        return self.records.get(index_number)
+    
+    def _intern(self, value, table, ids):
+        value_id = ids.get(value)
+        if value_id is None:
+            value_id = ids[value] = len(table)
+            table.append(value)
+        return value_id
+    
+    def put(self, index_number, name, email, gpa, total_credits, results):
+        """Store (or replace) a student from their parsed results dict; returns their StudentRecord"""
+        subject_ids = array.array('H')
+        grade_codes = array.array('H')
+        for subject, grade in results.items():
+            if subject == 'student_name':
+                continue
+            subject_ids.append(self._intern(subject, self.subjects, self.subject_ids))
+            grade_codes.append(self._intern(grade, self.grades, self.grade_codes))
+        record = StudentRecord(self, index_number, name, email, gpa, total_credits, subject_ids, grade_codes)
+        self.records[index_number] = record
+        return record
+    
+    def copy(self):
+        """A snapshot of the current students (sharing the interned tables) for use off the batch threads"""
+        snapshot = StudentStore()
+        snapshot.subjects, snapshot.subject_ids = self.subjects, self.subject_ids
+        snapshot.grades, snapshot.grade_codes = self.grades, self.grade_codes
+        snapshot.records = dict(self.records)
+        return snapshot
 
 class ResultFetcherGUI:
     def __init__(self, root):
@@ -202,10 +1961,14 @@ class ResultFetcherGUI:
         
         # Create tab frames
         main_tab = ttk.Frame(self.tabs, padding="10")
+        batch_tab = ttk.Frame(self.tabs, padding="10")
         settings_tab = ttk.Frame(self.tabs, padding="10")
+        ranking_tab = ttk.Frame(self.tabs, padding="10")
         
         # Add tabs to notebook
         self.tabs.add(main_tab, text="Results Fetcher")
+        self.tabs.add(ranking_tab, text="Live Ranking")
+        self.tabs.add(batch_tab, text="Batch Settings")
         self.tabs.add(settings_tab, text="SMTP Settings")
         
         # Create login frame
@@ -299,6 +2062,139 @@ class ResultFetcherGUI:
         self.log_widget.pack(fill=tk.BOTH, expand=True)
         self.log_widget.configure(state=tk.DISABLED)
         
+        # --- LIVE RANKING TAB ---
+        ranking_controls = ttk.Frame(ranking_tab)
+        ranking_controls.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(ranking_controls, text="Show top:").pack(side=tk.LEFT, padx=5)
+        self.top_k_var = tk.StringVar(value=str(DEFAULT_LIVE_TOP_K))
+        ttk.Spinbox(ranking_controls, from_=1, to=1000, textvariable=self.top_k_var, width=6, command=self.refresh_live_ranking).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(ranking_controls, text="Find index:").pack(side=tk.LEFT, padx=(20, 5))
+        self.rank_lookup_var = tk.StringVar()
+        ttk.Entry(ranking_controls, textvariable=self.rank_lookup_var, width=12).pack(side=tk.LEFT, padx=5)
+        ttk.Button(ranking_controls, text="Find", command=self.show_provisional_rank).pack(side=tk.LEFT, padx=5)
+        self.rank_lookup_label = ttk.Label(ranking_controls, text="", foreground="blue")
+        self.rank_lookup_label.pack(side=tk.LEFT, padx=10)
+        ttk.Button(ranking_controls, text="What-if Scenarios...", command=self.start_scenarios).pack(side=tk.RIGHT, padx=5)
+        
+        self.ranking_summary = ttk.Label(ranking_tab, text="No students ranked yet", foreground="gray")
+        self.ranking_summary.pack(fill=tk.X, pady=5)
+        
+        ranking_columns = ('rank', 'name', 'index', 'gpa', 'credits')
+        self.ranking_tree = ttk.Treeview(ranking_tab, columns=ranking_columns, show='headings', height=20)
+        for column, heading, width in zip(ranking_columns, ("Rank", "Name", "Index", "GPA", "Credits"), (60, 300, 120, 80, 80)):
+            self.ranking_tree.heading(column, text=heading)
+            self.ranking_tree.column(column, width=width, anchor=tk.W if column == 'name' else tk.CENTER)
+        self.ranking_tree.pack(fill=tk.BOTH, expand=True)
+        
+        # --- BATCH SETTINGS TAB ---
+        concurrency_frame = ttk.LabelFrame(batch_tab, text="Concurrency", padding="10")
+        concurrency_frame.pack(fill=tk.X, pady=10, padx=10)
+        
+        ttk.Label(concurrency_frame, text="Concurrent Workers:").grid(row=0, column=0, sticky=tk.W, pady=5, padx=5)
+        self.workers_var = tk.StringVar(value=str(DEFAULT_WORKERS))
+        ttk.Spinbox(concurrency_frame, from_=1, to=500, textvariable=self.workers_var, width=8).grid(row=0, column=1, sticky=tk.W, pady=5, padx=5)
+        
+        ttk.Label(concurrency_frame, text="Max Requests/sec:").grid(row=1, column=0, sticky=tk.W, pady=5, padx=5)
+        self.max_rate_var = tk.StringVar(value=str(DEFAULT_MAX_REQUESTS_PER_SEC))
+        ttk.Entry(concurrency_frame, textvariable=self.max_rate_var, width=10).grid(row=1, column=1, sticky=tk.W, pady=5, padx=5)
+        
+        ttk.Label(concurrency_frame, text="Connection Pool Size:").grid(row=2, column=0, sticky=tk.W, pady=5, padx=5)
+        self.pool_size_var = tk.StringVar(value=str(DEFAULT_POOL_SIZE))
+        ttk.Spinbox(concurrency_frame, from_=1, to=64, textvariable=self.pool_size_var, width=8).grid(row=2, column=1, sticky=tk.W, pady=5, padx=5)
+        
+        ttk.Label(concurrency_frame, text="Fetch Backend:").grid(row=3, column=0, sticky=tk.W, pady=5, padx=5)
+        self.backend_var = tk.StringVar(value=DEFAULT_BACKEND)
+        ttk.Combobox(concurrency_frame, textvariable=self.backend_var, values=FETCH_BACKENDS, state="readonly", width=10).grid(row=3, column=1, sticky=tk.W, pady=5, padx=5)
+        
+        self.adaptive_enabled = tk.BooleanVar(value=False)
+        ttk.Checkbutton(concurrency_frame, text="Adaptive concurrency (workers = upper limit)", variable=self.adaptive_enabled).grid(row=4, column=0, columnspan=2, sticky=tk.W, pady=5, padx=5)
+        
+        # Help text for concurrency settings
+        help_text = ("Workers fetch students in parallel (asyncio: sessions in flight).\nRequests/sec caps the load on the portal (0 = no limit).\n"
+                     "Adaptive: ramps up while the portal is fast, backs off on timeouts, 5xx and 429 (honouring Retry-After).")
+        ttk.Label(concurrency_frame, text=help_text, foreground="gray").grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=10, padx=5)
+        
+        # Results cache settings
+        cache_frame = ttk.LabelFrame(batch_tab, text="Results Cache", padding="10")
+        cache_frame.pack(fill=tk.X, pady=10, padx=10)
+        
+        self.cache_enabled = tk.BooleanVar(value=True)
+        ttk.Checkbutton(cache_frame, text="Skip unchanged students (reuse cached results)", variable=self.cache_enabled).grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=5, padx=5)
+        
+        self.stale_only = tk.BooleanVar(value=False)
+        ttk.Checkbutton(cache_frame, text="Stale-only: don't fetch students cached within the TTL", variable=self.stale_only).grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=5, padx=5)
+        
+        ttk.Label(cache_frame, text="Cache TTL (hours):").grid(row=2, column=0, sticky=tk.W, pady=5, padx=5)
+        self.cache_ttl_var = tk.StringVar(value=str(DEFAULT_CACHE_TTL_HOURS))
+        ttk.Entry(cache_frame, textvariable=self.cache_ttl_var, width=10).grid(row=2, column=1, sticky=tk.W, pady=5, padx=5)
+        
+        ttk.Button(cache_frame, text="Clear Cache", command=self.clear_cache).grid(row=3, column=0, sticky=tk.W, pady=5, padx=5)
+        ttk.Label(cache_frame, text=f"Location: {CACHE_DIR}", foreground="gray").grid(row=4, column=0, columnspan=2, sticky=tk.W, pady=5, padx=5)
+        
+        # Checkpoint settings
+        checkpoint_frame = ttk.LabelFrame(batch_tab, text="Checkpoint", padding="10")
+        checkpoint_frame.pack(fill=tk.X, pady=10, padx=10)
+        
+        self.resume_batch = tk.BooleanVar(value=False)
+        ttk.Checkbutton(checkpoint_frame, text="Resume previous run (only fetch students missing from its journal)", variable=self.resume_batch).grid(row=0, column=0, sticky=tk.W, pady=5, padx=5)
+        ttk.Label(checkpoint_frame, text=f"Finished students are journaled to: {JOURNAL_DIR}", foreground="gray").grid(row=1, column=0, sticky=tk.W, pady=5, padx=5)
+        
+        # Diagnostics settings
+        diagnostics_frame = ttk.LabelFrame(batch_tab, text="Diagnostics", padding="10")
+        diagnostics_frame.pack(fill=tk.X, pady=10, padx=10)
+        
+        self.record_timings = tk.BooleanVar(value=False)
+        ttk.Checkbutton(diagnostics_frame, text="Record per-phase timings (login, credentials, dashboard, results, parse)", variable=self.record_timings).grid(row=0, column=0, sticky=tk.W, pady=5, padx=5)
+        ttk.Label(diagnostics_frame, text=f"p50/p95/p99 are shown in the log and saved to: {TIMINGS_DIR}", foreground="gray").grid(row=1, column=0, sticky=tk.W, pady=5, padx=5)
+        
+        # Archive settings
+        archive_frame = ttk.LabelFrame(batch_tab, text="HTML Archive", padding="10")
+        archive_frame.pack(fill=tk.X, pady=10, padx=10)
+        
+        self.archive_pages = tk.BooleanVar(value=False)
+        ttk.Checkbutton(archive_frame, text="Save raw results pages to a compressed archive", variable=self.archive_pages).grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=5, padx=5)
+        ttk.Button(archive_frame, text="Re-rank from Archive...", command=self.start_reparse).grid(row=1, column=0, sticky=tk.W, pady=5, padx=5)
+        ttk.Label(archive_frame, text="Re-parses every page with the current credits CSV, no network", foreground="gray").grid(row=1, column=1, sticky=tk.W, pady=5, padx=5)
+        ttk.Label(archive_frame, text=f"Location: {ARCHIVE_DIR}", foreground="gray").grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=5, padx=5)
+        
+        # Excel output settings
+        excel_frame = ttk.LabelFrame(batch_tab, text="Excel Output", padding="10")
+        excel_frame.pack(fill=tk.X, pady=10, padx=10)
+        
+        ttk.Label(excel_frame, text="Write Excel every (students):").grid(row=0, column=0, sticky=tk.W, pady=5, padx=5)
+        self.excel_flush_rows_var = tk.StringVar(value=str(DEFAULT_EXCEL_FLUSH_ROWS))
+        ttk.Spinbox(excel_frame, from_=1, to=10000, textvariable=self.excel_flush_rows_var, width=8).grid(row=0, column=1, sticky=tk.W, pady=5, padx=5)
+        
+        ttk.Label(excel_frame, text="...or every (seconds):").grid(row=1, column=0, sticky=tk.W, pady=5, padx=5)
+        self.excel_flush_seconds_var = tk.StringVar(value=f"{DEFAULT_EXCEL_FLUSH_SECONDS:g}")
+        ttk.Entry(excel_frame, textvariable=self.excel_flush_seconds_var, width=10).grid(row=1, column=1, sticky=tk.W, pady=5, padx=5)
+        ttk.Label(excel_frame, text="Rows are kept in memory between writes; the workbook is replaced atomically and written once more at the end", foreground="gray").grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=5, padx=5)
+        
+        # Results database settings
+        database_frame = ttk.LabelFrame(batch_tab, text="Results Database", padding="10")
+        database_frame.pack(fill=tk.X, pady=10, padx=10)
+        
+        self.save_to_db = tk.BooleanVar(value=True)
+        ttk.Checkbutton(database_frame, text="Record every ranked run and export the ranked Excel from the database", variable=self.save_to_db).grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=5, padx=5)
+        ttk.Button(database_frame, text="Export from Database...", command=self.export_from_db).grid(row=1, column=0, sticky=tk.W, pady=5, padx=5)
+        ttk.Label(database_frame, text="Latest run as .xlsx or .csv", foreground="gray").grid(row=1, column=1, sticky=tk.W, pady=5, padx=5)
+        ttk.Label(database_frame, text=f"Location: {RESULTS_DB_PATH}", foreground="gray").grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=5, padx=5)
+        
+        # Output log settings
+        log_frame = ttk.LabelFrame(batch_tab, text="Output Log", padding="10")
+        log_frame.pack(fill=tk.X, pady=10, padx=10)
+        
+        ttk.Label(log_frame, text="Lines kept in the log window:").grid(row=0, column=0, sticky=tk.W, pady=5, padx=5)
+        self.log_max_lines_var = tk.StringVar(value=str(DEFAULT_LOG_MAX_LINES))
+        ttk.Spinbox(log_frame, from_=100, to=100000, increment=500, textvariable=self.log_max_lines_var, width=8).grid(row=0, column=1, sticky=tk.W, pady=5, padx=5)
+        ttk.Label(log_frame, text="Log levels:").grid(row=1, column=0, sticky=tk.W, pady=5, padx=5)
+        self.log_levels_var = tk.StringVar(value=DEFAULT_LOG_LEVELS)
+        ttk.Entry(log_frame, textvariable=self.log_levels_var, width=30).grid(row=1, column=1, sticky=tk.W, pady=5, padx=5)
+        ttk.Label(log_frame, text=f"e.g. warning,grades=info,fetch=debug ({', '.join(LOG_CATEGORIES)})", foreground="gray").grid(row=1, column=2, sticky=tk.W, pady=5, padx=5)
+        ttk.Label(log_frame, text=f"The full log of every session is written to {LOG_DIR} (structured JSON lines in {os.path.basename(LOG_JSON_PATH)})", foreground="gray").grid(row=2, column=0, columnspan=3, sticky=tk.W, pady=5, padx=5)
+        
         # --- SMTP SETTINGS TAB ---
         smtp_frame = ttk.LabelFrame(settings_tab, text="Email Configuration", padding="10")
         smtp_frame.pack(fill=tk.X, pady=10, padx=10)
@@ -324,14 +2220,24 @@ class ResultFetcherGUI:
         self.email_domain_var = tk.StringVar(value=EMAIL_DOMAIN)
         ttk.Entry(smtp_frame, textvariable=self.email_domain_var, width=30).grid(row=4, column=1, pady=5, padx=5)
         
+        ttk.Label(smtp_frame, text="Max Emails/sec:").grid(row=5, column=0, sticky=tk.W, pady=5, padx=5)
+        self.smtp_rate_var = tk.StringVar(value=str(SMTP_MAX_RATE))
+        ttk.Entry(smtp_frame, textvariable=self.smtp_rate_var, width=30).grid(row=5, column=1, pady=5, padx=5)
+        ttk.Label(smtp_frame, text="0 = no limit", foreground="gray").grid(row=5, column=2, sticky=tk.W, pady=5, padx=5)
+        
+        ttk.Label(smtp_frame, text="Sender Workers:").grid(row=6, column=0, sticky=tk.W, pady=5, padx=5)
+        self.smtp_workers_var = tk.StringVar(value=str(SMTP_WORKERS))
+        ttk.Entry(smtp_frame, textvariable=self.smtp_workers_var, width=30).grid(row=6, column=1, pady=5, padx=5)
+        ttk.Label(smtp_frame, text="SMTP connections used in parallel", foreground="gray").grid(row=6, column=2, sticky=tk.W, pady=5, padx=5)
+        
         # Add tooltip/help label
         help_text = "Note: For Gmail, use an 'App Password' instead of your regular password.\nGo to Google Account > Security > App Passwords"
         help_label = ttk.Label(smtp_frame, text=help_text, foreground="gray")
-        help_label.grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=10, padx=5)
+        help_label.grid(row=7, column=0, columnspan=2, sticky=tk.W, pady=10, padx=5)
         
         # Email toggle checkbox        self.send_emails_enabled = tk.BooleanVar(value=False)
         email_toggle_frame = ttk.Frame(smtp_frame)
-        email_toggle_frame.grid(row=6, column=0, columnspan=2, sticky=tk.W, pady=5, padx=5)
+        email_toggle_frame.grid(row=8, column=0, columnspan=2, sticky=tk.W, pady=5, padx=5)
         self.email_toggle = ttk.Checkbutton(
             email_toggle_frame, 
             text="Enable Email Notifications", 
@@ -365,19 +2271,48 @@ class ResultFetcherGUI:
         self.test_result_label = ttk.Label(test_frame, textvariable=self.test_result_var, font=("Arial", 10))
         self.test_result_label.grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=5, padx=5)
         
-        # Redirect stdout to the text widget
-        self.stdout_redirect = RedirectText(self.log_widget)
+        # Redirect stdout to the text widget (through a queue drained on the Tk thread) and the session log file
+        self.stdout_redirect = RedirectText(self.log_widget, self.root, DEFAULT_LOG_MAX_LINES, session_log_path())
         sys.stdout = self.stdout_redirect
+        self.root.after(LOG_PUMP_MS, self.stdout_redirect.pump)
         
         # Session for making requests
         self.session = None
         
-        # Student results and ranking data
-        self.student_results = {}
+        # Student results and ranking data, keyed by index number
+        self.student_results = StudentStore()
+        # Provisional ranking, kept up to date as batch students finish
+        self.ranking = LiveRanking()
+        self.ranking_refresh_pending = False
         
-        # Check dependencies when starting
+        # Results cache, checkpoint journal, adaptive concurrency controller, phase timer and HTML archive for the current batch run
+        self.controller = None
+        self.timer = None
+        self.archive = None
+        self.cache = None
+        self.stale_ttl = None
+        self.journal = None
+        self.excel_writer = None
+        self.email_thread = None
+        # Guards student_results and the live ranking from concurrent batch workers
+        self.results_lock = threading.Lock()
+        
+        # Check dependencies and import the heavy modules once the window is on screen
+        self.root.after(WARMUP_DELAY_MS, self.start_warm_up)
+    
+    def start_warm_up(self):
+        """Check dependencies and warm up the heavy imports in a background thread"""
+        threading.Thread(target=self.warm_up, daemon=True).start()
+    
+    def warm_up(self):
         if not check_dependencies():
-            messagebox.showwarning("Missing Dependencies", "Please install the missing dependencies before running.")
+            self.root.after(0, lambda: messagebox.showwarning("Missing Dependencies", "Please install the missing dependencies before running."))
+            return
+        try:
+            warm_up_imports()
+        except Exception as e:
+            # Not fatal here: the same import runs again (and reports) when a fetch needs it
+            print(f"⚠️ Could not preload modules: {e}")
     
     def browse_csv(self):
         """Open file dialog to select a CSV file"""
@@ -410,12 +2345,18 @@ class ResultFetcherGUI:
             self.update_status("Missing information: Enter Index and NIC", "red")
             return
         
-        # Check dependencies again before starting
+        # Check dependencies before starting (cached after the first check)
         if not check_dependencies():
             print("❌ Missing required dependencies. Please install them first.")
             self.update_status("Missing dependencies", "red")
             return
         
+        pool_size = self.read_pool_size()
+        if pool_size is None:
+            return
+        if not self.apply_log_settings():
+            return
+        
         # Set running state and reset stop flag
         self.running = True
         self.stop_requested = False
@@ -441,7 +2382,7 @@ class ResultFetcherGUI:
         # Start the process in a separate thread
         threading.Thread(
             target=self.run_fetching_process, 
-            args=(index_number, nic, excel_path), 
+            args=(index_number, nic, excel_path, pool_size, self.backend_var.get()), 
             daemon=True
         ).start()
     
@@ -454,11 +2395,56 @@ class ResultFetcherGUI:
             print(f"CSV file not found: {csv_path}")
             return
         
-        # Check dependencies again before starting
+        # Check dependencies before starting (cached after the first check)
         if not check_dependencies():
             print("Missing required dependencies. Please install them first.")
             return
         
+        # Read concurrency settings
+        try:
+            workers = int(self.workers_var.get().strip())
+            max_rate = float(self.max_rate_var.get().strip())
+            if workers < 1 or max_rate < 0:
+                raise ValueError("workers must be at least 1 and requests/sec cannot be negative")
+        except ValueError as e:
+            print(f"❌ Invalid concurrency settings: {e}")
+            self.update_status("Invalid concurrency settings", "red")
+            return
+        
+        pool_size = self.read_pool_size()
+        if pool_size is None:
+            return
+        if not self.apply_log_settings():
+            return
+        
+        # Results cache settings
+        cache = None
+        stale_ttl = None
+        if self.cache_enabled.get():
+            cache = ResultsCache()
+            if self.stale_only.get():
+                try:
+                    stale_ttl = float(self.cache_ttl_var.get().strip()) * 3600
+                except ValueError:
+                    print(f"❌ Invalid cache TTL: {self.cache_ttl_var.get()}")
+                    self.update_status("Invalid cache TTL", "red")
+                    return
+        
+        # Excel output settings
+        try:
+            excel_flush_rows = int(self.excel_flush_rows_var.get().strip())
+            excel_flush_seconds = float(self.excel_flush_seconds_var.get().strip())
+            if excel_flush_rows < 1 or excel_flush_seconds < 0:
+                raise ValueError("rows must be at least 1 and seconds cannot be negative")
+        except ValueError as e:
+            print(f"❌ Invalid Excel output settings: {e}")
+            self.update_status("Invalid Excel output settings", "red")
+            return
+        
+        if pool_size < workers:
+            print(f"⚠️ Connection pool size {pool_size} is smaller than {workers} workers. Using {workers} instead.")
+            pool_size = workers
+        
         # Set running state and reset stop flag
         self.running = True
         self.stop_requested = False
@@ -478,54 +2464,119 @@ class ResultFetcherGUI:
         self.progress_label.config(text="0%")
         
         # Clear student results
-        self.student_results = {}
+        self.student_results = StudentStore()
         
         # Start the process in a separate thread
         threading.Thread(
             target=self.run_batch_processing, 
-            args=(csv_path, excel_path), 
+            args=(csv_path, excel_path, workers, max_rate, pool_size, self.backend_var.get(), cache, stale_ttl, self.resume_batch.get(), self.adaptive_enabled.get(), self.record_timings.get(), self.archive_pages.get(), excel_flush_rows, excel_flush_seconds), 
             daemon=True
         ).start()
     
-    def run_batch_processing(self, csv_path, excel_path):
-        """Process multiple students from a CSV file"""
+    def clear_cache(self):
+        """Delete every cached results entry"""
+        removed = ResultsCache().clear()
+        print(f"🗑️ Cleared {removed} cached result(s) from {CACHE_DIR}")
+        self.update_status(f"Cleared {removed} cached result(s)", "green")
+    
+    def start_reparse(self):
+        """Pick an HTML archive and re-rank it offline in a separate thread"""
+        archive_path = filedialog.askopenfilename(
+            title="Select HTML Archive",
+            initialdir=ARCHIVE_DIR if os.path.isdir(ARCHIVE_DIR) else OUTPUT_DIR,
+            filetypes=[("HTML archives", "*.jsonl.gz"), ("All files", "*.*")]
+        )
+        if not archive_path:
+            return
+        
+        self.running = True
+        self.stop_requested = False
+        self.fetch_button.configure(state=tk.DISABLED)
+        self.batch_button.configure(state=tk.DISABLED)
+        self.student_results = StudentStore()
+        
+        threading.Thread(target=self.run_reparse, args=(archive_path, self.csv_var.get().strip()), daemon=True).start()
+    
+    def run_reparse(self, archive_path, csv_path=None):
+        """Re-parse an HTML archive with the current credit mapping and show the rankings"""
+        try:
+            credit_mapping = load_credit_csv(self.credit_csv_var.get().strip())
+            # Emails come from the student CSV when it is available
+            students = load_student_csv(csv_path) if csv_path and os.path.exists(csv_path) else None
+            emails = {student[0].strip(): student[2] for student in students or [] if len(student) > 2 and student[2]}
+            
+            self.root.after(0, self.update_status, "Re-parsing archive...", "blue")
+            self.student_results = reparse_archive(archive_path, credit_mapping, emails=emails)
+            self.reset_ranking()
+            self.display_rankings(source=archive_path)
+            self.root.after(0, self.update_status, f"Re-ranked {len(self.student_results)} students from archive", "green")
+        except Exception as e:
+            print(f"❌ Error re-parsing archive: {e}")
+            self.root.after(0, self.update_status, "Error re-parsing archive", "red")
+        finally:
+            self.running = False
+            self.root.after(0, lambda: self.fetch_button.configure(state=tk.NORMAL))
+            self.root.after(0, lambda: self.batch_button.configure(state=tk.NORMAL))
+    
+    def apply_log_settings(self):
+        """Apply the log window size and log levels from the UI. Returns False (and reports) if either is invalid"""
+        try:
+            max_lines = int(self.log_max_lines_var.get().strip())
+            if max_lines < 1:
+                raise ValueError("at least 1 line must be kept")
+        except ValueError as e:
+            print(f"❌ Invalid log window size: {e}")
+            self.update_status("Invalid log window size", "red")
+            return False
+        try:
+            set_log_levels(self.log_levels_var.get())
+        except ValueError as e:
+            print(f"❌ Invalid log levels: {e}")
+            self.update_status("Invalid log levels", "red")
+            return False
+        self.stdout_redirect.max_lines = max_lines
+        return True
+    
+    def read_pool_size(self):
+        """Read the connection pool size from the UI. Returns None (and reports) if it is invalid"""
         try:
+            pool_size = int(self.pool_size_var.get().strip())
+            if pool_size < 1:
+                raise ValueError("pool size must be at least 1")
+            return pool_size
+        except ValueError as e:
+            print(f"❌ Invalid connection pool size: {e}")
+            self.update_status("Invalid connection pool size", "red")
+            return None
+    
+    def run_batch_processing(self, csv_path, excel_path, workers=DEFAULT_WORKERS, max_rate=DEFAULT_MAX_REQUESTS_PER_SEC, pool_size=DEFAULT_POOL_SIZE, backend=DEFAULT_BACKEND, cache=None, stale_ttl=None, resume=False, adaptive=False, record_timings=False, archive_pages=False, excel_flush_rows=DEFAULT_EXCEL_FLUSH_ROWS, excel_flush_seconds=DEFAULT_EXCEL_FLUSH_SECONDS):
+        """Process multiple students from a CSV file using a pool of worker threads or the asyncio backend"""
+        # Results cache for this run (None = always fetch and parse everything)
+        self.cache = cache
+        self.stale_ttl = stale_ttl
+        # Checkpoint journal of finished students
+        self.journal = BatchJournal.for_csv(csv_path)
+        # Per-phase fetch timings (None = not recorded)
+        self.timer = PhaseTimer() if record_timings else None
+        # Raw results pages for offline re-parsing (None = not saved)
+        self.archive = HtmlArchive.for_run(csv_path) if archive_pages else None
+        self.excel_writer = None
+        try:
+            # Per-student Excel rows, buffered and written in batches
+            self.excel_writer = ExcelResultsWriter(excel_path, excel_flush_rows, excel_flush_seconds)
+            
             # Load credit CSV before processing students
             credit_csv_path = self.credit_csv_var.get().strip()
             credit_mapping = load_credit_csv(credit_csv_path)
+            # Warn about each unknown subject code once per run
+            credit_mapping.reset_missing()
             
             if not credit_mapping:
                 print("⚠️ No credit mapping loaded. GPA calculations may be inaccurate.")
             
             # Read student credentials from CSV file
-            students = []
-            try:
-                with open(csv_path, 'r') as f:
-                    reader = csv.reader(f)
-                    header = next(reader, None)  # Skip header row if exists
-                    
-                    # Check if the header row looks like a header or data
-                    if header and len(header) >= 2 and not header[0].isdigit():
-                        # It's a header, continue with next row
-                        print(f"Found header row: {header}")
-                        pass
-                    else:
-                        # No header or header is actually data, add it to students
-                        students.append(header)
-                    
-                    # Add remaining rows
-                    for row in reader:
-                        if len(row) >= 2:
-                            # Make sure each row has at least 3 elements (index, NIC, email)
-                            # If email is missing, use None so we can handle it later
-                            if len(row) < 3:
-                                print(f"⚠️ Row {row} has no email field. Using index@{EMAIL_DOMAIN} as fallback.")
-                                row_with_email = row + [None]  # Add None for missing email
-                                students.append(row_with_email)
-                            else:
-                                students.append(row)
-            except Exception as e:
-                print(f"Error reading CSV file: {e}")
+            students = load_student_csv(csv_path)
+            if students is None:
                 return
             
             if not students:
@@ -534,63 +2585,107 @@ class ResultFetcherGUI:
             
             print(f"Found {len(students)} student records in the CSV file.")
             
+            # Resume: restore finished students from the journal and only fetch the rest
+            if resume:
+                finished = self.journal.load()
+                rewritten = 0
+                for record in finished.values():
+                    self.student_results.put(record['index'], record['name'], record['email'],
+                                             record['gpa'], record['total_credits'], record['results'])
+                    # Rows still buffered when the last run stopped never reached the workbook
+                    if not self.excel_writer.has_row(record['index']):
+                        self.excel_writer.add(record['index'], record['results'])
+                        rewritten += 1
+                if rewritten:
+                    print(f"♻️ {rewritten} restored student(s) were missing from the workbook and will be written again")
+                students = [student for student in students if student[0].strip() not in finished]
+                print(f"♻️ Resuming: {len(finished)} student(s) restored from {self.journal.path}, {len(students)} left to fetch")
+            else:
+                self.journal.reset()
+            self.reset_ranking()
+            if cache:
+                cache.evict()
+                if stale_ttl is not None:
+                    print(f"Stale-only mode: students fetched within the last {stale_ttl / 3600:g} hour(s) are not fetched again")
+            if backend == 'asyncio' and not async_backend_available():
+                backend = 'threads'
+            concurrency = f"{workers} session(s) in flight on one event loop" if backend == 'asyncio' else f"{workers} worker(s)"
+            print(f"Using {concurrency}, max {max_rate:g} requests/sec" if max_rate > 0 else f"Using {concurrency}, no request rate limit")
+            
             # Initialize progress tracking
             total_students = len(students)
             processed_count = 0
             
-            # Process each student
-            for i, student in enumerate(students):
-                if self.stop_requested:
-                    print("Batch processing stopped by user.")
-                    break
-                
-                index_number = student[0].strip()
-                nic = student[1].strip()
+            # Shared across workers so the portal sees at most max_rate requests per second
+            rate_limiter = RateLimiter(max_rate, should_stop=lambda: self.stop_requested)
+            
+            # Adaptive mode: the controller decides how many of the workers may fetch at once
+            self.controller = None
+            if adaptive:
+                self.controller = AdaptiveConcurrency(workers, on_change=self.report_concurrency, should_stop=lambda: self.stop_requested)
+                print(f"🎚️ Adaptive concurrency: starting at {self.controller.current_limit}, up to {workers}")
+            
+            if backend == 'asyncio':
+                def on_result(i, student, results):
+                    nonlocal processed_count
+                    self.record_batch_result(i, student, results, credit_mapping, excel_path)
+                    processed_count += 1
+                    self.root.after(0, self.update_progress, (processed_count / total_students) * 100)
                 
-                print(f"\n--- Processing student {i+1}/{total_students}: Index {index_number} ---")
+                asyncio.run(fetch_batch_async(students, LOGIN_URL, workers, on_result, self, rate_limiter, pool_size, cache, stale_ttl, self.controller, self.timer, self.archive))
+            else:
+                # Keep-alive connections shared by all workers
+                transport = get_shared_transport(pool_size)
+                transport.reset_stats()
                 
-                # Fetch results for this student
-                results = fetch_results(index_number, nic, LOGIN_URL, self)
-                if results:
-                    # Store student and result
-                    student_name = extract_student_name(results) or f"Student {index_number}"
+                # Process students in parallel; progress is reported as each one finishes
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [
+                        executor.submit(self.process_batch_student, i, student, total_students, credit_mapping, excel_path, rate_limiter, transport)
+                        for i, student in enumerate(students)
+                    ]
                     
-                    # Calculate GPA with credit mapping
-                    credits_and_grades = extract_credits_and_grades(results, credit_mapping)
-                    gpa, total_credits = calculate_gpa(credits_and_grades)
-                          # Get student email from the row (index 2) if available, otherwise generate from index
-                    student_email = student[2] if len(student) > 2 and student[2] else f"{index_number}@{EMAIL_DOMAIN}"
-                    
-                    # Store for ranking, including full results for Excel export
-                    self.student_results[student_name] = {
-                        'index': index_number,
-                        'email': student_email,
-                        'gpa': gpa,
-                        'total_credits': total_credits,
-                        'results': results.copy()  # Store complete results for Excel
-                    }
-                    
-                    print(f"✓ {student_name} (Index: {index_number}) - GPA: {gpa:.2f} (Total Credits: {total_credits})")
-                    
-                    # Update Excel with results
-                    update_excel(index_number, results, excel_path)
-                else:
-                    print(f"❌ Failed to get results for student with index {index_number}")
-                
-                # Update progress
-                processed_count += 1
-                progress = (processed_count / total_students) * 100
-                self.root.after(0, self.update_progress, progress)
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except Exception as e:
+                            print(f"❌ Unhandled exception while processing a student: {e}")
+                        
+                        # Update progress
+                        processed_count += 1
+                        progress = (processed_count / total_students) * 100
+                        self.root.after(0, self.update_progress, progress)
                 
-                # Add a small delay to avoid overwhelming the server
-                time.sleep(1)
+                transport.log_stats()
+            
+            if self.stop_requested:
+                print("Batch processing stopped by user.")
+            
+            if cache:
+                print(f"♻️ {len(cache.unchanged)} student(s) unchanged since the last run (parsing and Excel writes skipped)")
+            
+            if self.archive and self.archive.count:
+                print(f"🗄️ {self.archive.count} results page(s) archived to {self.archive.path}")
+            
+            if self.timer and self.timer.samples:
+                self.timer.log_summary()
+                print(f"✓ Phase timings saved to {self.timer.write()}")
+            
+            # Write the remaining Excel rows before the ranked workbook is saved
+            self.excel_writer.close()
+            print(f"✓ Excel results written in {self.excel_writer.flushes} batch(es)")
             
             # Display final rankings
-            self.display_rankings()
+            self.display_rankings(source=csv_path)
             
         except Exception as e:
             print(f"Unhandled exception in batch processing: {e}")
         finally:
+            if self.excel_writer:
+                self.excel_writer.close()
+            if self.archive:
+                self.archive.close()
+            
             # Reset running state
             self.running = False
             self.stop_requested = False
@@ -600,148 +2695,258 @@ class ResultFetcherGUI:
             self.root.after(0, lambda: self.batch_button.configure(state=tk.NORMAL))
             self.root.after(0, lambda: self.stop_button.configure(state=tk.DISABLED))
     
-    def display_rankings(self):
-        """Display the final rankings of students based on GPA, save Excel in rank order, and send emails"""
-        if not self.student_results:
-            print("\n--- No student results available for ranking ---")
+    def process_batch_student(self, i, student, total_students, credit_mapping, excel_path, rate_limiter=None, transport=None):
+        """Fetch, grade and store a single student from the batch (runs on a worker thread)"""
+        # Students still queued when Stop is pressed are skipped
+        if self.stop_requested:
             return
         
-        print("\n========== STUDENT RANKINGS BY GPA ==========")
-        
-        # Sort students by GPA (descending)
-        sorted_students = sorted(
-            self.student_results.items(), 
-            key=lambda x: x[1]['gpa'], 
-            reverse=True
-        )
-        
-        # Display ranking and prepare rank data
-        ranked_data = []
-        for rank, (name, data) in enumerate(sorted_students, 1):
-            print(f"Rank {rank}: {name} (Index: {data['index']}) - GPA: {data['gpa']:.2f} (Credits: {data['total_credits']})")
-            data['rank'] = rank
-            ranked_data.append((rank, name, data))
+        index_number = student[0].strip()
+        nic = student[1].strip()
         
-        print("=============================================")
+        print(f"\n--- Processing student {i+1}/{total_students}: Index {index_number} ---")
         
-        # Save Excel in rank order
-        self.save_ranked_excel(ranked_data)
+        # In stale-only mode, recently fetched students are served straight from the cache
+        results = None
+        if self.cache and self.stale_ttl is not None:
+            results = self.cache.lookup_fresh(index_number, self.stale_ttl)
+            if results is not None:
+                print(f"⏭️ Index {index_number} was fetched within the cache TTL, not fetching again")
         
-        # Send emails to students
-        self.send_rank_emails(ranked_data)
+        # Fetch results for this student
+        if results is None:
+            results = self.fetch_with_controller(index_number, nic, rate_limiter, transport)
+        self.record_batch_result(i, student, results, credit_mapping, excel_path)
     
-    def save_ranked_excel(self, ranked_data):
-        """Save results to Excel in rank order with GPA and all results"""
-        excel_path = self.excel_var.get().strip()
-        
-        # Ensure we're saving to a writable location
-        if not os.path.isabs(excel_path):
-            excel_path = os.path.join(OUTPUT_DIR, excel_path)
-        
-        print(f"\n--- Saving ranked results to Excel: {excel_path} ---")
-        
-        # Collect all subjects across all students
-        all_subjects = set()
-        for _, _, data in ranked_data:
-            if 'results' in data:
-                # Filter out 'student_name' which isn't a subject
-                subjects = {k for k in data['results'].keys() if k != 'student_name'}
-                all_subjects.update(subjects)
-          # Build DataFrame with rank order
-        rows = []
-        for rank, name, data in ranked_data:
-            row = {
-                'Rank': rank,
-                'Name': name,
-                'Index': data['index'],
-                'Email': data.get('email', f"{data['index']}@{EMAIL_DOMAIN}"),
-                'GPA': data['gpa'],
-                'Credits': data['total_credits']
-            }
-            
-            # Add subject grades if available
-            if 'results' in data:
-                for subject in all_subjects:
-                    row[subject] = data['results'].get(subject, '')
+    def fetch_with_controller(self, index_number, nic, rate_limiter=None, transport=None):
+        """Fetch one student, taking a slot from the adaptive controller (if any) and retrying on back-off errors"""
+        controller = self.controller
+        results = None
+        for attempt in range(1, MAX_FETCH_ATTEMPTS + 1):
+            if controller and not controller.acquire():
+                return None
+            outcome = FetchOutcome()
+            start = time.monotonic()
+            try:
+                results = fetch_results(index_number, nic, LOGIN_URL, self, rate_limiter, transport, self.cache, outcome, self.timer, self.archive)
+            finally:
+                if controller:
+                    controller.release(time.monotonic() - start, outcome)
             
-            rows.append(row)
-          # Create DataFrame and save
+            if results is not None or not controller or not outcome.should_back_off or attempt == MAX_FETCH_ATTEMPTS:
+                break
+            if self.stop_requested:
+                break
+            print(f"↻ Retrying index {index_number} after {outcome.describe()} (attempt {attempt + 1}/{MAX_FETCH_ATTEMPTS})")
+        return results
+    
+    def report_concurrency(self, limit, reason):
+        """Show an adaptive concurrency change in the log and the status bar"""
+        print(f"🎚️ Concurrency limit {limit}: {reason}")
+        self.root.after(0, self.update_status, f"Concurrency {limit}: {reason}", "blue")
+    
+    def reset_ranking(self):
+        """Start a new provisional ranking from the current student_results"""
+        self.ranking = LiveRanking.from_results(self.student_results)
+        self.root.after(0, self.schedule_ranking_refresh)
+    
+    def schedule_ranking_refresh(self):
+        """Refresh the Live Ranking tab at most a few times a second (runs on the Tk thread)"""
+        if not self.ranking_refresh_pending:
+            self.ranking_refresh_pending = True
+            self.root.after(250, self.refresh_live_ranking)
+    
+    def refresh_live_ranking(self):
+        """Show the current top K students on the Live Ranking tab"""
+        self.ranking_refresh_pending = False
+        try:
+            top_k = max(1, int(self.top_k_var.get()))
+        except ValueError:
+            top_k = DEFAULT_LIVE_TOP_K
+        
+        # No results_lock here: the GUI must never wait for a batch worker
+        self.ranking_tree.delete(*self.ranking_tree.get_children())
+        for rank, index_number, gpa in self.ranking.top(top_k):
+            record = self.student_results.get(index_number)
+            name, total_credits = (record.name, record.total_credits) if record else ('', '')
+            self.ranking_tree.insert('', tk.END, values=(rank, name, index_number, f"{gpa:.2f}", total_credits))
+        state = "provisional" if self.running else "final"
+        self.ranking_summary.config(text=f"{len(self.ranking)} student(s) ranked ({state})")
+    
+    def show_provisional_rank(self):
+        index_number = self.rank_lookup_var.get().strip()
+        rank = self.ranking.rank(index_number)
+        record = self.student_results.get(index_number)
+        if rank is None or record is None:
+            self.rank_lookup_label.config(text=f"Index {index_number} not ranked yet")
+        else:
+            self.rank_lookup_label.config(text=f"{record.name}: rank {rank} of {len(self.ranking)}")
+    
+    def start_scenarios(self):
+        """Pick a scenarios JSON file and re-rank the current students under each scenario"""
+        if not self.student_results:
+            print("No student results yet: run a batch or re-rank an archive first.")
+            self.update_status("No results for what-if scenarios", "red")
+            return
+        scenarios_path = filedialog.askopenfilename(
+            title="Select What-if Scenarios",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if not scenarios_path:
+            return
+        threading.Thread(target=self.run_scenarios, args=(scenarios_path,), daemon=True).start()
+    
+    def run_scenarios(self, scenarios_path):
         try:
-            df = pd.DataFrame(rows)
-            df.to_excel(excel_path, index=False)
-            print(f"✓ Ranked Excel file saved successfully: {excel_path}")
+            scenarios = load_scenarios(scenarios_path)
+            credit_mapping = load_credit_csv(self.credit_csv_var.get().strip())
+            start = time.perf_counter()
+            rankings = run_scenarios(self.student_results.copy(), credit_mapping, scenarios)
+            print(f"\n✓ Ranked {len(self.student_results)} students under {len(rankings)} scenario(s) in {time.perf_counter() - start:.2f}s")
+            print_scenario_rankings(rankings)
+            print(f"✓ Scenario rankings saved to {save_scenario_rankings(rankings)}")
+            self.root.after(0, self.update_status, f"What-if: {len(scenarios)} scenario(s) ranked", "green")
         except Exception as e:
-            print(f"❌ Error saving ranked Excel file: {e}")
+            print(f"❌ Error running what-if scenarios: {e}")
+            self.root.after(0, self.update_status, "Error running what-if scenarios", "red")
+    
+    def record_batch_result(self, i, student, results, credit_mapping, excel_path):
+        """Grade a fetched student, store them for ranking and write their Excel row"""
+        index_number = student[0].strip()
+        if results:
+            # Store student and result
+            student_name = extract_student_name(results) or f"Student {index_number}"
+            
+            # Calculate GPA with credit mapping
+            credits_and_grades = extract_credits_and_grades(results, credit_mapping)
+            gpa, total_credits = calculate_gpa(credits_and_grades)
+            # Get student email from the row (index 2) if available, otherwise generate from index
+            student_email = student[2] if len(student) > 2 and student[2] else f"{index_number}@{EMAIL_DOMAIN}"
             
-            # Try saving as CSV as a fallback
+            with self.results_lock:
+                # Store for ranking, including the subject grades for Excel export
+                self.student_results.put(index_number, student_name, student_email, gpa, total_credits, results)
+                rank = self.ranking.update(index_number, gpa)
+            
+            # Buffer the Excel row (written in batches); unchanged students keep their row if the workbook still has it
+            if self.excel_writer:
+                if self.cache and self.cache.was_unchanged(index_number) and self.excel_writer.has_row(index_number):
+                    print(f"Results unchanged for index: {index_number}, Excel row kept")
+                else:
+                    self.excel_writer.add(index_number, results)
+            else:
+                update_excel(index_number, results, excel_path)
+            
+            # Checkpoint the finished student so a resumed run does not fetch them again
+            self.journal.append({
+                'index': index_number,
+                'name': student_name,
+                'email': student_email,
+                'gpa': gpa,
+                'total_credits': total_credits,
+                'results': results
+            })
+            
+            print(f"✓ {student_name} (Index: {index_number}) - GPA: {gpa:.2f} (Total Credits: {total_credits}) - provisional rank {rank}/{len(self.ranking)}")
+            self.root.after(0, self.schedule_ranking_refresh)
+        else:
+            print(f"❌ Failed to get results for student with index {index_number}")
+    
+    def display_rankings(self, source=None):
+        """Display the final rankings of students based on GPA, record them in the results database, export Excel in rank order, and send emails"""
+        if not self.student_results:
+            print("\n--- No student results available for ranking ---")
+            return
+        
+        ranked_data = rank_students(self.student_results, self.ranking)
+        self.root.after(0, self.schedule_ranking_refresh)
+        
+        # Record the run and export the ranked Excel from the database (or save it directly)
+        if self.save_to_db.get():
             try:
-                csv_path = excel_path.replace('.xlsx', '.csv')
-                df.to_csv(csv_path)
-                print(f"Results saved as CSV instead: {csv_path}")
-            except Exception as csv_err:
-                print(f"Could not save as CSV either: {csv_err}")
-    
-    def send_rank_emails(self, ranked_data):
-        """Send emails to students with their rank information"""
+                save_and_export_run(self.student_results, ranked_data, ranked_excel_path(self.excel_var.get().strip()),
+                                    source, self.credit_csv_var.get().strip())
+            except sqlite3.Error as e:
+                print(f"❌ Error saving to the results database: {e}")
+                self.save_ranked_excel(ranked_data)
+        else:
+            self.save_ranked_excel(ranked_data)
+        
+        # Queue emails to students (sent in the background)
+        self.send_rank_emails(ranked_data, source)
+    
+    def save_ranked_excel(self, ranked_data):
+        """Save results to Excel in rank order with GPA and all results (next to the per-student workbook)"""
+        save_ranked_excel(ranked_data, ranked_excel_path(self.excel_var.get().strip()))
+    
+    def export_from_db(self):
+        """Export the latest run in the results database to a ranked .xlsx or .csv file"""
+        export_path = filedialog.asksaveasfilename(
+            title="Export Latest Run",
+            initialdir=OUTPUT_DIR,
+            defaultextension=".xlsx",
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv")]
+        )
+        if not export_path:
+            return
+        threading.Thread(target=export_run, args=(export_path,), daemon=True).start()
+    
+    def send_rank_emails(self, ranked_data, source=None):
+        """Queue rank emails in the outbox and send them from a background thread"""
         # Check if email sending is enabled
         if not self.send_emails_enabled.get():
             print("\n--- Email notifications are disabled ---")
             self.update_status("Email notifications are disabled", "blue")
             return
-            
-        print("\n--- Sending rank notification emails to students ---")
-        self.update_status("Sending rank emails...", "blue")
-        
-        email_count = 0
-        total_emails = len(ranked_data)
-        
-        for i, (rank, name, data) in enumerate(ranked_data):
-            index = data['index']
-            # Use the email address from the CSV if available, otherwise fallback to generated email
-            to_email = data.get('email')
-            if not to_email:
-                to_email = f"{index}@{EMAIL_DOMAIN}"
-                print(f"⚠️ No email address found for {name} (Index: {index}). Using {to_email} as fallback.")
-            
-            subject = "Your UCSC Academic Rank Notification"
-            
-            body = f"""
-Dear {name},
-
-This is an automated notification from the UCSC Result Fetcher system.
-
-Based on the latest batch processing of academic results, your current rank is:
-
-Rank: {rank}
-
-This ranking is calculated based on your GPA ({data['gpa']:.2f}) among all processed students.
-Please note that this is for informational purposes only and may not reflect the official university standings.
-
-This is an auto-generated email. Please do not reply to this message.
-
-Best regards,
-UCSC Result Fetcher System
-"""
-            # Update progress for email sending
-            progress = ((i + 1) / total_emails) * 100
-            self.root.after(0, self.update_progress, progress)
-            self.update_status(f"Sending email {i+1}/{total_emails}: {name}", "blue")
-            
-            try:
-                if send_email(to_email, subject, body):
-                    print(f"✓ Email sent successfully to {name} (Index: {index}, Rank: {rank})")
-                    email_count += 1
-                else:
-                    print(f"❌ Failed to send email to {name} (Index: {index})")
-            except Exception as e:
-                print(f"❌ Error sending email to {index}: {e}")
-            
-            # Brief pause to avoid overwhelming the SMTP server
-            time.sleep(0.5)
         
-        print(f"\n--- Sent {email_count} rank notification emails ---")
-        self.update_status(f"Completed: Sent {email_count}/{total_emails} emails", "green" if email_count == total_emails else "orange")
+        print("\n--- Queueing rank notification emails to students ---")
+        messages = rank_email_messages(ranked_data)
+        
+        # The same student CSV (or archive) is the same batch, so re-runs skip emails already sent
+        batch_id = os.path.abspath(source) if source else 'unsourced'
+        try:
+            outbox = EmailOutbox()
+            pending, already_sent = outbox.enqueue(batch_id, messages)
+        except sqlite3.Error as e:
+            print(f"❌ Error queueing emails in the outbox: {e}")
+            self.update_status("Error queueing rank emails", "red")
+            return
+        print(f"📬 {pending} email(s) to send" + (f", {already_sent} already sent for this batch (skipped)" if already_sent else ""))
+        
+        previous = self.email_thread
+        self.email_thread = threading.Thread(target=self.drain_outbox, args=(outbox, batch_id, previous), daemon=True)
+        self.email_thread.start()
     
+    def drain_outbox(self, outbox, batch_id, previous=None):
+        """Send a batch's pending outbox entries (waits for an earlier batch's sending to finish first)"""
+        if previous is not None:
+            previous.join()
+        pending = len(outbox.pending(batch_id))
+        if not pending:
+            self.root.after(0, self.update_status, "All rank emails for this batch were already sent", "green")
+            return
+        
+        self.root.after(0, self.update_status, f"Sending {pending} rank email(s) in the background...", "blue")
+        
+        def on_progress(done, total):
+            self.root.after(0, self.update_progress, (done / total) * 100)
+            self.root.after(0, self.update_status, f"Sending rank emails: {done}/{total}", "blue")
+        
+        mailer = SMTPMailer(connections=SMTP_WORKERS, max_rate=SMTP_MAX_RATE)
+        try:
+            sent, failed = dispatch_outbox(outbox, batch_id, mailer, SMTP_WORKERS, on_progress)
+        except sqlite3.Error as e:
+            print(f"❌ Error reading the email outbox: {e}")
+            self.root.after(0, self.update_status, "Error sending rank emails", "red")
+            return
+        finally:
+            mailer.close()
+        
+        print(f"\n--- Sent {sent} rank notification emails"
+              + (f", {failed} failed after {EMAIL_MAX_ATTEMPTS} attempts (retried on the next run of this batch)" if failed else "")
+              + f" ({mailer.connects} SMTP connection(s), {mailer.reconnects} reconnect(s)) ---")
+        self.root.after(0, self.update_status, f"Completed: Sent {sent}/{pending} emails", "green" if not failed else "orange")
+
     def update_progress(self, progress):
         """Update the progress bar and label"""
         self.progress_var.set(progress)
@@ -756,12 +2961,14 @@ UCSC Result Fetcher System
         self.stop_requested = True
         self.stop_button.configure(state=tk.DISABLED)
     
-    def run_fetching_process(self, index_number, nic, excel_path):
+    def run_fetching_process(self, index_number, nic, excel_path, pool_size=DEFAULT_POOL_SIZE, backend=DEFAULT_BACKEND):
         """Run the main fetching process for a single student"""
         try:
             # Load credit CSV before processing
             credit_csv_path = self.credit_csv_var.get().strip()
             credit_mapping = load_credit_csv(credit_csv_path)
+            # Warn about each unknown subject code once per run
+            credit_mapping.reset_missing()
             
             if not credit_mapping:
                 print("⚠️ No credit mapping loaded. GPA calculations may be inaccurate.")
@@ -769,7 +2976,11 @@ UCSC Result Fetcher System
             # Set progress to indicate start
             self.update_progress(10)
             
-            results = fetch_results(index_number, nic, LOGIN_URL, self)
+            transport = get_shared_transport(pool_size)
+            transport.reset_stats()
+            results = fetch_results_with_backend(index_number, nic, LOGIN_URL, backend, self, transport)
+            if backend == 'threads':
+                transport.log_stats()
             self.update_progress(50)
             
             if results and not self.stop_requested:
@@ -783,14 +2994,9 @@ UCSC Result Fetcher System
                 print(f"\n--- Results for {student_name} ---")
                 print(f"GPA: {gpa:.2f} (Total Credits: {total_credits})")
                 
-                # Store for potential ranking, including full results for Excel
-                self.student_results[student_name] = {
-                    'index': index_number,
-                    'email': f"{index_number}@{EMAIL_DOMAIN}",  # Default for single student mode
-                    'gpa': gpa,
-                    'total_credits': total_credits,
-                    'results': results.copy()  # Store complete results for Excel
-                }
+                # Store for potential ranking, including the subject grades for Excel
+                # (default email for single student mode)
+                self.student_results.put(index_number, student_name, f"{index_number}@{EMAIL_DOMAIN}", gpa, total_credits, results)
                 
                 update_excel(index_number, results, excel_path)
                 print(f"Results updated for {index_number}")
@@ -817,12 +3023,21 @@ UCSC Result Fetcher System
     
     def save_smtp_settings(self):
         """Save SMTP settings from the UI to the global variables"""
-        global SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, EMAIL_DOMAIN
+        global SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, EMAIL_DOMAIN, SMTP_MAX_RATE, SMTP_WORKERS
         
         try:
+            max_rate = float(self.smtp_rate_var.get().strip())
+            if max_rate < 0:
+                raise ValueError("Max emails/sec cannot be negative")
+            workers = int(self.smtp_workers_var.get().strip())
+            if workers < 1:
+                raise ValueError("Sender workers must be at least 1")
+            
             # Update global variables with values from UI
             SMTP_SERVER = self.smtp_server_var.get().strip()
             SMTP_PORT = int(self.smtp_port_var.get().strip())
+            SMTP_MAX_RATE = max_rate
+            SMTP_WORKERS = workers
             SMTP_USER = self.smtp_user_var.get().strip()
             SMTP_PASSWORD = self.smtp_pass_var.get().strip()
             EMAIL_DOMAIN = self.email_domain_var.get().strip()
@@ -903,14 +3118,104 @@ UCSC Result Fetcher
             self.update_status(f"Error: {str(e)}", "red")
 
 
-def load_credit_csv(csv_path):
-    """Load credit mapping from CSV file. Returns dict {subject_code: credits}"""
-    credit_mapping = {}
+def load_student_csv(csv_path):
+    """Load student credentials from CSV file. Returns list of [index, nic, email] rows, or None on error"""
+    students = []
+    try:
+        with open(csv_path, 'r') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)  # Skip header row if exists
+            
+            # Check if the header row looks like a header or data
+            if header and len(header) >= 2 and not header[0].isdigit():
+                # It's a header, continue with next row
+                print(f"Found header row: {header}")
+            elif header:
+                # No header or header is actually data, add it to students
+                students.append(header)
+            
+            # Add remaining rows
+            for row in reader:
+                if len(row) >= 2:
+                    # Make sure each row has at least 3 elements (index, NIC, email)
+                    # If email is missing, use None so we can handle it later
+                    if len(row) < 3:
+                        print(f"⚠️ Row {row} has no email field. Using index@{EMAIL_DOMAIN} as fallback.")
+                        row_with_email = row + [None]  # Add None for missing email
+                        students.append(row_with_email)
+                    else:
+                        students.append(row)
+    except Exception as e:
+        print(f"Error reading CSV file: {e}")
+        return None
+    
+    return students
+
+def normalize_subject_code(subject_code):
+    """Canonical form of a subject code: upper case without whitespace ('is 1208' -> 'IS1208')"""
+    return ''.join(subject_code.split()).upper()
+
+class CreditIndex(dict):
+    """{normalized subject code: credits} as loaded from a credits CSV.
+    
+    Codes are normalized with normalize_subject_code, so 'IS 1208' in the CSV matches the IS1208
+    extracted from a results page. credits_for() remembers the codes it could not find and reports
+    each one only once until reset_missing() (called at the start of every run).
+    """
+    
+    def __init__(self, mapping=(), source=None):
+        super().__init__((normalize_subject_code(code), credits) for code, credits in dict(mapping).items())
+        self.source = source
+        self.missing = set()
+        self.missing_lock = threading.Lock()
+    
+    def credits_for(self, subject_code, default=1.0):
+        """Credits of a normalized subject code; warns the first time an unknown code is looked up"""
+        credits = self.get(subject_code)
+        if credits is not None:
+            return credits
+        with self.missing_lock:
+            first_miss = subject_code not in self.missing
+            self.missing.add(subject_code)
+        if first_miss:
+            CREDITS_LOG.warning("No credit mapping found for '%s' (looking in %d keys), counted as %s credit",
+                                subject_code, len(self), default, subject=subject_code)
+        return default
+    
+    def reset_missing(self):
+        with self.missing_lock:
+            self.missing.clear()
+
+def as_credit_index(credit_mapping):
+    """A CreditIndex for any {subject_code: credits} mapping (returned as is if it already is one)"""
+    return credit_mapping if isinstance(credit_mapping, CreditIndex) else CreditIndex(credit_mapping or {})
+
+# Loaded credit CSVs: absolute path -> ((mtime_ns, size), CreditIndex)
+_credit_indexes = {}
+_credit_indexes_lock = threading.Lock()
+
+def load_credit_csv(csv_path, verbose=True):
+    """Load credit mapping from CSV file. Returns a CreditIndex {subject_code: credits}.
     
+    The file is parsed once and the same CreditIndex is returned until its modification time or size changes.
+    verbose=False leaves out the "Loaded ..." summary (problems with the file are still reported).
+    """
     if not csv_path or not os.path.exists(csv_path):
-        print(f"⚠️ Credit CSV file not found: {csv_path}")
-        return credit_mapping
+        CREDITS_LOG.warning("Credit CSV file not found: %s", csv_path, path=csv_path)
+        return CreditIndex()
     
+    path = os.path.abspath(csv_path)
+    try:
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        signature = None
+    with _credit_indexes_lock:
+        cached = _credit_indexes.get(path)
+    if cached is not None and signature is not None and cached[0] == signature:
+        return cached[1]
+    
+    credit_mapping = {}
     try:
         with open(csv_path, 'r') as f:
             reader = csv.reader(f)
@@ -934,18 +3239,21 @@ def load_credit_csv(csv_path):
                         credits = float(row[1].strip())
                         credit_mapping[subject_code] = credits
                     except ValueError:
-                        print(f"⚠️ Invalid credit value for {subject_code}: {row[1]}")
+                        CREDITS_LOG.warning("Invalid credit value for %s: %s", subject_code, row[1], subject=subject_code, path=path)
         
-        print(f"✓ Loaded {len(credit_mapping)} subject credits from {csv_path}")
-        # Debug: Show first few keys
-        if credit_mapping:
-            sample_keys = list(credit_mapping.keys())[:5]
-            print(f"DEBUG: Sample credit keys: {sample_keys}")
-        return credit_mapping
+        credit_index = CreditIndex(credit_mapping, source=path)
+        if verbose:
+            CREDITS_LOG.success("Loaded %d subject credits from %s", len(credit_index), csv_path, path=path, subjects=len(credit_index))
+        if verbose and credit_index and CREDITS_LOG.enabled(logging.DEBUG):
+            CREDITS_LOG.debug("Sample credit keys: %s", list(credit_index.keys())[:5])
+        if signature is not None:
+            with _credit_indexes_lock:
+                _credit_indexes[path] = (signature, credit_index)
+        return credit_index
         
     except Exception as e:
-        print(f"❌ Error loading credit CSV: {e}")
-        return credit_mapping
+        CREDITS_LOG.error("Error loading credit CSV: %s", e, path=path)
+        return CreditIndex(credit_mapping, source=path)
 
 def extract_student_name(results):
     """Extract student name from results if available"""
@@ -953,15 +3261,17 @@ def extract_student_name(results):
         return results['student_name']
     return None
 
-def get_grade_points(grade):
-    """Get numerical grade points for comparison. Higher is better."""
+def get_grade_points(grade, grade_points=None):
+    """Get numerical grade points for comparison. Higher is better. (grade_points defaults to GRADE_POINTS)"""
+    if grade_points is None:
+        grade_points = GRADE_POINTS
     clean_grade = grade.strip().upper()
     
     # Special cases that should have lowest priority
     if clean_grade in ['MC', 'WH', 'NC', 'CM', 'F', 'E']:
         # Return grade points from the lookup table if available
-        if clean_grade in GRADE_POINTS:
-            return GRADE_POINTS[clean_grade]
+        if clean_grade in grade_points:
+            return grade_points[clean_grade]
         # For NC and CM, return -1 as they shouldn't be counted but should be replaced if a real grade exists
         elif clean_grade in ['NC', 'CM']:
             return -1.0
@@ -969,62 +3279,107 @@ def get_grade_points(grade):
             return 0.0
     
     # Regular grades from the lookup table
-    if clean_grade in GRADE_POINTS:
-        return GRADE_POINTS[clean_grade]
+    if clean_grade in grade_points:
+        return grade_points[clean_grade]
     
     # Unknown grades get lowest priority
     return -2.0
 
-def extract_credits_and_grades(results, credit_mapping=None):
-    """Extract credits and grades from results using external credit mapping"""
-    # First, process the results to handle duplicate subjects (including multiple attempts)
-    processed_subjects = {}
+# Subject code at the start of a subject: 2-3 capital letters followed by 4 digits
+SUBJECT_CODE_PATTERN = re.compile(r'([A-Z]{2,3}\s?\d{4})')
+
+# Subject text -> normalized code (or None), shared by every student of every run
+_subject_codes = {}
+SUBJECT_CODE_MEMO_SIZE = 65536
+
+def subject_code_of(subject_with_details):
+    """Normalized subject code of a subject ("SCS1301" from "SCS1301 Data Structures"), or None.
+    
+    Memoized: a cohort shares a few hundred subject strings, so each is matched against the pattern once.
+    """
+    subject_code = _subject_codes.get(subject_with_details, False)
+    if subject_code is False:
+        subject_code_match = SUBJECT_CODE_PATTERN.match(subject_with_details.strip())
+        subject_code = normalize_subject_code(subject_code_match.group(1)) if subject_code_match else None
+        if len(_subject_codes) >= SUBJECT_CODE_MEMO_SIZE:
+            _subject_codes.clear()
+        _subject_codes[subject_with_details] = subject_code
+    return subject_code
+
+def resolve_attempts(attempts, grade_points=None, log=None, best=None):
+    """Group (key, grade) attempts by key, keeping the highest grade.
     
-    if credit_mapping is None:
-        credit_mapping = {}
+    Returns ({key: grade} in first-seen order, {key: number of attempts} for keys seen more than once).
+    A later attempt replaces the kept one only if it is worth strictly more under grade_points (default
+    GRADE_POINTS). Grade points are only worked out for repeated keys, once per attempt. best, if given,
+    already holds each key's first attempt and is updated in place. log, if given, is called as
+    log(message, *args) for each repeated attempt (e.g. a StructuredLogger's info).
+    """
+    best = {} if best is None else best
+    repeated = {}  # key -> [points of the kept grade, attempts]
+    for key, grade in attempts:
+        if key not in best:
+            best[key] = grade
+            continue
+        
+        # Repeated attempt - keep the higher grade
+        existing_grade = best[key]
+        entry = repeated.get(key)
+        if entry is None:
+            entry = repeated[key] = [get_grade_points(existing_grade, grade_points), 1]
+        current_points = get_grade_points(grade, grade_points)
+        entry[1] += 1
+        if current_points > entry[0]:
+            if log:
+                log("Duplicate found for %s: Replacing %s with higher grade %s", key, existing_grade.strip(), grade.strip())
+            best[key] = grade
+            entry[0] = current_points
+        elif log:
+            log("Duplicate found for %s: Keeping existing grade %s over %s", key, existing_grade.strip(), grade.strip())
+    return best, {key: entry[1] for key, entry in repeated.items()}
+
+def canonical_subjects(results, verbose=True, grade_points=None):
+    """Normalize a results dict in one pass: [(subject_code, best grade, attempts), ...] in first-seen order.
     
+    Results whose subjects share a code are attempts at the same subject; the highest grade counts.
+    grade_points decides which attempt is highest (default GRADE_POINTS).
+    """
+    memo = _subject_codes
+    best = {}
+    repeats = []
     for subject_with_details, grade in results.items():
         # Skip non-subject entries (like student_name)
         if subject_with_details == 'student_name':
             continue
-            
-        # Extract subject code (e.g., "SCS1301" from "SCS1301 Data Structures" or "IS1201" from "IS1201 Programming")
-        # Subject code is typically at the start: 2-3 capital letters followed by 4 digits
-        subject_code_match = re.match(r'([A-Z]{2,3}\s?\d{4})', subject_with_details.strip())
-        if not subject_code_match:
-            print(f"⚠️ Could not extract subject code from: {subject_with_details}")
+        # One get() (never check-then-read: another thread's subject_code_of may clear the memo in between)
+        subject_code = memo.get(subject_with_details, False)
+        if subject_code is False:
+            subject_code = subject_code_of(subject_with_details)
+        if subject_code is None:
+            if verbose:
+                GRADES_LOG.warning("Could not extract subject code from: %s", subject_with_details)
             continue
-        
-        subject_code = subject_code_match.group(1)
-        current_grade = grade.strip().upper()
-        
-        # Handle duplicate subjects - keep the highest grade
-        if subject_code in processed_subjects:
-            existing_grade = processed_subjects[subject_code].strip().upper()
-            
-            # Compare grades and keep the higher one
-            current_points = get_grade_points(current_grade)
-            existing_points = get_grade_points(existing_grade)
-            
-            if current_points > existing_points:
-                print(f"📊 Duplicate found for {subject_code}: Replacing {existing_grade} with higher grade {current_grade}")
-                processed_subjects[subject_code] = grade
-            else:
-                print(f"📊 Duplicate found for {subject_code}: Keeping existing grade {existing_grade} over {current_grade}")
+        if subject_code in best:
+            repeats.append((subject_code, grade))
         else:
-            processed_subjects[subject_code] = grade
+            best[subject_code] = grade
+    
+    if not repeats:
+        return [(subject_code, grade, 1) for subject_code, grade in best.items()]
+    log = GRADES_LOG.info if verbose and GRADES_LOG.enabled(logging.INFO) else None
+    best, repeated = resolve_attempts(repeats, grade_points, log, best)
+    return [(subject_code, grade, repeated.get(subject_code, 1)) for subject_code, grade in best.items()]
+
+def extract_credits_and_grades(results, credit_mapping=None):
+    """Extract credits and grades from results using external credit mapping"""
+    credit_mapping = as_credit_index(credit_mapping)
     
-    # Now create credits_and_grades using credit mapping
+    # Create credits_and_grades from the canonical subjects (repeated attempts already resolved)
     credits_and_grades = []
     
-    for subject_code, grade in processed_subjects.items():
-        # Look up credits from mapping
-        if subject_code in credit_mapping:
-            credits = credit_mapping[subject_code]
-        else:
-            # Debug: Show what we're looking for
-            print(f"⚠️ No credit mapping found for '{subject_code}' (looking in {len(credit_mapping)} keys)")
-            credits = 1.0
+    for subject_code, grade, _ in canonical_subjects(results):
+        # Look up credits from mapping (unknown codes are warned about once and count as 1.0)
+        credits = credit_mapping.credits_for(subject_code)
         
         # Store (credits, grade, subject_code) for calculate_gpa
         credits_and_grades.append((credits, grade, subject_code))
@@ -1070,27 +3425,606 @@ def calculate_gpa(credits_and_grades):
     
     return gpa, total_credits
 
-def fetch_results(index_number, nic, login_url, gui_instance=None):
-    """Function to log in and fetch results table using requests instead of Selenium"""
-    logger = SimpleLogger()
+class CohortGPA:
+    """GPA and total credits for a whole cohort in one vectorised pass.
+    
+    Students are added one by one (repeated attempts resolved as in extract_credits_and_grades) into a
+    students x subjects grade-code matrix; compute() then applies the calculate_gpa rules to every
+    student at once: EN* subjects skipped, NC/CM excluded, MC/WH counted with 0 points, unknown grades
+    ignored and subjects missing from the credit mapping worth 1.0 credit. Each student's sums are
+    accumulated in their own subject order, so the results match calculate_gpa exactly.
+    
+    compute() also takes another credit mapping, grading scale or grade rules, so what-if scenarios
+    reuse the matrix (see run_scenarios).
+    """
+    def __init__(self, credit_mapping=None, grade_points=None):
+        self.credit_mapping = as_credit_index(credit_mapping)
+        self.grade_points = GRADE_POINTS if grade_points is None else grade_points
+        self.subjects = {}  # subject code -> column
+        self.grades = {}  # cleaned grade -> grade code
+        # Every student's subjects in calculate_gpa order, flattened (typed arrays so NumPy can view them without copying)
+        self.columns = array.array('q')
+        self.grade_codes = array.array('q')
+        self.lengths = array.array('q')
+        self._layout = None
+        # True once any student has two results with the same subject code (the grading scale then decides which counts)
+        self.has_repeated_codes = False
+    
+    def __len__(self):
+        return len(self.lengths)
+    
+    def add(self, results):
+        """Add one student's results dict; returns their row number"""
+        processed_subjects = canonical_subjects(results, verbose=False, grade_points=self.grade_points)
+        
+        subjects = self.subjects
+        grades = self.grades
+        for subject_code, grade, attempts in processed_subjects:
+            if attempts > 1:
+                self.has_repeated_codes = True
+            column = subjects.get(subject_code)
+            if column is None:
+                column = subjects[subject_code] = len(subjects)
+            clean_grade = grade.strip().upper()
+            grade_code = grades.get(clean_grade)
+            if grade_code is None:
+                grade_code = grades[clean_grade] = len(grades)
+            self.columns.append(column)
+            self.grade_codes.append(grade_code)
+        self.lengths.append(len(processed_subjects))
+        self._layout = None
+        return len(self.lengths) - 1
+    
+    def add_many(self, results_list):
+        """Add a list of results dicts in one go (the same rows as add() for each); returns the first row number.
+        
+        Subject texts and grades are factorized over the whole cohort, so each distinct text is normalized
+        once. Only students with two results sharing a subject code go through canonical_subjects.
+        """
+        first_row = len(self.lengths)
+        results_list = list(results_list)
+        if not results_list:
+            return first_row
+        sizes = np.fromiter((len(results) for results in results_list), dtype=np.int64, count=len(results_list))
+        total = int(sizes.sum())
+        if not total:
+            self.lengths.frombytes(np.zeros(len(results_list), dtype=np.int64).tobytes())
+            return first_row
+        subject_texts = np.fromiter(itertools.chain.from_iterable(results.keys() for results in results_list), dtype=object, count=total)
+        grade_texts = np.fromiter(itertools.chain.from_iterable(results.values() for results in results_list), dtype=object, count=total)
+        rows = np.repeat(np.arange(len(results_list), dtype=np.int64), sizes)
+        
+        # Distinct subject texts -> columns (-1 for student_name and texts without a subject code)
+        text_ids, texts = pd.factorize(subject_texts)
+        subjects = self.subjects
+        text_columns = np.full(len(texts), -1, dtype=np.int64)
+        for n, text in enumerate(texts):
+            subject_code = None if text == 'student_name' else subject_code_of(text)
+            if subject_code is not None:
+                column = subjects.get(subject_code)
+                if column is None:
+                    column = subjects[subject_code] = len(subjects)
+                text_columns[n] = column
+        
+        columns = text_columns[text_ids]
+        keep = columns >= 0
+        rows, columns = rows[keep], columns[keep]
+        
+        # Distinct grades of the subject results -> grade codes
+        grades = self.grades
+        grade_ids, distinct_grades = pd.factorize(grade_texts[keep])
+        grade_code_of = np.empty(len(distinct_grades), dtype=np.int64)
+        for n, grade in enumerate(distinct_grades):
+            clean_grade = grade.strip().upper()
+            grade_code = grades.get(clean_grade)
+            if grade_code is None:
+                grade_code = grades[clean_grade] = len(grades)
+            grade_code_of[n] = grade_code
+        grade_codes = grade_code_of[grade_ids]
+        
+        # Students with repeated subject codes: the grading scale decides which attempt counts
+        keys = rows * len(subjects) + columns
+        ordered_keys = np.sort(keys)
+        if (ordered_keys[1:] == ordered_keys[:-1]).any():
+            repeated = pd.Index(keys).duplicated(keep=False)
+            self.has_repeated_codes = True
+            repeated_rows = np.unique(rows[repeated])
+            single = ~np.isin(rows, repeated_rows)
+            resolved = []
+            for row in repeated_rows.tolist():
+                for subject_code, grade, _ in canonical_subjects(results_list[row], verbose=False, grade_points=self.grade_points):
+                    clean_grade = grade.strip().upper()
+                    grade_code = grades.get(clean_grade)
+                    if grade_code is None:
+                        grade_code = grades[clean_grade] = len(grades)
+                    resolved.append((row, subjects[subject_code], grade_code))
+            resolved = np.array(resolved, dtype=np.int64).reshape(-1, 3)
+            rows = np.concatenate([rows[single], resolved[:, 0]])
+            columns = np.concatenate([columns[single], resolved[:, 1]])
+            grade_codes = np.concatenate([grade_codes[single], resolved[:, 2]])
+            # Stable, so every student's subjects stay in canonical_subjects order
+            order = np.argsort(rows, kind='stable')
+            rows, columns, grade_codes = rows[order], columns[order], grade_codes[order]
+        
+        self.columns.frombytes(columns.astype(np.int64).tobytes())
+        self.grade_codes.frombytes(grade_codes.astype(np.int64).tobytes())
+        self.lengths.frombytes(np.bincount(rows, minlength=len(results_list)).astype(np.int64).tobytes())
+        self._layout = None
+        return first_row
+    
+    def credit_vector(self, credit_mapping=None):
+        """Credits per subject column (1.0 for subjects missing from the credit mapping)"""
+        credit_mapping = self.credit_mapping if credit_mapping is None else as_credit_index(credit_mapping)
+        return np.array([credit_mapping.get(code, 1.0) for code in self.subjects], dtype=float)
+    
+    def missing_credits(self, credit_mapping=None):
+        credit_mapping = self.credit_mapping if credit_mapping is None else as_credit_index(credit_mapping)
+        return [code for code in self.subjects if code not in credit_mapping]
+    
+    def _flat_positions(self):
+        lengths = np.frombuffer(self.lengths, dtype=np.int64)
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        positions = np.arange(len(rows)) - np.repeat(starts, lengths)
+        return rows, positions, lengths
+    
+    def grade_matrix(self):
+        """students x subjects matrix of grade codes (-1 = not taken); codes index self.grades"""
+        matrix = np.full((len(self.lengths), len(self.subjects)), -1, dtype=np.int32)
+        rows, _, _ = self._flat_positions()
+        matrix[rows, np.frombuffer(self.columns, dtype=np.int64)] = np.frombuffer(self.grade_codes, dtype=np.int64)
+        return matrix
+    
+    def _position_layout(self):
+        """(order, grade_at, taken) students x positions matrices: the column and grade code of each
+        student's k-th subject, and whether that cell holds a subject at all (cached until add())"""
+        if self._layout is None:
+            rows, positions, lengths = self._flat_positions()
+            count = len(lengths)
+            width = int(lengths.max()) if count else 0
+            order = np.zeros((count, width), dtype=np.int64)
+            grade_at = np.zeros((count, width), dtype=np.int64)
+            taken = np.zeros((count, width), dtype=bool)
+            order[rows, positions] = np.frombuffer(self.columns, dtype=np.int64)
+            grade_at[rows, positions] = np.frombuffer(self.grade_codes, dtype=np.int64)
+            taken[rows, positions] = True
+            self._layout = (order, grade_at, taken)
+        return self._layout
+    
+    def compute(self, credit_mapping=None, grade_points=None, excluded_grades=('NC', 'CM'), zero_point_grades=('MC', 'WH')):
+        """Return (gpa, total_credits) arrays, one entry per student in the order they were added.
+        
+        By default the engine's own credit mapping and grading scale are used with the calculate_gpa
+        rules; pass others to evaluate a what-if scenario on the same matrix.
+        """
+        count = len(self.lengths)
+        if count == 0 or not self.columns:
+            return np.zeros(count), np.zeros(count)
+        grade_points = self.grade_points if grade_points is None else grade_points
+        
+        # Grade rules as lookup tables over the grade codes
+        points = np.zeros(len(self.grades))
+        counted = np.zeros(len(self.grades), dtype=bool)
+        for grade, code in self.grades.items():
+            if grade in excluded_grades:
+                continue
+            if grade in zero_point_grades:
+                counted[code] = True
+            elif grade in grade_points:
+                points[code] = grade_points[grade]
+                counted[code] = True
+        credits = self.credit_vector(credit_mapping)
+        credited_subject = np.array([not code.strip().upper().startswith('EN') for code in self.subjects], dtype=bool)
+        
+        order, grade_at, taken = self._position_layout()
+        mask = taken & counted[grade_at] & credited_subject[order]
+        subject_credits = np.where(mask, credits[order], 0.0)
+        subject_points = np.where(mask, credits[order] * points[grade_at], 0.0)
+        
+        # Accumulate position by position (not np.sum's pairwise order) to reproduce calculate_gpa's rounding
+        total_points = np.zeros(count)
+        total_credits = np.zeros(count)
+        for k in range(order.shape[1]):
+            total_points += subject_points[:, k]
+            total_credits += subject_credits[:, k]
+        
+        gpa = np.zeros(count)
+        np.divide(total_points, total_credits, out=gpa, where=total_credits > 0)
+        return gpa, total_credits
+
+def cohort_gpas(results_list, credit_mapping=None):
+    """[(gpa, total_credits), ...] for a list of results dicts, computed with CohortGPA"""
+    engine = CohortGPA(credit_mapping)
+    engine.add_many(results_list)
+    missing = engine.missing_credits()
+    if missing:
+        print(f"⚠️ No credit mapping found for {len(missing)} subject(s), counted as 1.0 credit: {', '.join(missing)}")
+    gpa, total_credits = engine.compute()
+    return list(zip(gpa.tolist(), total_credits.tolist()))
+
+class GPAScenario:
+    """A what-if grading scenario: credit and grade point changes on top of the current ones.
+    
+    credits: {subject_code: credits} overriding the base credit mapping (credit_mapping replaces it).
+    grade_points: {grade: points} overriding GRADE_POINTS.
+    excluded_grades are left out of the GPA entirely; zero_point_grades count their credits with 0 points.
+    """
+    def __init__(self, name, credits=None, credit_mapping=None, grade_points=None,
+                 excluded_grades=('NC', 'CM'), zero_point_grades=('MC', 'WH')):
+        self.name = name
+        self.credits = credits or {}
+        self.credit_mapping = credit_mapping
+        self.grade_points = grade_points or {}
+        self.excluded_grades = tuple(grade.strip().upper() for grade in excluded_grades)
+        self.zero_point_grades = tuple(grade.strip().upper() for grade in zero_point_grades)
+    
+    @classmethod
+    def from_dict(cls, spec, base_dir='.'):
+        """Scenario from a JSON object, e.g. {"name": "MC not counted", "excluded_grades": ["NC", "CM", "MC"]}.
+        "credit_csv" loads a whole credit mapping (relative to base_dir)."""
+        credit_mapping = None
+        if spec.get('credit_csv'):
+            credit_mapping = load_credit_csv(os.path.join(base_dir, spec['credit_csv']), verbose=False)
+        return cls(
+            spec['name'],
+            credits={code: float(value) for code, value in spec.get('credits', {}).items()},
+            credit_mapping=credit_mapping,
+            grade_points={grade.strip().upper(): float(value) for grade, value in spec.get('grade_points', {}).items()},
+            excluded_grades=spec.get('excluded_grades', ('NC', 'CM')),
+            zero_point_grades=spec.get('zero_point_grades', ('MC', 'WH')),
+        )
+    
+    def resolve(self, base_credit_mapping):
+        """(credit_mapping, grade_points) for this scenario"""
+        credit_mapping = CreditIndex(base_credit_mapping if self.credit_mapping is None else self.credit_mapping)
+        credit_mapping.update(CreditIndex(self.credits))
+        grade_points = dict(GRADE_POINTS)
+        grade_points.update(self.grade_points)
+        return credit_mapping, grade_points
+
+def load_scenarios(path):
+    """Read a JSON list of scenario objects (see GPAScenario.from_dict)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        specs = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    return [GPAScenario.from_dict(spec, base_dir) for spec in specs]
+
+def _attempt_order(grades, grade_points):
+    """How get_grade_points orders these grades under a scale (decides which repeated attempt is kept)"""
+    priorities = [get_grade_points(grade, grade_points) for grade in grades]
+    distinct = sorted(set(priorities))
+    return tuple(distinct.index(priority) for priority in priorities)
+
+def run_scenarios(student_results, credit_mapping=None, scenarios=()):
+    """Rank an already parsed cohort under several what-if scenarios without fetching anything.
+    
+    student_results is the StudentStore built by a batch run or an archive re-parse. A "baseline" scenario
+    (the current credits and GRADE_POINTS) always comes first. Returns {scenario name: [(rank, name,
+    index, gpa, total_credits), ...]}, with ties ordered as in rank_students.
+    """
+    credit_mapping = credit_mapping or {}
+    records = list(student_results)
+    names = [record.name for record in records]
+    indexes = [record.index for record in records]
+    # Every distinct raw grade is already in the store's grade table
+    all_grades = sorted({grade.strip().upper() for grade in student_results.grades})
+    engines = {}
+    
+    def engine_for(grade_points):
+        # The matrix is built once per distinct attempt order; scales that keep the same order share it,
+        # and so does every scale when no student has two results with the same subject code
+        key = _attempt_order(all_grades, grade_points)
+        if engines and not any(engine.has_repeated_codes for engine in engines.values()):
+            return next(iter(engines.values()))
+        if key not in engines:
+            engine = CohortGPA(credit_mapping, grade_points)
+            engine.add_many(record.results for record in records)
+            engines[key] = engine
+        return engines[key]
+    
+    rankings = {}
+    for scenario in [GPAScenario('baseline')] + list(scenarios):
+        scenario_credits, scenario_points = scenario.resolve(credit_mapping)
+        engine = engine_for(scenario_points)
+        gpa, total_credits = engine.compute(scenario_credits, scenario_points, scenario.excluded_grades, scenario.zero_point_grades)
+        # Stable sort on -GPA keeps tied students in their original order, like rank_students
+        order = np.argsort(-gpa, kind='stable')
+        rankings[scenario.name] = [
+            (rank, names[row], indexes[row], float(gpa[row]), float(total_credits[row]))
+            for rank, row in enumerate(order.tolist(), 1)
+        ]
+    return rankings
+
+def print_scenario_rankings(rankings, top=10):
+    """Print each scenario's top students and how many ranks moved compared with the baseline"""
+    baseline = {index_number: rank for rank, _, index_number, _, _ in rankings.get('baseline', [])}
+    for scenario_name, ranked in rankings.items():
+        moved = sum(1 for rank, _, index_number, _, _ in ranked if baseline.get(index_number, rank) != rank)
+        print(f"\n========== {scenario_name}: {moved} student(s) change rank ==========")
+        for rank, name, index_number, gpa, total_credits in ranked[:top]:
+            change = baseline.get(index_number, rank) - rank
+            movement = f" (▲{change})" if change > 0 else f" (▼{-change})" if change < 0 else ""
+            print(f"Rank {rank}: {name} (Index: {index_number}) - GPA: {gpa:.2f} (Credits: {total_credits}){movement}")
+
+def save_scenario_rankings(rankings, excel_path=None):
+    """Write every scenario's ranking to its own sheet of an Excel workbook and return its path"""
+    if excel_path is None:
+        excel_path = os.path.join(OUTPUT_DIR, f"whatif-{time.strftime('%Y%m%d-%H%M%S')}.xlsx")
+    baseline = {index_number: rank for rank, _, index_number, _, _ in rankings.get('baseline', [])}
+    used_names = set()
+    with pd.ExcelWriter(excel_path) as writer:
+        for scenario_name, ranked in rankings.items():
+            # Excel sheet names: at most 31 characters, none of []:*?/\ and unique
+            sheet_name = re.sub(r'[\[\]:*?/\\]', '_', scenario_name)[:31] or 'scenario'
+            suffix = 2
+            while sheet_name in used_names:
+                sheet_name = f"{sheet_name[:28]}_{suffix}"
+                suffix += 1
+            used_names.add(sheet_name)
+            rows = [{'Rank': rank, 'Baseline Rank': baseline.get(index_number), 'Name': name, 'Index': index_number,
+                     'GPA': gpa, 'Credits': total_credits}
+                    for rank, name, index_number, gpa, total_credits in ranked]
+            pd.DataFrame(rows).to_excel(writer, sheet_name=sheet_name, index=False)
+    return excel_path
+
+# Headers sent with every portal request to mimic a browser
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+class SoupPageParser:
+    """Extracts the login form and results rows with BeautifulSoup's pure-Python 'html.parser' (always available)"""
+    name = 'html.parser'
+    
+    def login_form(self, html):
+        """Return (action, {hidden name: value}, [text/password input names]) for the first form, or None"""
+        soup = bs4.BeautifulSoup(html, 'html.parser')
+        form = soup.find('form')
+        if not form:
+            return None
+        hidden = [(field.get('name', ''), field.get('value', '')) for field in form.find_all('input', type='hidden')]
+        inputs = [field.get('name') for field in form.find_all('input', type=['text', 'password'])]
+        return form.get('action', ''), hidden, inputs
+    
+    def results(self, html):
+        """Return (h3 text or None, number of tables, [(subject, grade), ...], alert-danger text or None)"""
+        soup = bs4.BeautifulSoup(html, 'html.parser')
+        name_element = soup.find('h3')
+        name_text = name_element.get_text(strip=True) if name_element else None
+        
+        tables = soup.find_all('table', {'class': 'table-bordered'})
+        rows = []
+        for table in tables:
+            for row in table.find_all('tr')[1:]:  # Skip header row
+                cols = row.find_all('td')
+                if len(cols) >= 5:  # subject, year, semester, credits, result
+                    rows.append((cols[0].text.strip(), cols[4].text.strip()))
+        
+        error_text = None
+        if not tables:
+            error_msg = soup.find('div', {'class': 'alert-danger'})
+            if error_msg:
+                error_text = error_msg.text.strip()
+        return name_text, len(tables), rows, error_text
+
+class LxmlPageParser:
+    """Same extraction as SoupPageParser on lxml's C parser, walking only the h3 and table-bordered rows"""
+    name = 'lxml'
+    
+    _TABLES = "//table[contains(concat(' ', normalize-space(@class), ' '), ' table-bordered ')]"
+    _ALERT = "//div[contains(concat(' ', normalize-space(@class), ' '), ' alert-danger ')]"
+    
+    def __init__(self):
+        import lxml.html
+        from lxml import etree
+        self._fromstring = lxml.html.fromstring
+        self._tables = etree.XPath(self._TABLES)
+        self._alert = etree.XPath(self._ALERT)
+    
+    def login_form(self, html):
+        doc = self._fromstring(html)
+        form = next(doc.iter('form'), None)
+        if form is None:
+            return None
+        hidden = []
+        inputs = []
+        for field in form.iter('input'):
+            field_type = field.get('type')
+            if field_type == 'hidden':
+                hidden.append((field.get('name', ''), field.get('value', '')))
+            elif field_type in ('text', 'password'):
+                inputs.append(field.get('name'))
+        return form.get('action', ''), hidden, inputs
+    
+    def results(self, html):
+        doc = self._fromstring(html)
+        name_element = next(doc.iter('h3'), None)
+        name_text = ''.join(text.strip() for text in name_element.itertext()) if name_element is not None else None
+        
+        tables = self._tables(doc)
+        rows = []
+        for table in tables:
+            for row in list(table.iter('tr'))[1:]:  # Skip header row
+                cols = list(row.iter('td'))
+                if len(cols) >= 5:  # subject, year, semester, credits, result
+                    rows.append((cols[0].text_content().strip(), cols[4].text_content().strip()))
+        
+        error_text = None
+        if not tables:
+            alerts = self._alert(doc)
+            if alerts:
+                error_text = alerts[0].text_content().strip()
+        return name_text, len(tables), rows, error_text
+
+HTML_PARSER_BACKENDS = {'lxml': LxmlPageParser, 'html.parser': SoupPageParser}
+_html_parsers = {}
+
+def get_html_parser(name=None):
+    """Return the page parser for 'lxml', 'html.parser' or 'auto' (lxml if installed, html.parser otherwise)"""
+    name = name or DEFAULT_HTML_PARSER
+    if name not in _html_parsers:
+        parser = None
+        if name in ('auto', 'lxml'):
+            try:
+                parser = LxmlPageParser()
+            except ImportError:
+                if name == 'lxml':
+                    print("⚠️ The lxml parser needs lxml (pip install lxml). Falling back to html.parser.")
+        _html_parsers[name] = parser or SoupPageParser()
+    return _html_parsers[name]
+
+def set_html_parser(name):
+    """Select the HTML parser used by parse_login_form and parse_results_page"""
+    global DEFAULT_HTML_PARSER
+    if name not in HTML_PARSERS:
+        raise ValueError(f"Unknown HTML parser: {name} (choose from {', '.join(HTML_PARSERS)})")
+    DEFAULT_HTML_PARSER = name
+
+def _parse_with_fallback(method, html, parser=None):
+    """Run a page parser method, retrying with html.parser if the fast parser chokes on the page"""
+    page_parser = get_html_parser(parser)
+    try:
+        return getattr(page_parser, method)(html)
+    except Exception:
+        if isinstance(page_parser, SoupPageParser):
+            raise
+        return getattr(get_html_parser('html.parser'), method)(html)
+
+def parse_login_form(html, login_url, index_number, nic, logger=None, parser=None):
+    """Parse the login page. Returns (action_url, form_data) with the credentials filled in, or None if no form was found"""
+    logger = logger or PARSE_LOG
+    
+    # Parse the HTML to identify the form and check for hidden fields
+    form = _parse_with_fallback('login_form', html, parser)
+    
+    if not form:
+        logger.error("Could not find form on the page.")
+        return None
+    action, hidden_fields, input_names = form
+    
+    # Get the form action URL
+    if not action:
+        action = login_url
+    elif not action.startswith('http'):
+        # Handle relative URLs
+        if action.startswith('/'):
+            base_url = '/'.join(login_url.split('/')[:3])  # http(s)://domain
+            action = base_url + action
+        else:
+            action = login_url.rstrip('/') + '/' + action
+    
+    logger.info("Form action URL: %s", action)
+    
+    # Prepare form data
+    form_data = {}
+    for name, value in hidden_fields:
+        if name:
+            form_data[name] = value
+    
+    # Add the user credentials
+    if len(input_names) >= 2:
+        index_field_name = input_names[0] if input_names[0] is not None else 'index'
+        nic_field_name = input_names[1] if input_names[1] is not None else 'nic'
+        form_data[index_field_name] = index_number
+        form_data[nic_field_name] = nic
+    else:
+        # Default field names
+        form_data['index'] = index_number
+        form_data['nic'] = nic
+    
+    return action, form_data
+
+def parse_results_page(html, logger=None, parser=None):
+    """Parse the results page into a {subject: grade} dict (plus 'student_name' if found)"""
+    logger = logger or PARSE_LOG
+    
+    logger.info("Looking for results table...")
+    name_text, table_count, rows, error_text = _parse_with_fallback('results', html, parser)
+    
+    # Extract student name if available
+    student_name = None
+    if name_text:
+        name_match = re.search(r'Name\s*:\s*([^,]+)', name_text)
+        if name_match:
+            student_name = name_match.group(1).strip()
+            logger.info("Found student name: %s", student_name)
+    
+    results = {}
+    if student_name:
+        results['student_name'] = student_name
+        
+    # Find ALL results tables (one for each year)
+    if table_count:
+        logger.success("Found %d results table(s)!", table_count)
+        
+        # Rows repeating the same subject keep the highest grade; different subjects sharing a
+        # code are resolved later by canonical_subjects. Credits will be looked up from CSV later
+        rows = [(subject_with_name, grade) for subject_with_name, grade in rows if subject_with_name != 'student_name']
+        results.update(resolve_attempts(rows, log=logger.info if logger.enabled(logging.INFO) else None)[0])
+    else:
+        # If no table found, check for login errors
+        if error_text is not None:
+            logger.error("Login error: %s", error_text)
+        else:
+            logger.error("Results table not found. Please check your credentials.")
+    
+    return results
+
+def parse_results_with_cache(index_number, html, cache=None, logger=None):
+    """Parse the results page, or return the cached results if the page is unchanged since the last run"""
+    if cache is None:
+        return parse_results_page(html, logger)
+    
+    page_hash = ResultsCache.hash_page(html)
+    cached = cache.lookup_unchanged(index_number, page_hash)
+    if cached is not None:
+        (logger or PARSE_LOG).info("Results page unchanged since last run, using cached results")
+        return cached
+    
+    results = parse_results_page(html, logger)
+    if results:
+        cache.put(index_number, page_hash, results)
+    return results
+
+def fetch_results(index_number, nic, login_url, gui_instance=None, rate_limiter=None, transport=None, cache=None, outcome=None, timer=None, archive=None):
+    """Function to log in and fetch results table using requests instead of Selenium.
+    
+    If a RateLimiter is given, every portal request waits for it first (shared across batch workers).
+    Connections come from the given PooledTransport, or the shared one if none is given.
+    With a ResultsCache, an unchanged results page returns the cached results without parsing.
+    If a FetchOutcome is given, it records how the attempt ended (for AdaptiveConcurrency).
+    If a PhaseTimer is given, each request, rate limiter wait and the parse are timed.
+    If an HtmlArchive is given, the raw results page is saved to it before parsing.
+    """
+    if outcome is None:
+        outcome = FetchOutcome()
+    if timer is None:
+        timer = _NO_TIMER
+    logger = FETCH_LOG.bind(index=index_number)
     
-    # Create a session to maintain cookies
+    # Create a session to maintain cookies (connections are pooled across students)
     logger.info("Initializing HTTP session...")
-    session = requests.Session()
+    if transport is None:
+        transport = get_shared_transport()
+    session = transport.new_session()
     
     # Set headers to mimic a browser
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-    }
+    headers = BROWSER_HEADERS
     
     try:
         # Get the initial page to extract any CSRF token if needed
-        logger.info(f"Connecting to {login_url}...")
-        response = session.get(login_url, headers=headers)
+        logger.info("Connecting to %s...", login_url)
+        if rate_limiter:
+            with timer.span(index_number, 'rate_limit_wait'):
+                if not rate_limiter.acquire():
+                    logger.info("Process terminated by user")
+                    return None
+        with timer.span(index_number, 'login_page'):
+            response = session.get(login_url, headers=headers, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         
         # Check for stop request
@@ -1098,52 +4032,21 @@ def fetch_results(index_number, nic, login_url, gui_instance=None):
             logger.info("Process terminated by user")
             return None
         
-        # Parse the HTML to identify the form and check for hidden fields
-        soup = BeautifulSoup(response.text, 'html.parser')
-        form = soup.find('form')
-        
-        if not form:
-            logger.error("Could not find form on the page.")
+        login_form = parse_login_form(response.text, login_url, index_number, nic, logger)
+        if not login_form:
             return None
-        
-        # Get the form action URL
-        action = form.get('action', '')
-        if not action:
-            action = login_url
-        elif not action.startswith('http'):
-            # Handle relative URLs
-            if action.startswith('/'):
-                base_url = '/'.join(login_url.split('/')[:3])  # http(s)://domain
-                action = base_url + action
-            else:
-                action = login_url.rstrip('/') + '/' + action
-        
-        logger.info(f"Form action URL: {action}")
-          # Prepare form data
-        form_data = {}
-        hidden_inputs = form.find_all('input', type='hidden')
-        for hidden in hidden_inputs:
-            name = hidden.get('name', '')
-            value = hidden.get('value', '')
-            if name:
-                form_data[name] = value
-        
-        # Add the user credentials
-        input_fields = form.find_all('input', type=['text', 'password'])
-        if len(input_fields) >= 2:
-            index_field_name = input_fields[0].get('name', 'index')
-            nic_field_name = input_fields[1].get('name', 'nic')
-            form_data[index_field_name] = index_number
-            form_data[nic_field_name] = nic
-        else:
-            # Default field names
-            form_data['index'] = index_number
-            form_data['nic'] = nic
+        action, form_data = login_form
         
         logger.info("Submitting credentials...")
         
         # Submit the form
-        response = session.post(action, data=form_data, headers=headers, allow_redirects=True)
+        if rate_limiter:
+            with timer.span(index_number, 'rate_limit_wait'):
+                if not rate_limiter.acquire():
+                    logger.info("Process terminated by user")
+                    return None
+        with timer.span(index_number, 'login_post'):
+            response = session.post(action, data=form_data, headers=headers, allow_redirects=True, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         
         # Check for stop request
@@ -1153,7 +4056,13 @@ def fetch_results(index_number, nic, login_url, gui_instance=None):
         
         # Step 2: After login, navigate to dashboard to get results link
         logger.info("Login successful, navigating to dashboard...")
-        response = session.get(DASHBOARD_URL, headers=headers)
+        if rate_limiter:
+            with timer.span(index_number, 'rate_limit_wait'):
+                if not rate_limiter.acquire():
+                    logger.info("Process terminated by user")
+                    return None
+        with timer.span(index_number, 'dashboard'):
+            response = session.get(DASHBOARD_URL, headers=headers, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         
         # Check for stop request
@@ -1163,151 +4072,381 @@ def fetch_results(index_number, nic, login_url, gui_instance=None):
         
         # Step 3: Navigate to results page
         logger.info("Navigating to results page...")
-        response = session.get(RESULTS_URL, headers=headers)
+        if rate_limiter:
+            with timer.span(index_number, 'rate_limit_wait'):
+                if not rate_limiter.acquire():
+                    logger.info("Process terminated by user")
+                    return None
+        with timer.span(index_number, 'results_page'):
+            response = session.get(RESULTS_URL, headers=headers, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         
         # Check for stop request
         if gui_instance and gui_instance.stop_requested:
             logger.info("Process terminated by user")
             return None
-          # Now parse the results page
-        logger.info("Looking for results table...")
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract student name if available
-        student_name = None
-        name_element = soup.find('h3')
-        if name_element:
-            name_text = name_element.get_text(strip=True)
-            name_match = re.search(r'Name\s*:\s*([^,]+)', name_text)
-            if name_match:
-                student_name = name_match.group(1).strip()
-                logger.info(f"Found student name: {student_name}")
-        
-        # Find ALL results tables (one for each year)
-        tables = soup.find_all('table', {'class': 'table-bordered'})
         
-        results = {}
-        if student_name:
-            results['student_name'] = student_name
-            
-        if tables:
-            logger.success(f"Found {len(tables)} results table(s)!")
-            
-            # Process each table (each year)
-            for table_index, table in enumerate(tables):
-                rows = table.find_all('tr')[1:]  # Skip header row
-                for row in rows:
-                    cols = row.find_all('td')
-                    if len(cols) >= 5:  # Ensure we have at least 5 columns (subject, year, semester, credits, result)
-                        subject_with_name = cols[0].text.strip()
-                        grade = cols[4].text.strip()
-                        
-                        # Handle duplicate subjects - keep the highest grade
-                        if subject_with_name in results and subject_with_name != 'student_name':
-                            existing_grade = results[subject_with_name]
-                            current_points = get_grade_points(grade)
-                            existing_points = get_grade_points(existing_grade)
-                            
-                            if current_points > existing_points:
-                                logger.info(f"Duplicate found for {subject_with_name}: Replacing {existing_grade} with higher grade {grade}")
-                                results[subject_with_name] = grade
-                            else:
-                                logger.info(f"Duplicate found for {subject_with_name}: Keeping existing grade {existing_grade} over {grade}")
-                        else:
-                            # Store only subject code and grade (no credits from HTML)
-                            # Credits will be looked up from CSV later
-                            results[subject_with_name] = grade
-        else:
-            # If no table found, check for login errors
-            error_msg = soup.find('div', {'class': 'alert-danger'})
-            if error_msg:
-                logger.error(f"Login error: {error_msg.text.strip()}")
-            else:
-                logger.error("Results table not found. Please check your credentials.")
-
-        return results
+        # Now parse the results page
+        outcome.status = 'ok'
+        if archive:
+            archive.add(index_number, response.text)
+        with timer.span(index_number, 'parse'):
+            return parse_results_with_cache(index_number, response.text, cache, PARSE_LOG.bind(index=index_number))
 
+    except requests.exceptions.HTTPError as e:
+        outcome.record_http_error(e.response.status_code, e.response.headers)
+        logger.error("Network error: %s", e)
+        return None
+    except requests.exceptions.Timeout as e:
+        outcome.status = 'timeout'
+        logger.error("Network error: %s", e)
+        return None
+    except requests.exceptions.ConnectionError as e:
+        outcome.status = 'connection_error'
+        logger.error("Network error: %s", e)
+        return None
     except requests.exceptions.RequestException as e:
-        logger.error(f"Network error: {e}")
+        logger.error("Network error: %s", e)
         return None
     except Exception as e:
-        logger.error(f"Error fetching results: {e}")
+        logger.error("Error fetching results: %s", e)
         return None
 
-def update_excel(index_number, results, excel_path):
-    """Function to update Excel file with fetched results"""
+async def fetch_results_async(index_number, nic, login_url, http_session, gui_instance=None, rate_limiter=None, cache=None, outcome=None, timer=None, archive=None):
+    """asyncio version of fetch_results: same login -> dashboard -> results flow and the same results dict.
+    
+    http_session is an aiohttp.ClientSession owned by this student (its cookie jar must not be shared).
+    """
+    import aiohttp
+    logger = FETCH_LOG.bind(index=index_number)
+    headers = BROWSER_HEADERS
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    if outcome is None:
+        outcome = FetchOutcome()
+    if timer is None:
+        timer = _NO_TIMER
+    
+    async def get_page(phase, method, url, **kwargs):
+        if rate_limiter:
+            with timer.span(index_number, 'rate_limit_wait'):
+                if not await rate_limiter.acquire_async():
+                    return None
+        with timer.span(index_number, phase):
+            async with http_session.request(method, url, headers=headers, timeout=timeout, **kwargs) as response:
+                response.raise_for_status()
+                return await response.text()
+    
     try:
-        # Ensure we're saving to a writable location
-        if not os.path.isabs(excel_path):
-            excel_path = os.path.join(OUTPUT_DIR, excel_path)
+        # Get the initial page to extract any CSRF token if needed
+        logger.info("Connecting to %s...", login_url)
+        html = await get_page('login_page', 'GET', login_url)
+        if html is None or (gui_instance and gui_instance.stop_requested):
+            logger.info("Process terminated by user")
+            return None
         
-        # Make sure we have openpyxl installed
-        try:
-            import openpyxl
-        except ImportError:
-            print("The openpyxl module is not installed. Attempting to install it now...")
-            import subprocess
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "openpyxl"])
-            print("openpyxl installed successfully")
-            # Reimport pandas to ensure it now uses openpyxl
-            import importlib
-            importlib.reload(pd)
+        login_form = parse_login_form(html, login_url, index_number, nic, logger)
+        if not login_form:
+            return None
+        action, form_data = login_form
+        
+        # Submit the form
+        logger.info("Submitting credentials...")
+        html = await get_page('login_post', 'POST', action, data=form_data, allow_redirects=True)
+        if html is None or (gui_instance and gui_instance.stop_requested):
+            logger.info("Process terminated by user")
+            return None
+        
+        # Step 2: After login, navigate to dashboard to get results link
+        logger.info("Login successful, navigating to dashboard...")
+        html = await get_page('dashboard', 'GET', DASHBOARD_URL)
+        if html is None or (gui_instance and gui_instance.stop_requested):
+            logger.info("Process terminated by user")
+            return None
+        
+        # Step 3: Navigate to results page
+        logger.info("Navigating to results page...")
+        html = await get_page('results_page', 'GET', RESULTS_URL)
+        if html is None or (gui_instance and gui_instance.stop_requested):
+            logger.info("Process terminated by user")
+            return None
+        
+        # Now parse the results page
+        outcome.status = 'ok'
+        if archive:
+            archive.add(index_number, html)
+        with timer.span(index_number, 'parse'):
+            return parse_results_with_cache(index_number, html, cache, PARSE_LOG.bind(index=index_number))
+    
+    except aiohttp.ClientResponseError as e:
+        outcome.record_http_error(e.status, e.headers or {})
+        logger.error("Network error: %s", e)
+        return None
+    except asyncio.TimeoutError:
+        outcome.status = 'timeout'
+        logger.error("Network error: request timed out")
+        return None
+    except aiohttp.ClientConnectionError as e:
+        outcome.status = 'connection_error'
+        logger.error("Network error: %s", e)
+        return None
+    except aiohttp.ClientError as e:
+        logger.error("Network error: %s", e)
+        return None
+    except Exception as e:
+        logger.error("Error fetching results: %s", e)
+        return None
+
+async def fetch_batch_async(students, login_url, max_in_flight, on_result, gui_instance=None, rate_limiter=None,
+                            pool_size=DEFAULT_POOL_SIZE, cache=None, stale_ttl=None, controller=None, timer=None, archive=None):
+    """Fetch many students on one event loop, keeping at most max_in_flight sessions open at a time.
+    
+    on_result(i, student, results) is called for every student on a single helper thread, so blocking
+    work such as GPA calculation and Excel writes never stalls the event loop.
+    With a stale_ttl (seconds), students cached more recently than that are served from the cache.
+    With an AdaptiveConcurrency controller, it decides how many of the max_in_flight sessions may run
+    and failed attempts that call for a back-off are retried.
+    A PhaseTimer and HtmlArchive, if given, are passed on to every fetch.
+    """
+    import aiohttp
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_in_flight)
+    # One post-processing thread keeps result handling in order and off the event loop
+    post_processor = ThreadPoolExecutor(max_workers=1)
+    connector = aiohttp.TCPConnector(limit=pool_size)
+    
+    async def run_one(i, student):
+        async with semaphore:
+            # Students still queued when Stop is pressed are skipped
+            if gui_instance and gui_instance.stop_requested:
+                return
             
-        # Try to read existing Excel file
-        try:
-            if os.path.exists(excel_path):
-                df = pd.read_excel(excel_path, index_col=0)
-                print(f"Loaded existing Excel file: {excel_path}")
+            index_number = student[0].strip()
+            nic = student[1].strip()
+            print(f"\n--- Processing student {i+1}/{len(students)}: Index {index_number} ---")
+            
+            results = cache.lookup_fresh(index_number, stale_ttl) if cache and stale_ttl is not None else None
+            if results is not None:
+                print(f"⏭️ Index {index_number} was fetched within the cache TTL, not fetching again")
             else:
-                # Create new DataFrame if file doesn't exist
-                df = pd.DataFrame()
-                print(f"Creating new Excel file: {excel_path}")
-        except Exception as file_error:
-            print(f"Error reading Excel file: {file_error}")
-            # Create new DataFrame
-            df = pd.DataFrame()
-            print(f"Creating new Excel file: {excel_path}")
-        
-        # Add new columns for any new subjects
-        for subject in results:
-            if subject not in df.columns:
-                df[subject] = ''
-                print(f"Added new column: {subject}")
-        
-        # Update the row for this student
-        df.loc[index_number] = [results.get(col, '') for col in df.columns]
-        print(f"Updated results for index: {index_number}")
+                for attempt in range(1, MAX_FETCH_ATTEMPTS + 1):
+                    if controller and not await controller.acquire_async():
+                        break
+                    outcome = FetchOutcome()
+                    start = time.monotonic()
+                    try:
+                        # Each student gets a private cookie jar on the shared connector
+                        # (unsafe=True so cookies from IP-address hosts such as a local test portal are kept too)
+                        async with aiohttp.ClientSession(connector=connector, connector_owner=False,
+                                                         cookie_jar=aiohttp.CookieJar(unsafe=True)) as http_session:
+                            results = await fetch_results_async(index_number, nic, login_url, http_session, gui_instance, rate_limiter, cache, outcome, timer, archive)
+                    finally:
+                        if controller:
+                            controller.release(time.monotonic() - start, outcome)
+                    
+                    if results is not None or not controller or not outcome.should_back_off or attempt == MAX_FETCH_ATTEMPTS:
+                        break
+                    if gui_instance and gui_instance.stop_requested:
+                        break
+                    print(f"↻ Retrying index {index_number} after {outcome.describe()} (attempt {attempt + 1}/{MAX_FETCH_ATTEMPTS})")
+        
+        await loop.run_in_executor(post_processor, on_result, i, student, results)
+    
+    try:
+        await asyncio.gather(*(run_one(i, student) for i, student in enumerate(students)))
+    finally:
+        await connector.close()
+        post_processor.shutdown(wait=True)
+
+def fetch_results_with_backend(index_number, nic, login_url, backend, gui_instance=None, transport=None):
+    """Fetch one student's results using the 'threads' (requests) or 'asyncio' (aiohttp) backend"""
+    if backend == 'asyncio' and async_backend_available():
+        async def fetch_one():
+            import aiohttp
+            async with aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True)) as http_session:
+                return await fetch_results_async(index_number, nic, login_url, http_session, gui_instance)
+        return asyncio.run(fetch_one())
+    return fetch_results(index_number, nic, login_url, gui_instance, transport=transport)
+
+def async_backend_available():
+    """The asyncio backend needs aiohttp; report and return False if it is missing"""
+    if importlib.util.find_spec('aiohttp') is not None:
+        return True
+    print("⚠️ The asyncio backend needs aiohttp (pip install aiohttp). Falling back to threads.")
+    return False
+
+def rank_students(student_results, ranking=None):
+    """Print the GPA ranking of a StudentStore and return [(rank, record), ...] (ties keep their existing order).
+    
+    A LiveRanking covering exactly these students already holds the order; otherwise they are sorted.
+    """
+    print("\n========== STUDENT RANKINGS BY GPA ==========")
+    
+    if ranking is not None and ranking.covers(student_results):
+        sorted_students = [student_results.get(index_number) for index_number in ranking.indexes()]
+    else:
+        # Sort students by GPA (descending)
+        sorted_students = sorted(student_results, key=lambda record: record.gpa, reverse=True)
+    
+    # Display ranking and prepare rank data
+    ranked_data = []
+    for rank, record in enumerate(sorted_students, 1):
+        print(f"Rank {rank}: {record.name} (Index: {record.index}) - GPA: {record.gpa:.2f} (Credits: {record.total_credits})")
+        record.rank = rank
+        ranked_data.append((rank, record))
+    
+    print("=============================================")
+    return ranked_data
+
+# Columns before the subject grades in ranked exports
+RANKED_COLUMNS = ['Rank', 'Name', 'Index', 'Email', 'GPA', 'Credits']
+
+def ranked_subjects(ranked_data):
+    """Every subject taken by the ranked students, sorted (the subject column order of ranked exports)"""
+    subject_ids = {}  # id(store) -> (store, subject ids used)
+    for _, record in ranked_data:
+        subject_ids.setdefault(id(record.store), (record.store, set()))[1].update(record.subject_ids)
+    return sorted({store.subjects[subject_id] for store, ids in subject_ids.values() for subject_id in ids})
+
+def ranked_rows(ranked_data, subjects):
+    """Yield one row per ranked student: RANKED_COLUMNS, then their grade (None if not taken) per subject"""
+    column_of = {subject: position for position, subject in enumerate(subjects)}
+    no_grades = [None] * len(subjects)
+    for rank, record in ranked_data:
+        row = [rank, record.name, record.index, record.email or f"{record.index}@{EMAIL_DOMAIN}", record.gpa, record.total_credits]
+        grades = list(no_grades)
+        subject_names = record.store.subjects
+        grade_names = record.store.grades
+        for subject_id, grade_code in zip(record.subject_ids, record.grade_codes):
+            grades[column_of[subject_names[subject_id]]] = grade_names[grade_code]
+        row.extend(grades)
+        yield row
+
+def _write_rows(path, header, rows):
+    """Stream rows to a .csv file or a write-only .xlsx workbook, replacing path atomically"""
+    root, ext = os.path.splitext(path)
+    temp_path = f"{root}.partial{ext}"
+    try:
+        if ext.lower() == '.csv':
+            with open(temp_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+        else:
+            _ensure_openpyxl()
+            from openpyxl import Workbook
+            # Write-only mode streams each row to disk instead of keeping a cell object per value
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet('Sheet1')
+            sheet.append(header)
+            for row in rows:
+                sheet.append(row)
+            workbook.save(temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def ranked_excel_path(excel_path):
+    """Path of the ranked export kept next to a per-student results workbook (results.xlsx -> results_ranked.xlsx)"""
+    root, ext = os.path.splitext(excel_path)
+    return f"{root}_ranked{ext or '.xlsx'}"
+
+def save_ranked_excel(ranked_data, excel_path):
+    """Save results to Excel (or .csv) in rank order with GPA and all results, streaming one row at a time"""
+    # Ensure we're saving to a writable location
+    if not os.path.isabs(excel_path):
+        excel_path = os.path.join(OUTPUT_DIR, excel_path)
+    
+    print(f"\n--- Saving ranked results to Excel: {excel_path} ---")
+    
+    # Column order is fixed once: rank details, then every subject taken by anyone
+    subjects = ranked_subjects(ranked_data)
+    header = RANKED_COLUMNS + subjects
+    try:
+        _write_rows(excel_path, header, ranked_rows(ranked_data, subjects))
+        print(f"✓ Ranked Excel file saved successfully: {excel_path}")
+    except Exception as e:
+        print(f"❌ Error saving ranked Excel file: {e}")
         
-        # Save to Excel - with error handling
+        # Try saving as CSV as a fallback
         try:
-            df.to_excel(excel_path)
-            print(f"Excel file saved successfully: {excel_path}")
-            return True
-        except Exception as save_error:
-            print(f"Error saving Excel file: {save_error}")
-            
-            # Try saving as CSV as a fallback
-            try:
-                csv_path = excel_path.replace('.xlsx', '.csv')
-                df.to_csv(csv_path)
-                print(f"Results saved as CSV instead: {csv_path}")
-                return True
-            except:
-                print("Could not save as CSV either.")
-                return False
-                
+            csv_path = os.path.splitext(excel_path)[0] + '.csv'
+            _write_rows(csv_path, header, ranked_rows(ranked_data, subjects))
+            print(f"Results saved as CSV instead: {csv_path}")
+        except Exception as csv_err:
+            print(f"Could not save as CSV either: {csv_err}")
+
+def _init_reparse_worker(html_parser):
+    """Process pool initializer: quiet logging and the HTML parser for this re-parse"""
+    # A forked worker inherits the GUI's stdout redirect; it must never touch the Tk widget
+    sys.stdout = sys.__stdout__
+    set_log_levels('off')
+    set_html_parser(html_parser)
+
+def _reparse_pages(pages):
+    """Parse [(index, html), ...] in a worker process. Returns [(index, results), ...]"""
+    parsed = []
+    for index_number, html in pages:
+        # Quiet without redirecting stdout: the worker's log levels are off (see _init_reparse_worker)
+        parsed.append((index_number, parse_results_page(html)))
+    return parsed
+
+def reparse_archive(archive_path, credit_mapping=None, workers=None, emails=None):
+    """Re-parse an HtmlArchive into a StudentStore without network calls.
+    
+    Pages are parsed in a process pool (one process per core by default), then the whole cohort
+    is graded in one pass with CohortGPA.
+    """
+    emails = emails or {}
+    start = time.perf_counter()
+    pages = sorted(HtmlArchive.load(archive_path).items())
+    if not pages:
+        print(f"No pages found in archive: {archive_path}")
+        return StudentStore()
+    
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pages)))
+    chunk_size = max(1, -(-len(pages) // (workers * 4)))
+    chunks = [pages[n:n + chunk_size] for n in range(0, len(pages), chunk_size)]
+    print(f"Re-parsing {len(pages)} page(s) from {archive_path} with {workers} process(es)...")
+    
+    parsed = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_reparse_worker,
+                             initargs=(DEFAULT_HTML_PARSER,)) as executor:
+        for chunk in executor.map(_reparse_pages, chunks):
+            for index_number, results in chunk:
+                if results:
+                    parsed.append((index_number, results))
+                else:
+                    print(f"❌ No results found in the archived page for index {index_number}")
+    
+    grades = cohort_gpas([results for _, results in parsed], credit_mapping)
+    student_results = StudentStore()
+    for (index_number, results), (gpa, total_credits) in zip(parsed, grades):
+        student_name = extract_student_name(results) or f"Student {index_number}"
+        student_results.put(index_number, student_name, emails.get(index_number) or f"{index_number}@{EMAIL_DOMAIN}",
+                            gpa, total_credits, results)
+    
+    print(f"✓ Re-parsed {len(student_results)} student(s) in {time.perf_counter() - start:.2f}s")
+    return student_results
+
+def update_excel(index_number, results, excel_path):
+    """Function to update Excel file with fetched results (one student; batches use ExcelResultsWriter)"""
+    try:
+        writer = ExcelResultsWriter(excel_path)
+        writer.add(index_number, results)
+        print(f"Updated results for index: {index_number}")
+        return writer.close()
     except Exception as e:
         print(f"Error updating Excel file: {e}")
         return False
 
-def run_standalone(index_number, nic, excel_path):
+def run_standalone(index_number, nic, excel_path, backend=DEFAULT_BACKEND):
     """Run in standalone mode (without GUI)"""
     # Check dependencies
     check_dependencies()
     
-    print(f"Fetching results for index: {index_number}")
-    results = fetch_results(index_number, nic, LOGIN_URL)
+    print(f"Fetching results for index: {index_number} ({backend} backend)")
+    results = fetch_results_with_backend(index_number, nic, LOGIN_URL, backend)
     if results:
         # Calculate GPA if results found
         student_name = extract_student_name(results) or f"Student {index_number}"
@@ -1321,18 +4460,106 @@ def run_standalone(index_number, nic, excel_path):
     else:
         print("No results found or error occurred.")
 
+def save_and_export_run(student_results, ranked_data, excel_path, source=None, credit_csv=None, db_path=RESULTS_DB_PATH):
+    """Record a ranked run in the results database and export the ranked workbook from it; returns the run id"""
+    results_db = ResultsStore(db_path)
+    run_id = results_db.save_run(student_results, ranked_data, source, credit_csv)
+    print(f"🗃️ Run {run_id} ({len(student_results)} students) saved to {results_db.path}")
+    export_run(excel_path, run_id, db_path)
+    return run_id
+
+def export_run(path, run_id=None, db_path=RESULTS_DB_PATH):
+    """Export a run from the results database (default: the latest) as a ranked .xlsx or .csv file"""
+    student_results, ranked_data = ResultsStore(db_path).load_run(run_id)
+    if not ranked_data:
+        print(f"No runs found in the results database: {db_path}")
+        return False
+    save_ranked_excel(ranked_data, path)
+    return True
+
+def print_student_history(index_number, db_path=RESULTS_DB_PATH):
+    """Print a student's GPA and rank in every run recorded in the results database"""
+    history = ResultsStore(db_path).student_history(index_number)
+    if not history:
+        print(f"Index {index_number} is not in the results database")
+    for run_id, started_at, gpa, total_credits, rank in history:
+        when = time.strftime('%Y-%m-%d %H:%M', time.localtime(started_at))
+        print(f"Run {run_id} ({when}): GPA {gpa:.2f} (Credits: {total_credits})" + (f", rank {rank}" if rank else ""))
+
+def run_reparse(archive_path, credit_csv_path, excel_path, student_csv_path=None, workers=None, scenarios_path=None):
+    """Re-rank a cohort from an HTML archive without the GUI or the network (optionally under what-if scenarios)"""
+    credit_mapping = load_credit_csv(credit_csv_path)
+    students = load_student_csv(student_csv_path) if student_csv_path else None
+    emails = {student[0].strip(): student[2] for student in students or [] if len(student) > 2 and student[2]}
+    
+    student_results = reparse_archive(archive_path, credit_mapping, workers, emails)
+    if not student_results:
+        return
+    if scenarios_path:
+        rankings = run_scenarios(student_results, credit_mapping, load_scenarios(scenarios_path))
+        print_scenario_rankings(rankings)
+        print(f"✓ Scenario rankings saved to {save_scenario_rankings(rankings)}")
+    else:
+        save_and_export_run(student_results, rank_students(student_results), ranked_excel_path(excel_path), archive_path, credit_csv_path)
+
 if __name__ == "__main__":
-    # Check if any command line arguments were provided
-    if len(sys.argv) > 1 and sys.argv[1] == "--nogui":
+    # Needed for the re-parse process pool in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
+    import argparse
+    parser = argparse.ArgumentParser(description="UCSC Result Fetcher")
+    parser.add_argument('--nogui', action='store_true', help="fetch a single student without the GUI")
+    parser.add_argument('--index', default=DEFAULT_INDEX, help="student index number (--nogui)")
+    parser.add_argument('--nic', default=DEFAULT_NIC, help="student NIC number (--nogui)")
+    parser.add_argument('--excel', default=EXCEL_PATH, help="Excel output path (--nogui)")
+    parser.add_argument('--backend', choices=FETCH_BACKENDS, default=DEFAULT_BACKEND, help="HTTP fetch backend (--nogui)")
+    parser.add_argument('--portal-url', help="portal base URL, e.g. a local mock_portal.py (default: UCSC_PORTAL_URL or the real portal)")
+    parser.add_argument('--reparse', metavar='ARCHIVE', help="re-rank the students in an HTML archive offline (no GUI, no network)")
+    parser.add_argument('--credits', default=CREDIT_CSV_PATH, help="credits CSV for --reparse")
+    parser.add_argument('--students', help="student CSV for --reparse (adds emails to the ranked Excel)")
+    parser.add_argument('--workers', type=int, help="processes for --reparse (default: one per core)")
+    parser.add_argument('--scenarios', help="what-if scenarios JSON for --reparse (one ranking sheet per scenario)")
+    parser.add_argument('--export', metavar='PATH', help="export a ranked run from the results database to .xlsx or .csv")
+    parser.add_argument('--run', type=int, help="run id for --export (default: the latest run)")
+    parser.add_argument('--history', metavar='INDEX', help="print a student's GPA and rank in every recorded run")
+    parser.add_argument('--db', default=RESULTS_DB_PATH, help="results database for --export and --history")
+    parser.add_argument('--html-parser', choices=HTML_PARSERS, help="HTML parser for portal pages (default: UCSC_HTML_PARSER or auto)")
+    parser.add_argument('--log-level', help="log levels, e.g. warning or warning,grades=info,fetch=debug (default: UCSC_LOG or warning)")
+    # parse_known_args: macOS app bundles may pass extra arguments such as -psn_*
+    args, _ = parser.parse_known_args()
+    if args.portal_url:
+        set_portal_url(args.portal_url)
+    if args.html_parser:
+        set_html_parser(args.html_parser)
+    if args.log_level:
+        try:
+            set_log_levels(args.log_level)
+        except ValueError as e:
+            parser.error(f"--log-level: {e}")
+        DEFAULT_LOG_LEVELS = args.log_level  # Shown in the GUI's Log levels field
+    enable_json_log()
+    
+    if args.export:
+        export_run(args.export, args.run, args.db)
+    elif args.history:
+        print_student_history(args.history, args.db)
+    elif args.reparse:
+        run_reparse(args.reparse, args.credits, args.excel, args.students, args.workers, args.scenarios)
+    elif args.nogui:
         # Run in standalone mode
-        run_standalone(DEFAULT_INDEX, DEFAULT_NIC, EXCEL_PATH)
+        run_standalone(args.index, args.nic, args.excel, args.backend)
     else:
         # Run with GUI
         root = tk.Tk()
         app = ResultFetcherGUI(root)
         
-        # Start the main event loop
-        root.mainloop()
+        if os.environ.get('UCSC_EXIT_AFTER_DRAW'):
+            # Startup benchmark (startup_benchmark.py): close as soon as the window is drawn
+            root.update()
+            root.destroy()
+        else:
+            # Start the main event loop
+            root.mainloop()
         
         # Restore stdout when the application closes
-        sys.stdout = sys.__stdout__
\ No newline at end of file
+        sys.stdout = sys.__stdout__
+        app.stdout_redirect.close()
\ No newline at end of file
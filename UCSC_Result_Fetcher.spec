@@ -11,7 +11,10 @@ a = Analysis(
         ('credits.csv', '.'),  # Include the credits.csv file
     ],
     hiddenimports=[
+        # Imported lazily by name (LazyModule), so PyInstaller cannot see them
         'pandas',
+        'numpy',
+        'asyncio',
         'openpyxl',
         'openpyxl.cell._writer',
         'requests',
@@ -0,0 +1,176 @@
+"""
+Throughput benchmark for the rank-email stage, run against the local SMTP sink (mock_smtp.py).
+
+Ranks a synthetic cohort (mock_portal.py), builds its rank emails with rank_email_messages and
+sends them in each mode:
+
+  per-email  a new connection, STARTTLS and login for every email (send_email)
+  pooled     one SMTPMailer connection reused for every email, sent one at a time
+  outbox     the EmailOutbox drained by --workers sender threads (what the GUI does)
+
+For every cohort size and mode it reports messages/sec, per-message send latency percentiles,
+failures and the connections and logins the sink saw. Rate limiting is off, so the numbers show
+what the sending path itself can do.
+
+Run with: python3 email_benchmark.py --sizes 100,1000,10000 --workers 4 --latency 20
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+import Fetcher_ultimate as fetcher
+from mock_portal import generate_cohort
+from mock_smtp import MockSMTPServer
+
+MODES = ['per-email', 'pooled', 'outbox']
+
+
+class TimedMailer:
+    """SMTPMailer wrapper recording how long each send() took"""
+    def __init__(self, mailer):
+        self.mailer = mailer
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def send(self, to_email, subject, body):
+        start = time.perf_counter()
+        ok = self.mailer.send(to_email, subject, body)
+        with self.lock:
+            self.latencies.append(time.perf_counter() - start)
+        return ok
+
+    def last_error(self, to_email):
+        return self.mailer.last_error(to_email)
+
+
+def build_messages(size, seed=5):
+    """Rank emails for a synthetic cohort, as send_rank_emails would queue them"""
+    rng = random.Random(seed)
+    store = fetcher.StudentStore()
+    for index_number, student in generate_cohort(size, seed).items():
+        store.put(index_number, student['name'], f"{index_number}@{fetcher.EMAIL_DOMAIN}",
+                  round(rng.uniform(1.5, 4.0), 2), 90.0, {})
+    # rank_students prints the ranking; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fetcher.rank_email_messages(fetcher.rank_students(store))
+
+
+def send_per_email(messages, workers):
+    latencies = []
+    failed = 0
+    for _, _, to_email, subject, body in messages:
+        start = time.perf_counter()
+        if not fetcher.send_email(to_email, subject, body):
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+    return latencies, failed
+
+
+def send_pooled(messages, workers):
+    mailer = TimedMailer(fetcher.SMTPMailer(max_rate=0))
+    failed = sum(1 for _, _, to_email, subject, body in messages if not mailer.send(to_email, subject, body))
+    mailer.mailer.close()
+    return mailer.latencies, failed
+
+
+def send_outbox(messages, workers):
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = fetcher.EmailOutbox(os.path.join(directory, 'outbox.db'))
+        outbox.enqueue('benchmark', messages)
+        mailer = TimedMailer(fetcher.SMTPMailer(connections=workers, max_rate=0))
+        _, failed = fetcher.dispatch_outbox(outbox, 'benchmark', mailer, workers)
+        mailer.mailer.close()
+    return mailer.latencies, failed
+
+
+def run_mode(mode, messages, workers, sink):
+    """Send every message in one mode and summarise it"""
+    sender = {'per-email': send_per_email, 'pooled': send_pooled, 'outbox': send_outbox}[mode]
+    before = sink.stats()
+    # The mailer logs every send; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        latencies, failed = sender(messages, workers)
+        elapsed = time.perf_counter() - start
+    after = sink.stats()
+    return {
+        'mode': mode,
+        'workers': workers if mode == 'outbox' else 1,
+        'messages': len(messages),
+        'seconds': elapsed,
+        'messages_per_sec': (len(messages) - failed) / elapsed if elapsed else 0.0,
+        'p50_ms': fetcher.percentile(latencies, 50) * 1000,
+        'p95_ms': fetcher.percentile(latencies, 95) * 1000,
+        'p99_ms': fetcher.percentile(latencies, 99) * 1000,
+        'failed': failed,
+        'delivered': after['messages'] - before['messages'],
+        'connections': after['connections'] - before['connections'],
+        'logins': after['logins'] - before['logins'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rank-email stage against a local SMTP sink")
+    parser.add_argument('--sizes', default='100,1000,10000', help="comma-separated synthetic cohort sizes")
+    parser.add_argument('--modes', default=','.join(MODES), help=f"comma-separated modes ({', '.join(MODES)})")
+    parser.add_argument('--workers', type=int, default=4, help="sender workers (SMTP connections) in outbox mode")
+    parser.add_argument('--latency', type=float, default=20, help="sink delay per SMTP reply, i.e. per round trip (ms)")
+    parser.add_argument('--jitter', type=float, default=5, help="sink delay jitter (ms)")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="fraction of messages the sink answers with 451")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="fraction of messages where the sink drops the connection")
+    parser.add_argument('--max-messages', type=int, default=0, help="sink messages per connection before a 421 (0 = no cap)")
+    parser.add_argument('--max-per-email', type=int, default=1000,
+                        help="largest cohort sent in per-email mode (it reconnects for every email; 0 = no limit)")
+    parser.add_argument('--retry-backoff', type=float, default=0.1, help="outbox retry backoff (s) for the benchmark")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(sorted(unknown))}")
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    sink = MockSMTPServer(latency_ms=args.latency, jitter_ms=args.jitter, fail_rate=args.fail_rate,
+                          drop_rate=args.drop_rate, max_messages=args.max_messages, seed=1)
+    host, port = sink.start()
+    fetcher.SMTP_SERVER, fetcher.SMTP_PORT = host, port
+    fetcher.EMAIL_RETRY_BACKOFF = args.retry_backoff
+
+    print(f"Rank emails against the SMTP sink at {host}:{port}: latency {args.latency:g}±{args.jitter:g} ms per reply, "
+          f"fail rate {args.fail_rate:g}, drop rate {args.drop_rate:g}")
+    print(f"{'mode':<10} {'workers':>7} {'messages':>8} {'msgs/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'failed':>6} {'conns':>6} {'logins':>6}")
+
+    report = []
+    try:
+        for size in sizes:
+            messages = build_messages(size)
+            for mode in modes:
+                if mode == 'per-email' and args.max_per_email and size > args.max_per_email:
+                    print(f"{mode:<10} {'':>7} {size:>8}   skipped (over --max-per-email {args.max_per_email})")
+                    continue
+                row = run_mode(mode, messages, args.workers, sink)
+                row['size'] = size
+                report.append(row)
+                print(f"{mode:<10} {row['workers']:>7} {row['messages']:>8} {row['messages_per_sec']:>8.1f} "
+                      f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+                      f"{row['failed']:>6} {row['connections']:>6} {row['logins']:>6}")
+    finally:
+        sink.stop()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+GPA benchmark: per-student calculate_gpa versus the vectorised CohortGPA engine.
+
+Builds results dicts for a synthetic cohort (mock_portal.py) with a sprinkling of the awkward
+cases the GPA rules cover (NC/CM/MC/WH, unknown grades, EN* subjects, subjects missing from the
+credit mapping), grades everyone both ways and checks that every GPA and credit total is identical.
+
+Run with: python3 gpa_benchmark.py --students 1000,10000,50000
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+
+import Fetcher_ultimate as fetcher
+from mock_portal import generate_cohort
+
+EXTRA_SUBJECTS = ['ENH1201 English', 'ENH2201 English II', 'XYZ9999 Unlisted Elective', 'SCS 1201 Spaced Code', 'Seminar']
+EXTRA_GRADES = ['NC', 'CM', 'MC', 'WH', 'a+', ' B ', 'Pending', 'F', 'E', 'C-']
+
+
+def build_results(cohort, seed=7):
+    """Results dicts as parse_results_page would return them, plus random awkward subjects"""
+    rng = random.Random(seed)
+    results_list = []
+    for student in cohort.values():
+        results = {'student_name': student['name']}
+        for subject, _, _, _, grade in student['rows']:
+            if subject not in results or fetcher.get_grade_points(grade) > fetcher.get_grade_points(results[subject]):
+                results[subject] = grade
+        for subject in rng.sample(EXTRA_SUBJECTS, rng.randint(0, 2)):
+            results[subject] = rng.choice(EXTRA_GRADES)
+        results_list.append(results)
+    return results_list
+
+
+def benchmark(results_list, credit_mapping):
+    """Grade a cohort per student and with CohortGPA; returns (per student, build, compute, mismatches) timings in seconds"""
+    # calculate_gpa prints a warning per missing credit; keep the timing about the arithmetic
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = [fetcher.calculate_gpa(fetcher.extract_credits_and_grades(results, credit_mapping)) for results in results_list]
+    per_student = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine = fetcher.CohortGPA(credit_mapping)
+    engine.add_many(results_list)
+    built = time.perf_counter()
+    gpa, total_credits = engine.compute()
+    computed = time.perf_counter()
+
+    actual = list(zip(gpa.tolist(), total_credits.tolist()))
+    mismatches = sum(1 for a, b in zip(actual, expected) if a != b)
+    return per_student, built - start, computed - built, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-student GPA against the vectorised cohort engine")
+    parser.add_argument('--students', default='1000,10000,50000', help="comma-separated synthetic cohort sizes")
+    parser.add_argument('--credits', default=fetcher.CREDIT_CSV_PATH, help="credits CSV")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        credit_mapping = fetcher.load_credit_csv(args.credits)
+    # NumPy and pandas are imported lazily; keep the import out of the timings
+    fetcher.np.load()
+    fetcher.pd.load()
+
+    print("End-to-end times in ms (build = the students x subjects matrix, compute = every GPA at once)")
+    print(f"{'students':>8} {'results':>8} {'per student':>12} {'build':>8} {'compute':>8} {'cohort':>8} {'speedup':>8}")
+    differing = 0
+    for size in [int(size) for size in args.students.split(',') if size.strip()]:
+        results_list = build_results(generate_cohort(size))
+        per_student, build, compute, mismatches = benchmark(results_list, credit_mapping)
+        print(f"{size:>8} {sum(len(r) - 1 for r in results_list):>8} {per_student * 1000:>12.1f} {build * 1000:>8.1f} "
+              f"{compute * 1000:>8.1f} {(build + compute) * 1000:>8.1f} {per_student / (build + compute):>7.1f}x")
+        differing += mismatches
+    print("✓ Identical GPA and credits for every student" if not differing else f"❌ {differing} student(s) differ")
+
+if __name__ == '__main__':
+    main()
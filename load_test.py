@@ -0,0 +1,141 @@
+"""
+Load-test harness for the fetch path.
+
+Starts a local mock portal (mock_portal.py) with a synthetic cohort, or uses an already running
+one, and drives the fetcher against it at each concurrency level. For every level it reports
+students/sec, per-student latency percentiles and errors.
+
+Run with: python3 load_test.py --students 300 --levels 1,4,8,16,32 --latency 80 --jitter 40
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import Fetcher_ultimate as fetcher
+from mock_portal import MockPortal, generate_cohort
+
+
+def run_threads(students, workers, max_rate):
+    """Fetch every student with the threaded backend. Returns [(latency_seconds, ok), ...]"""
+    rate_limiter = fetcher.RateLimiter(max_rate)
+    transport = fetcher.PooledTransport(max(workers, fetcher.DEFAULT_POOL_SIZE))
+
+    def fetch_one(student):
+        start = time.perf_counter()
+        results = fetcher.fetch_results(student[0], student[1], fetcher.LOGIN_URL, None, rate_limiter, transport)
+        return time.perf_counter() - start, bool(results)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        samples = list(executor.map(fetch_one, students))
+    transport.close()
+    return samples
+
+
+def run_asyncio(students, workers, max_rate):
+    """Fetch every student with the asyncio backend. Returns [(latency_seconds, ok), ...]"""
+    import aiohttp
+    rate_limiter = fetcher.RateLimiter(max_rate)
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(workers)
+        connector = aiohttp.TCPConnector(limit=max(workers, fetcher.DEFAULT_POOL_SIZE))
+
+        async def fetch_one(student):
+            async with semaphore:
+                start = time.perf_counter()
+                async with aiohttp.ClientSession(connector=connector, connector_owner=False,
+                                                 cookie_jar=aiohttp.CookieJar(unsafe=True)) as http_session:
+                    results = await fetcher.fetch_results_async(student[0], student[1], fetcher.LOGIN_URL,
+                                                                http_session, None, rate_limiter)
+                return time.perf_counter() - start, bool(results)
+
+        try:
+            return await asyncio.gather(*(fetch_one(student) for student in students))
+        finally:
+            await connector.close()
+
+    return asyncio.run(run_all())
+
+
+def run_level(backend, students, workers, max_rate):
+    """Run one concurrency level and summarise it"""
+    runner = run_asyncio if backend == 'asyncio' else run_threads
+    # The fetcher logs to stdout; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        samples = runner(students, workers, max_rate)
+        elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, ok in samples if ok]
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        'backend': backend,
+        'workers': workers,
+        'students': len(students),
+        'seconds': elapsed,
+        'students_per_sec': len(students) / elapsed if elapsed else 0.0,
+        'p50_ms': fetcher.percentile(latencies, 50) * 1000,
+        'p95_ms': fetcher.percentile(latencies, 95) * 1000,
+        'p99_ms': fetcher.percentile(latencies, 99) * 1000,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the fetcher against a local mock portal")
+    parser.add_argument('--url', help="use an already running portal/mock at this base URL instead of starting one")
+    parser.add_argument('--students', type=int, default=200, help="synthetic cohort size")
+    parser.add_argument('--levels', default='1,2,4,8,16', help="comma-separated concurrency levels")
+    parser.add_argument('--backend', choices=fetcher.FETCH_BACKENDS + ['both'], default='threads')
+    parser.add_argument('--max-rate', type=float, default=0, help="global requests/sec cap (0 = no limit)")
+    parser.add_argument('--latency', type=float, default=50, help="mock portal latency per request (ms)")
+    parser.add_argument('--jitter', type=float, default=20, help="mock portal latency jitter (ms)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="mock portal HTTP 500 rate")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    cohort = generate_cohort(args.students)
+    students = [[index_number, student['nic']] for index_number, student in cohort.items()]
+
+    portal = None
+    if args.url:
+        base_url = args.url
+    else:
+        portal = MockPortal(cohort, latency_ms=args.latency, jitter_ms=args.jitter, error_rate=args.error_rate, seed=1)
+        base_url = portal.start()
+    fetcher.set_portal_url(base_url)
+    fetcher.set_log_levels('off')
+
+    backends = fetcher.FETCH_BACKENDS if args.backend == 'both' else [args.backend]
+    levels = [int(level) for level in args.levels.split(',') if level.strip()]
+
+    print(f"Load test against {base_url}: {len(students)} students, latency {args.latency:g}±{args.jitter:g} ms, "
+          f"rate cap {args.max_rate:g}/s" if args.max_rate else
+          f"Load test against {base_url}: {len(students)} students, latency {args.latency:g}±{args.jitter:g} ms, no rate cap")
+    print(f"{'backend':<8} {'workers':>7} {'students/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+
+    report = []
+    try:
+        for backend in backends:
+            for workers in levels:
+                row = run_level(backend, students, workers, args.max_rate)
+                report.append(row)
+                print(f"{backend:<8} {workers:>7} {row['students_per_sec']:>10.1f} {row['p50_ms']:>8.1f} "
+                      f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['errors']:>6}")
+    finally:
+        if portal:
+            portal.stop()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""
+Local stand-in for the UCSC student portal, for benchmarking and tuning the fetcher
+without touching the real portal.
+
+Serves the same login form, dashboard and `table-bordered` results pages that
+fetch_results expects, for a synthetic cohort of any size, with optional latency,
+jitter, 5xx errors and 429 throttling.
+
+Run with: python3 mock_portal.py --students 600 --latency 80 --jitter 40 --write-csv mock_students.csv
+Then point the fetcher at it: UCSC_PORTAL_URL=http://127.0.0.1:8765/student-portal/public/index.php python3 Fetcher_ultimate.py
+"""
+
+import argparse
+import csv
+import html
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PORTAL_PATH = '/student-portal/public/index.php'
+CREDIT_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'credits.csv')
+
+# Grades drawn for synthetic students, roughly shaped like a real cohort
+GRADE_WEIGHTS = [
+    ('A+', 3), ('A', 10), ('A-', 10), ('B+', 12), ('B', 12), ('B-', 10), ('C+', 9), ('C', 9),
+    ('C-', 5), ('D+', 3), ('D', 2), ('E', 2), ('F', 2), ('MC', 1), ('WH', 1), ('NC', 1),
+]
+FAILED_GRADES = ['F', 'E', 'MC', 'D']
+FIRST_NAMES = ['Kasun', 'Nimali', 'Tharindu', 'Sachini', 'Ravindu', 'Dilini', 'Chamath', 'Ishara', 'Pasindu', 'Hiruni']
+LAST_NAMES = ['Perera', 'Fernando', 'Silva', 'Jayasinghe', 'Bandara', 'Wickramasinghe', 'Gunawardena', 'Rajapaksha']
+SUBJECT_TITLES = ['Programming', 'Data Structures', 'Mathematics', 'Computer Systems', 'Databases',
+                  'Software Engineering', 'Networks', 'Statistics', 'Information Systems', 'Communication Skills']
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><title>Student Portal - Login</title></head>
+<body>
+<div class="container">
+{error}
+<form method="POST" action="{action}">
+  <input type="hidden" name="_token" value="{token}">
+  <input type="text" name="index_no" placeholder="Index Number">
+  <input type="password" name="nic" placeholder="NIC">
+  <button type="submit">Login</button>
+</form>
+</div>
+</body></html>
+"""
+
+DASHBOARD_PAGE = """<!DOCTYPE html>
+<html><head><title>Student Portal</title></head>
+<body><div class="container"><h2>Welcome</h2><a href="{results}">Results</a></div></body></html>
+"""
+
+
+def load_subject_codes(credit_csv_path=CREDIT_CSV_PATH):
+    """Subject codes from credits.csv (so synthetic pages match the real credit mapping)"""
+    codes = []
+    try:
+        with open(credit_csv_path, 'r') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            codes = [row[0].strip() for row in reader if row]
+    except OSError:
+        pass
+    return codes or [f"SCS{1300 + i}" for i in range(1, 13)]
+
+
+def generate_cohort(size, seed=42, first_index=23000000):
+    """Build a synthetic cohort: {index: {'nic', 'name', 'rows': [(subject, year, semester, credits, grade), ...]}}"""
+    rng = random.Random(seed)
+    codes = load_subject_codes()
+    grades, weights = zip(*GRADE_WEIGHTS)
+    cohort = {}
+    for i in range(size):
+        index_number = str(first_index + i)
+        rows = []
+        for position, code in enumerate(codes):
+            title = SUBJECT_TITLES[position % len(SUBJECT_TITLES)]
+            subject = f"{code} {title}"
+            year = 1 + position * 2 // max(1, len(codes))
+            semester = 1 + position % 2
+            grade = rng.choices(grades, weights)[0]
+            # Some students retake a subject: the failed attempt appears first, in an earlier year
+            if rng.random() < 0.08:
+                rows.append((subject, year, semester, 2, rng.choice(FAILED_GRADES)))
+                year += 1
+            rows.append((subject, year, semester, 2, grade))
+        cohort[index_number] = {
+            'nic': f"{200000000000 + i}",
+            'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}",
+            'rows': rows,
+        }
+    return cohort
+
+
+def write_student_csv(cohort, path, email_domain='stu.ucsc.cmb.ac.lk'):
+    """Write the cohort's credentials in the fetcher's student CSV format (index,nic,email)"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['index', 'nic', 'email'])
+        for index_number, student in cohort.items():
+            writer.writerow([index_number, student['nic'], f"{index_number}@{email_domain}"])
+
+
+def render_results_page(index_number, student):
+    """Results page with the student name header and one table-bordered table per year"""
+    years = {}
+    for row in student['rows']:
+        years.setdefault(row[1], []).append(row)
+
+    tables = []
+    for year in sorted(years):
+        body = ''.join(
+            f"<tr><td>{html.escape(subject)}</td><td>{year}</td><td>{semester}</td><td>{credits}</td><td>{grade}</td></tr>"
+            for subject, year, semester, credits, grade in years[year]
+        )
+        tables.append(
+            f'<h4>Year {year}</h4>\n<table class="table table-bordered">'
+            f"<tr><th>Subject</th><th>Year</th><th>Semester</th><th>Credits</th><th>Result</th></tr>{body}</table>"
+        )
+
+    return (f"<!DOCTYPE html><html><head><title>Results</title></head><body><div class=\"container\">"
+            f"<h3>Name : {html.escape(student['name'])}, Index No : {index_number}</h3>\n"
+            + "\n".join(tables) + "</div></body></html>")
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that doesn't print tracebacks when clients drop keep-alive connections"""
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class MockPortal:
+    """Threaded HTTP server imitating the portal for a synthetic cohort"""
+    def __init__(self, cohort, host='127.0.0.1', port=0, latency_ms=0, jitter_ms=0, error_rate=0.0, throttle_rate=0.0, retry_after=1, seed=None):
+        self.cohort = cohort
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.sessions = {}  # session cookie -> index number
+        self.lock = threading.Lock()
+        self.requests_served = 0
+        self.errors_injected = 0
+        self.server = QuietHTTPServer((host, port), self._handler_class())
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{PORTAL_PATH}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler_class(self):
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real portal
+            disable_nagle_algorithm = True  # headers and body are separate writes; avoid delayed-ACK stalls
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_page(self, body, status=200, headers=None):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=UTF-8')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def simulate_conditions(self):
+                """Apply latency/jitter and maybe inject a failure. Returns True if a failure was sent"""
+                with portal.lock:
+                    portal.requests_served += 1
+                    delay = portal.latency + (portal.rng.uniform(-portal.jitter, portal.jitter) if portal.jitter else 0.0)
+                    roll = portal.rng.random()
+                if delay > 0:
+                    time.sleep(delay)
+                if roll < portal.throttle_rate:
+                    with portal.lock:
+                        portal.errors_injected += 1
+                    self.send_page("Too Many Requests", 429, {'Retry-After': str(portal.retry_after)})
+                    return True
+                if roll < portal.throttle_rate + portal.error_rate:
+                    with portal.lock:
+                        portal.errors_injected += 1
+                    self.send_page("Internal Server Error", 500)
+                    return True
+                return False
+
+            def route(self):
+                path = urlsplit(self.path).path.rstrip('/')
+                if not path.startswith(PORTAL_PATH):
+                    return None
+                return path[len(PORTAL_PATH):] or '/'
+
+            def current_student(self):
+                for part in self.headers.get('Cookie', '').split(';'):
+                    name, _, value = part.strip().partition('=')
+                    if name == 'portal_session':
+                        with portal.lock:
+                            return portal.sessions.get(value)
+                return None
+
+            def do_GET(self):
+                route = self.route()
+                if route is None:
+                    self.send_page("Not Found", 404)
+                    return
+                if self.simulate_conditions():
+                    return
+
+                if route == '/login':
+                    self.send_page(LOGIN_PAGE.format(error='', action=PORTAL_PATH + '/login', token=secrets.token_hex(16)))
+                elif route == '/results':
+                    index_number = self.current_student()
+                    if index_number is None:
+                        error = '<div class="alert alert-danger">Please log in to view your results.</div>'
+                        self.send_page(LOGIN_PAGE.format(error=error, action=PORTAL_PATH + '/login', token=secrets.token_hex(16)))
+                    else:
+                        self.send_page(render_results_page(index_number, portal.cohort[index_number]))
+                elif route == '/':
+                    self.send_page(DASHBOARD_PAGE.format(results=PORTAL_PATH + '/results'))
+                else:
+                    self.send_page("Not Found", 404)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                form = parse_qs(self.rfile.read(length).decode('utf-8'))
+                route = self.route()
+                if route != '/login':
+                    self.send_page("Not Found", 404)
+                    return
+                if self.simulate_conditions():
+                    return
+
+                index_number = form.get('index_no', [''])[0]
+                nic = form.get('nic', [''])[0]
+                student = portal.cohort.get(index_number)
+                if not student or student['nic'] != nic:
+                    error = '<div class="alert alert-danger">Invalid index number or NIC.</div>'
+                    self.send_page(LOGIN_PAGE.format(error=error, action=PORTAL_PATH + '/login', token=secrets.token_hex(16)))
+                    return
+
+                session_id = secrets.token_hex(16)
+                with portal.lock:
+                    portal.sessions[session_id] = index_number
+                # Like the real portal: a redirect to the dashboard after login
+                self.send_response(302)
+                self.send_header('Location', PORTAL_PATH)
+                self.send_header('Set-Cookie', f"portal_session={session_id}; Path=/; HttpOnly")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the UCSC student portal")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--students', type=int, default=100, help="synthetic cohort size")
+    parser.add_argument('--seed', type=int, default=42, help="seed for the synthetic cohort")
+    parser.add_argument('--latency', type=float, default=0, help="added latency per request (ms)")
+    parser.add_argument('--jitter', type=float, default=0, help="+/- random latency per request (ms)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of requests answered with HTTP 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with 429 responses")
+    parser.add_argument('--write-csv', help="write the cohort's credentials to this student CSV")
+    args = parser.parse_args()
+
+    cohort = generate_cohort(args.students, args.seed)
+    if args.write_csv:
+        write_student_csv(cohort, args.write_csv)
+        print(f"✓ Wrote {len(cohort)} student credentials to {args.write_csv}")
+
+    portal = MockPortal(cohort, args.host, args.port, args.latency, args.jitter, args.error_rate,
+                        args.throttle_rate, args.retry_after, args.seed)
+    print(f"Mock portal serving {len(cohort)} students at {portal.base_url}")
+    print(f"Use it with: UCSC_PORTAL_URL={portal.base_url} python3 Fetcher_ultimate.py")
+    try:
+        portal.server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping mock portal")
+        portal.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
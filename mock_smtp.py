@@ -0,0 +1,309 @@
+"""
+Local SMTP sink standing in for the mail provider, for benchmarking and tuning the notification path
+without getting rate-limited or flagged by Gmail.
+
+Behaves like an authenticated submission server (smtp.gmail.com:587): STARTTLS is advertised and
+required before AUTH (PLAIN and LOGIN), and AUTH before MAIL. Messages are counted and thrown away.
+Every reply can be delayed (a round trip per SMTP command) and messages can be answered with a
+temporary 451 failure, or the connection dropped mid-message. The TLS certificate is a throwaway
+self-signed one made with the openssl command line tool, unless --cert/--key are given.
+
+Run with: python3 mock_smtp.py --port 8025 --latency 20 --fail-rate 0.01
+Then set SMTP Server 127.0.0.1 and SMTP Port 8025 on the SMTP Settings tab (any email and password).
+"""
+
+import argparse
+import base64
+import os
+import random
+import shutil
+import socket
+import socketserver
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+MAX_LINE = 8192
+
+
+def make_self_signed_cert(directory):
+    """Write a throwaway certificate and key for localhost into directory; returns (certfile, keyfile)"""
+    if not shutil.which('openssl'):
+        raise RuntimeError("mock_smtp.py needs the openssl command line tool for its TLS certificate (or pass --cert and --key)")
+    certfile = os.path.join(directory, 'mock_smtp.crt')
+    keyfile = os.path.join(directory, 'mock_smtp.key')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'ec', '-pkeyopt', 'ec_paramgen_curve:prime256v1',
+                    '-nodes', '-days', '2', '-subj', '/CN=localhost', '-keyout', keyfile, '-out', certfile],
+                   check=True, capture_output=True)
+    return certfile, keyfile
+
+
+class QuietTCPServer(socketserver.ThreadingTCPServer):
+    """ThreadingTCPServer that doesn't print tracebacks when clients drop connections"""
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (ConnectionError, ssl.SSLError, socket.timeout)):
+            return
+        super().handle_error(request, client_address)
+
+
+class MockSMTPServer:
+    """Threaded SMTP sink with STARTTLS, AUTH, latency and failure injection.
+
+    user/password of None accept any credentials. max_messages closes a connection (421) once it has
+    carried that many messages, like providers that cap messages per connection (0 = no cap).
+    """
+    def __init__(self, host='127.0.0.1', port=0, user=None, password=None, latency_ms=0, jitter_ms=0,
+                 fail_rate=0.0, drop_rate=0.0, max_messages=0, seed=None, certfile=None, keyfile=None):
+        self.user = user
+        self.password = password
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.max_messages = max_messages
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.logins = 0
+        self.messages = 0
+        self.failures_injected = 0
+        self.drops_injected = 0
+        self.recipients = []  # Every accepted recipient, in delivery order
+
+        self.cert_dir = None
+        if not certfile:
+            self.cert_dir = tempfile.mkdtemp(prefix='mock_smtp_')
+            certfile, keyfile = make_self_signed_cert(self.cert_dir)
+        self.ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self.ssl_context.load_cert_chain(certfile, keyfile)
+        self.server = QuietTCPServer((host, port), self._handler_class())
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.address
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.cert_dir:
+            shutil.rmtree(self.cert_dir, ignore_errors=True)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'connections': self.connections,
+                'tls_handshakes': self.tls_handshakes,
+                'logins': self.logins,
+                'messages': self.messages,
+                'failures_injected': self.failures_injected,
+                'drops_injected': self.drops_injected,
+            }
+
+    def _handler_class(self):
+        sink = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def setup(self):
+                self.sock = self.request
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.reader = self.sock.makefile('rb')
+                self.tls = False
+                self.authenticated = False
+                self.messages = 0
+                self.reset()
+                with sink.lock:
+                    sink.connections += 1
+
+            def reset(self):
+                self.mail_from = None
+                self.rcpt_to = []
+
+            def reply(self, code, *lines):
+                """Send a (multi-line) reply after the simulated round-trip delay"""
+                with sink.lock:
+                    delay = sink.latency + (sink.rng.uniform(-sink.jitter, sink.jitter) if sink.jitter else 0.0)
+                if delay > 0:
+                    time.sleep(delay)
+                lines = lines or ('OK',)
+                text = ''.join(f"{code}{'-' if n < len(lines) - 1 else ' '}{line}\r\n" for n, line in enumerate(lines))
+                self.sock.sendall(text.encode('ascii'))
+
+            def read_line(self):
+                line = self.reader.readline(MAX_LINE)
+                return line.decode('utf-8', 'replace').rstrip('\r\n') if line else None
+
+            def handle(self):
+                self.reply(220, 'mock.smtp ESMTP ready')
+                while True:
+                    line = self.read_line()
+                    if line is None:
+                        return
+                    verb, _, arg = line.partition(' ')
+                    handler = getattr(self, 'smtp_' + verb.upper(), None)
+                    if handler is None:
+                        self.reply(502, '5.5.1 Unrecognized command')
+                    elif handler(arg.strip()) is False:
+                        return
+
+            def smtp_EHLO(self, arg):
+                features = ['mock.smtp at your service', 'SIZE 35882577', '8BITMIME', 'ENHANCEDSTATUSCODES']
+                # Like Gmail: STARTTLS before TLS, AUTH only after it
+                features.append('AUTH LOGIN PLAIN' if self.tls else 'STARTTLS')
+                self.reply(250, *features)
+
+            def smtp_HELO(self, arg):
+                self.reply(250, 'mock.smtp')
+
+            def smtp_STARTTLS(self, arg):
+                if self.tls:
+                    self.reply(503, '5.5.1 TLS already active')
+                    return
+                self.reply(220, '2.0.0 Ready to start TLS')
+                self.sock = sink.ssl_context.wrap_socket(self.sock, server_side=True)
+                self.reader = self.sock.makefile('rb')
+                self.tls = True
+                self.authenticated = False
+                self.reset()
+                with sink.lock:
+                    sink.tls_handshakes += 1
+
+            def smtp_AUTH(self, arg):
+                if not self.tls:
+                    self.reply(530, '5.7.0 Must issue a STARTTLS command first')
+                    return
+                mechanism, _, initial = arg.partition(' ')
+                try:
+                    if mechanism.upper() == 'PLAIN':
+                        if not initial:
+                            self.reply(334, '')
+                            initial = self.read_line() or ''
+                        _, user, password = base64.b64decode(initial).decode('utf-8').split('\0')
+                    elif mechanism.upper() == 'LOGIN':
+                        if not initial:
+                            self.reply(334, 'VXNlcm5hbWU6')
+                            initial = self.read_line() or ''
+                        user = base64.b64decode(initial).decode('utf-8')
+                        self.reply(334, 'UGFzc3dvcmQ6')
+                        password = base64.b64decode(self.read_line() or '').decode('utf-8')
+                    else:
+                        self.reply(504, '5.5.4 Unrecognized authentication type')
+                        return
+                except ValueError:
+                    self.reply(501, '5.5.2 Cannot decode response')
+                    return
+                if (sink.user is not None and user != sink.user) or (sink.password is not None and password != sink.password):
+                    self.reply(535, '5.7.8 Username and Password not accepted')
+                    return
+                self.authenticated = True
+                with sink.lock:
+                    sink.logins += 1
+                self.reply(235, '2.7.0 Accepted')
+
+            def smtp_MAIL(self, arg):
+                if not self.authenticated:
+                    self.reply(530, '5.7.0 Authentication Required')
+                    return
+                if sink.max_messages and self.messages >= sink.max_messages:
+                    self.reply(421, '4.7.0 Too many messages for this connection, try again later')
+                    return False
+                self.reset()
+                self.mail_from = arg
+                self.reply(250, '2.1.0 OK')
+
+            def smtp_RCPT(self, arg):
+                if self.mail_from is None:
+                    self.reply(503, '5.5.1 MAIL first')
+                    return
+                self.rcpt_to.append(arg.partition(':')[2].strip().strip('<>'))
+                self.reply(250, '2.1.5 OK')
+
+            def smtp_DATA(self, arg):
+                if not self.rcpt_to:
+                    self.reply(503, '5.5.1 RCPT first')
+                    return
+                self.reply(354, 'Go ahead')
+                while True:
+                    line = self.reader.readline(MAX_LINE)
+                    if not line:
+                        return False
+                    if line in (b'.\r\n', b'.\n'):
+                        break
+                with sink.lock:
+                    roll = sink.rng.random()
+                    if roll < sink.drop_rate:
+                        sink.drops_injected += 1
+                    elif roll < sink.drop_rate + sink.fail_rate:
+                        sink.failures_injected += 1
+                    else:
+                        sink.messages += 1
+                        sink.recipients.extend(self.rcpt_to)
+                if roll < sink.drop_rate:
+                    # Hang up without answering, as a server restarting or timing out would
+                    return False
+                if roll < sink.drop_rate + sink.fail_rate:
+                    self.reset()
+                    self.reply(451, '4.3.0 Temporary failure (injected), try again later')
+                    return
+                self.messages += 1
+                self.reset()
+                self.reply(250, '2.0.0 OK queued')
+
+            def smtp_RSET(self, arg):
+                self.reset()
+                self.reply(250, '2.0.0 OK')
+
+            def smtp_NOOP(self, arg):
+                self.reply(250, '2.0.0 OK')
+
+            def smtp_QUIT(self, arg):
+                self.reply(221, '2.0.0 closing connection')
+                return False
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SMTP sink with STARTTLS/AUTH emulation and failure injection")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--user', help="accept only this login (default: any)")
+    parser.add_argument('--password', help="accept only this password (default: any)")
+    parser.add_argument('--latency', type=float, default=0, help="added delay per SMTP reply, i.e. per round trip (ms)")
+    parser.add_argument('--jitter', type=float, default=0, help="+/- random delay per reply (ms)")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="fraction of messages answered with 451")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="fraction of messages where the connection is dropped")
+    parser.add_argument('--max-messages', type=int, default=0, help="messages per connection before a 421 (0 = no cap)")
+    parser.add_argument('--seed', type=int, help="seed for latency jitter and failure injection")
+    parser.add_argument('--cert', help="TLS certificate (default: a throwaway self-signed one)")
+    parser.add_argument('--key', help="TLS private key for --cert")
+    args = parser.parse_args()
+
+    sink = MockSMTPServer(args.host, args.port, args.user, args.password, args.latency, args.jitter, args.fail_rate,
+                          args.drop_rate, args.max_messages, args.seed, args.cert, args.key)
+    host, port = sink.address
+    print(f"Mock SMTP sink listening on {host}:{port} (STARTTLS + AUTH, messages are discarded)")
+    print(f"Use it with SMTP Server {host} and SMTP Port {port} on the SMTP Settings tab")
+    try:
+        sink.server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping mock SMTP sink")
+        sink.stop()
+        print(", ".join(f"{name.replace('_', ' ')}: {value}" for name, value in sink.stats().items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Parse-time benchmark for the HTML parser backends.
+
+Renders results and login pages for a synthetic cohort (mock_portal.py), optionally wrapped in
+portal-like page chrome (navigation, scripts, footer), and times parse_results_page and
+parse_login_form per page with every available backend. Both backends must agree on every page.
+
+Run with: python3 parse_benchmark.py --students 200 --repeat 5
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import time
+
+import Fetcher_ultimate as fetcher
+from mock_portal import LOGIN_PAGE, generate_cohort, render_results_page
+
+
+def add_page_chrome(page, links=60):
+    """Wrap a mock page's body in navigation, inline scripts and a footer like the real portal's"""
+    nav = ''.join(f'<li class="nav-item"><a class="nav-link" href="/student-portal/public/index.php/page{n}">Menu item {n}</a></li>'
+                  for n in range(links))
+    head = ('<link rel="stylesheet" href="/css/bootstrap.min.css"><meta name="viewport" content="width=device-width">'
+            '<script>window.dataLayer = window.dataLayer || []; function gtag(){dataLayer.push(arguments);}</script>')
+    header = f'<nav class="navbar navbar-expand-lg"><ul class="navbar-nav">{nav}</ul></nav>'
+    footer = ('<footer class="footer"><div class="container"><p>University of Colombo School of Computing</p>'
+              + '<p class="text-muted">' + 'Lorem ipsum dolor sit amet. ' * 40 + '</p></div></footer>'
+              '<script src="/js/jquery.min.js"></script><script src="/js/bootstrap.bundle.min.js"></script>')
+    return page.replace('</head>', head + '</head>').replace('<body>', '<body>' + header).replace('</body>', footer + '</body>')
+
+
+def time_pages(parse, pages, repeat):
+    """Best-of-repeat parse time (seconds) for each page, plus the parsed output of the last round"""
+    timings = []
+    outputs = []
+    for page in pages:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = parse(page)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(best)
+        outputs.append(output)
+    return timings, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the HTML parser backends on synthetic portal pages")
+    parser.add_argument('--students', type=int, default=200, help="synthetic cohort size (one results page each)")
+    parser.add_argument('--repeat', type=int, default=5, help="parse each page this many times and keep the best")
+    parser.add_argument('--bare', action='store_true', help="parse the bare mock pages without portal-like chrome")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    cohort = generate_cohort(args.students)
+    results_pages = [render_results_page(index_number, student) for index_number, student in cohort.items()]
+    login_pages = [LOGIN_PAGE.format(error='', action='/student-portal/public/index.php/login', token=f"{n:032x}")
+                   for n in range(len(results_pages))]
+    if not args.bare:
+        results_pages = [add_page_chrome(page) for page in results_pages]
+        login_pages = [add_page_chrome(page) for page in login_pages]
+
+    backends = ['html.parser']
+    if isinstance(fetcher.get_html_parser('auto'), fetcher.LxmlPageParser):
+        backends.insert(0, 'lxml')
+    else:
+        print("⚠️ lxml is not installed; only html.parser is benchmarked (pip install lxml)")
+
+    average_size = sum(len(page) for page in results_pages) / len(results_pages)
+    print(f"Parsing {len(results_pages)} results pages (~{average_size / 1024:.1f} KB each) and as many login pages, best of {args.repeat}")
+    print(f"{'backend':<12} {'page':<8} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'pages/s':>9}")
+
+    report = []
+    outputs = {}
+    # The parsers log every page; keep the report readable
+    fetcher.set_log_levels('off')
+    for backend in backends:
+        page_types = [
+            ('results', results_pages, lambda page: fetcher.parse_results_page(page, parser=backend)),
+            ('login', login_pages, lambda page: fetcher.parse_login_form(page, fetcher.LOGIN_URL, '23000000', '200300000000', parser=backend)),
+        ]
+        for page_type, pages, parse in page_types:
+            with contextlib.redirect_stdout(io.StringIO()):
+                timings, parsed = time_pages(parse, pages, args.repeat)
+            outputs[(backend, page_type)] = parsed
+            mean = sum(timings) / len(timings)
+            row = {
+                'backend': backend,
+                'page': page_type,
+                'pages': len(pages),
+                'mean_ms': mean * 1000,
+                'p50_ms': fetcher.percentile(timings, 50) * 1000,
+                'p95_ms': fetcher.percentile(timings, 95) * 1000,
+                'pages_per_sec': 1 / mean if mean else 0.0,
+            }
+            report.append(row)
+            print(f"{backend:<12} {page_type:<8} {row['mean_ms']:>8.2f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['pages_per_sec']:>9.0f}")
+
+    if len(backends) > 1:
+        for page_type in ('results', 'login'):
+            fast = next(row for row in report if row['backend'] == backends[0] and row['page'] == page_type)
+            slow = next(row for row in report if row['backend'] == 'html.parser' and row['page'] == page_type)
+            agree = outputs[(backends[0], page_type)] == outputs[('html.parser', page_type)]
+            print(f"{page_type}: {backends[0]} is {slow['mean_ms'] / fast['mean_ms']:.1f}x faster, "
+                  + ("identical output" if agree else "❌ OUTPUT DIFFERS"))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
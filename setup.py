@@ -24,6 +24,7 @@ OPTIONS = {
     },
     'packages': [
         'pandas',
+        'numpy',
         'openpyxl',
         'requests',
         'bs4',
@@ -41,6 +42,8 @@ OPTIONS = {
         'tkinter.filedialog',
         'email.mime.text',
         'email.mime.multipart',
+        'smtplib',
+        'asyncio',
     ],
     'excludes': ['matplotlib', 'scipy', 'numpy.testing'],  # Exclude large unused packages
 }
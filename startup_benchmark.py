@@ -0,0 +1,78 @@
+"""
+Startup-time benchmark for the fetcher script and its py2app/PyInstaller builds.
+
+Times, in fresh processes, how long it takes to import the fetcher module and how long until the
+GUI window has been drawn. Script targets (.py) are timed through a small driver, so an older copy
+of the script can be measured the same way for a before/after comparison (025e3d9 is the last
+version that imported everything at startup):
+
+    git show 025e3d9:Fetcher_ultimate.py > /tmp/Fetcher_before.py
+    python3 startup_benchmark.py Fetcher_ultimate.py /tmp/Fetcher_before.py
+
+Any other target is run as a built app executable with UCSC_EXIT_AFTER_DRAW=1, which makes the app
+close as soon as its window is drawn, e.g.
+"dist/UCSC Result Fetcher.app/Contents/MacOS/UCSC Result Fetcher" (or the .exe on Windows).
+
+Run with: python3 startup_benchmark.py --repeat 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+IMPORT_DRIVER = "import sys; sys.path.insert(0, {folder!r}); import {module}"
+WINDOW_DRIVER = (IMPORT_DRIVER + "\nimport tkinter as tk\nroot = tk.Tk()\n{module}.ResultFetcherGUI(root)\n"
+                 "root.update()\nroot.destroy()")
+
+
+def time_command(command, repeat, timeout, env=None):
+    """Wall-clock seconds for each run of command, or (None, error) if a run fails"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            completed = subprocess.run(command, capture_output=True, text=True, timeout=timeout, env=env)
+        except subprocess.TimeoutExpired:
+            return None, f"no exit within {timeout:.0f}s"
+        if completed.returncode != 0:
+            lines = (completed.stderr or completed.stdout).strip().splitlines()
+            return None, lines[-1] if lines else f"exit code {completed.returncode}"
+        timings.append(time.perf_counter() - start)
+    return timings, None
+
+
+def report(label, step, timings, error):
+    if timings is None:
+        print(f"{label:<36} {step:<8} {'n/a':>9}   {error}")
+    else:
+        print(f"{label:<36} {step:<8} {min(timings) * 1000:>9.0f} {sum(timings) / len(timings) * 1000:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark how long the fetcher takes to import and to draw its window")
+    parser.add_argument('targets', nargs='*', help="fetcher scripts (.py) or built app executables (default: Fetcher_ultimate.py)")
+    parser.add_argument('--repeat', type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument('--timeout', type=float, default=60.0, help="seconds to wait for one run")
+    args = parser.parse_args()
+
+    targets = args.targets or [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Fetcher_ultimate.py')]
+    print(f"Startup times over {args.repeat} fresh processes")
+    print(f"{'target':<36} {'step':<8} {'min ms':>9} {'mean ms':>9}")
+    report('python (interpreter only)', 'start', *time_command([sys.executable, '-c', 'pass'], args.repeat, args.timeout))
+
+    for target in targets:
+        label = os.path.basename(target)
+        if target.endswith('.py'):
+            fields = {'folder': os.path.dirname(os.path.abspath(target)), 'module': os.path.splitext(label)[0]}
+            for step, driver in (('import', IMPORT_DRIVER), ('window', WINDOW_DRIVER)):
+                command = [sys.executable, '-c', driver.format(**fields)]
+                report(label, step, *time_command(command, args.repeat, args.timeout))
+        else:
+            env = dict(os.environ, UCSC_EXIT_AFTER_DRAW='1')
+            report(label, 'window', *time_command([target], args.repeat, args.timeout, env))
+
+
+if __name__ == '__main__':
+    main()